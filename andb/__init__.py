@@ -13,6 +13,9 @@ def Load():
     # load dwf file 
     dbg.LoadDwf()
 
+    # read memory from corefile directly
+    dbg.LoadCoreMemory()
+
     # load v8
     from . import v8
     v8.LoadDwf()
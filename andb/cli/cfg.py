@@ -2,7 +2,7 @@
 from __future__ import print_function, division
 
 from andb.utility import to_bool
-from andb.dbg import Command, CommandPrefix
+from andb.dbg import Command, CommandPrefix, CoreMemory, LoadCoreMemory
 from andb.config import Config
 
 class cli_andb(CommandPrefix):
@@ -28,23 +28,25 @@ class cli_andb_opt(CommandPrefix):
 
 
 class cli_andb_opt_chunk_cache(Command):
+    """ andb option chunk_cache [on|off]
+        chunks are cached on first access, the budget is 'cfgChunkCacheSize'.
+    """
     _cxpr = "andb option chunk_cache"
 
-    # default not enabled.
-    on_off = False
-    
     @classmethod
     def show_value(cls):
-        if cls.on_off: print("on")
+        import andb.v8 as v8
+        if v8.ChunkBlock._cls_enabled: print("on")
         else: print("off")
+        s = v8.ChunkBlock.Stats()
+        print("chunks %d, cached %d, bytes %d/%d, hits %d, misses %d, evictions %d" % (
+            s['chunks'], s['cached'], s['bytes'], s['budget'],
+            s['hits'], s['misses'], s['evictions']))
 
     @classmethod
     def set_value(cls, v):
         import andb.v8 as v8
-        if v:
-            iso = v8.Isolate.GetCurrent()
-            iso.MakeChunkCache()
-        cls.on_off = v
+        v8.ChunkBlock.Enable(v)
        
     def invoke(self, argv):
         if len(argv) < 1:
@@ -54,6 +56,30 @@ class cli_andb_opt_chunk_cache(Command):
         v = to_bool(argv[0])
         self.set_value(v)
 
+
+class cli_andb_opt_core_memory(Command):
+    _cxpr = "andb option core_memory"
+
+    @classmethod
+    def show_value(cls):
+        if CoreMemory.IsLoaded(): print("on")
+        else: print("off")
+
+    @classmethod
+    def set_value(cls, v):
+        if v:
+            LoadCoreMemory()
+        else:
+            CoreMemory.Unload()
+
+    def invoke(self, argv):
+        if len(argv) < 1:
+            self.show_value()
+            return
+
+        v = to_bool(argv[0])
+        self.set_value(v)
+
 class cli_andb_tsr(Command):
     _cxpr = "andb tsr"
 
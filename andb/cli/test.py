@@ -81,8 +81,8 @@ class cli_stack_stack(Command):
 
         t = Target.GetCurrentThread()
         sp = t.GetFrameTop().GetSP()
-        segs = Target.GetMemoryRegions().Load()
-        seg = MemoryRegions.Lookup(segs, sp) 
+        segs = Target.GetMemoryRegions()
+        seg = segs.Search(sp)
         sp_low = sp - far 
         print("sp: %x, far: %d, seq: %s" % (sp, far, seg))
 
@@ -93,7 +93,7 @@ class cli_stack_stack(Command):
 
             p = Target.ReadInt(x, 8)
             if p == 0: continue
-            seg = MemoryRegions.Lookup(segs, p) 
+            seg = segs.Search(p)
             if seg is None or not seg.IsExecutable(): continue
             v = Target.TryDecodeIr(p) 
             print("0x%x :" % x, v)
@@ -129,14 +129,22 @@ class cli_mm_find(Command):
     _cxpr = "mm find"
     
     def invoke(self, argv):
-        addr = int(argv[0], 16)
+        if len(argv) < 1:
+            print("usage: mm find <address> [<address> ...]")
+            return
+        addrs = [int(i, 16) for i in argv]
         a = Target.GetMemoryRegions()
         cnt = 0
         for m in a._I_regions:
-            r = Target.MemoryFind(m._I_start_address, m._I_end_address, addr)
-            if r is not None:
-                cnt += len(r)
-                for i in r:
+            # sections without contents and reserved ranges
+            if not m.IsReadable():
+                continue
+            r = Target.MemoryFindAll(m._I_start_address, m._I_end_address, addrs)
+            for addr in addrs:
+                if addr not in r:
+                    continue
+                cnt += len(r[addr])
+                for i in r[addr]:
                     print("0x%x in %s" % (i, m))
         print("Found %d" % cnt)
 
@@ -170,13 +178,8 @@ class cli_mm_locate(Command):
             addr = int(argv[2], 16)
         elif len(argv) == 1:
             addr = int(argv[0], 16)
-            a = Target.GetMemoryRegions()
-            mro = None
-            for m in a._I_regions:
-                if addr >= m._I_start_address and addr <= m._I_end_address:
-                    mro = m
-                    break
-            if mro is None:
+            m = Target.GetMemoryRegions().Search(addr)
+            if m is None:
                 print('seg not found.')
                 return
 
@@ -200,12 +203,30 @@ class cli_mm_addr(Command):
     _cxpr = "mm address"
 
     def invoke(self, argv):
-        addr = int(argv[0], 16)
+        if len(argv) < 1:
+            print("usage: mm address <address> [<address> ...]")
+            return
+        addrs = [int(i, 16) for i in argv]
         a = Target.GetMemoryRegions()
-        cnt = 0
-        for m in a._I_regions:
-            if addr >= m._I_start_address and addr <= m._I_end_address:
-                print(m) 
+        for addr, m in zip(addrs, a.SearchAll(addrs)):
+            if m is None:
+                print("0x%x not found." % addr)
+            else:
+                print("0x%x in%s" % (addr, m))
+
+class cli_mm_stats(Command):
+    _cxpr = "mm stats"
+
+    def invoke(self, argv):
+        a = Target.GetMemoryRegions()
+        by_mode, by_name = a.Stats()
+        print("by permission:")
+        for k, v in sorted(by_mode.items(), key=lambda x: x[1], reverse=True):
+            print("  %s %16d" % (k, v))
+        print("by file:")
+        for k, v in sorted(by_name.items(), key=lambda x: x[1], reverse=True):
+            print("  %16d %s" % (v, k))
+        print("total: %d" % sum(by_mode.values()))
 
 class cli_objgraph(CommandPrefix):
     _cxpr = "og"
@@ -253,6 +274,10 @@ class cli_mapreduce(CommandPrefix):
 
 
 class cli_mapreduce_index(Command):
+    """split the pages into shards.
+
+Syntax: mapreduce index <shard_bytes>
+"""
     _cxpr = "mapreduce index"
 
     def invoke(self, argv):
@@ -267,10 +292,28 @@ class cli_mapreduce_snapshot(Command):
         index = int(argv[0])
         snap.MapSnapshot(index)
 
+class cli_mapreduce_worker(Command):
+    """parse the shards requested by the scheduler.
+
+Syntax: mapreduce worker <wid> <in_fifo> <out_fifo>
+"""
+    _cxpr = "mapreduce worker"
+
+    def invoke(self, argv):
+        snap = HeapSnapshot()
+        snap.MapWorker(int(argv[0]), argv[1], argv[2])
+
 class cli_mapreduce_reduce(Command):
+    """merge the shards to core.heapsnapshot.
+
+Syntax: mapreduce reduce [<fifo>]
+"""
     _cxpr = "mapreduce reduce"
 
     def invoke(self, argv):
         snap = HeapSnapshot()
-        snap.ReduceGenerate()
+        if len(argv) > 0:
+            snap.ReduceGenerate(fifo=argv[0])
+        else:
+            snap.ReduceGenerate()
 
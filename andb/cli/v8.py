@@ -2,6 +2,8 @@
 
 from __future__ import print_function, division
 
+import json
+
 from andb.dbg import Command, CommandPrefix, Target 
 
 """ V8 commands
@@ -236,22 +238,119 @@ class cli_heap_find(Command):
 
     def invoke(self, argv):
         if len(argv) < 2:
-            print("usage: heap find <space> <object>")
+            print("usage: heap find <space> <object> [<object> ...]")
             return
         HeapVisitor().HeapFind(argv)
 
 class cli_heap_snapshot(Command):
+    """Generate HeapSnapshot for current Isolate.
+
+Syntax: heap snapshot [--resume] [<file>]
+
+default file is "core.heapsnapshot", the file is gzip compressed if the name ends with ".gz".
+
+--resume, the parsed pages are checkpointed in "<file>.d", rerun with
+--resume continues from the checkpoints of the same corefile and isolate.
+"""
     _cxpr = "heap snapshot"
 
     def invoke (self, argv):
+        resume = '--resume' in argv
+        argv = [a for a in argv if a != '--resume']
         if len(argv) == 0:
             arg = "core.heapsnapshot"
         else:
             arg = argv[0]
         snap = HeapSnapshot()
-        snap.Generate(arg)
+        if resume:
+            snap.ResumableGenerate(arg)
+        else:
+            snap.Generate(arg)
         del snap
 
+class cli_heap_dominator(Command):
+    """Show the retained sizes of the heap snapshot by dominator tree.
+
+Syntax: heap dominator [<file>] [--top <n>] [--json <report>]
+
+<file> is a ".heapsnapshot" (or ".gz") file, the snapshot of current Isolate is made in memory if not given.
+--top shows the top <n> objects and constructors by retained size, default 20.
+--json writes the report to <report> as json.
+"""
+    _cxpr = "heap dominator"
+
+    def invoke (self, argv):
+        top = 20
+        report_file = None
+        files = []
+        i = 0
+        while i < len(argv):
+            if argv[i] == '--top' and i + 1 < len(argv):
+                i += 1
+                top = int(argv[i])
+            elif argv[i] == '--json' and i + 1 < len(argv):
+                i += 1
+                report_file = argv[i]
+            else:
+                files.append(argv[i])
+            i += 1
+
+        if len(files) > 0:
+            graph = SnapshotGraph.FromFile(files[0])
+        else:
+            snap = HeapSnapshot()
+            snap.GenerateGraph()
+            graph = SnapshotGraph.FromHeapSnapshot(snap)
+            snap.CleanAll()
+            del snap
+
+        report = DominatorTree(graph).Build().Report(top)
+        DominatorTree.PrintReport(report)
+        if report_file is not None:
+            with open(report_file, 'w') as f:
+                json.dump(report, f, indent=1)
+            print("report written to '%s'" % report_file)
+
+class cli_heap_diff(Command):
+    """Compare two heap snapshots of the same process.
+
+Syntax: heap diff <a> <b> [--top <n>] [--json <report>]
+
+<a> and <b> are ".heapsnapshot" (or ".gz") files, <a> is the earlier one.
+the count and size deltas are shown by constructor and by shape (constructor and Map),
+an object at the same address with the same constructor in both is not new.
+--top shows the top <n> changes, default 20.
+--json writes the report to <report> as json.
+"""
+    _cxpr = "heap diff"
+
+    def invoke (self, argv):
+        top = 20
+        report_file = None
+        files = []
+        i = 0
+        while i < len(argv):
+            if argv[i] == '--top' and i + 1 < len(argv):
+                i += 1
+                top = int(argv[i])
+            elif argv[i] == '--json' and i + 1 < len(argv):
+                i += 1
+                report_file = argv[i]
+            else:
+                files.append(argv[i])
+            i += 1
+
+        if len(files) != 2:
+            print("heap diff <a> <b> [--top <n>] [--json <report>]")
+            return
+
+        report = HeapDiff.FromFiles(files[0], files[1]).Report(top)
+        HeapDiff.PrintReport(report)
+        if report_file is not None:
+            with open(report_file, 'w') as f:
+                json.dump(report, f, indent=1)
+            print("report written to '%s'" % report_file)
+
 class cli_heap_global(Command):
     _cxpr = "heap global"
 
@@ -259,6 +358,16 @@ class cli_heap_global(Command):
         HeapVisitor().ShowGlobal(argv)
 
 class cli_heap_summary(Command):
+    """Show the object count and size by Map.
+
+Syntax: heap summary <space>
+        heap summary type [<type>]
+        heap summary --sample [<rate>] [<space> ...]
+
+--sample walks a random subset of the pages in each space (default all old spaces),
+and estimates the top types by size and top constructors by count with 95% confidence.
+the default rate is 'cfgHeapSampleRate'.
+"""
     _cxpr = "heap summary"
 
     def invoke (self, argv):
@@ -270,6 +379,120 @@ class cli_heap_map(Command):
     def invoke (self, argv):
         HeapVisitor().SearchMapSummary(argv)
 
+class cli_heap_index(Command):
+    """Build the heap object index of current Isolate.
+
+Syntax: heap index [build [--retainers]|info|remove]
+
+build walks all spaces once, the address, map, instance type and size of each
+object are saved to "<corefile>.<isolate>.heapidx".
+heap dump/summary/map/find/follow answer from the index of the same corefile and isolate.
+--retainers also scans the references for heap retainers and heap path-to-root.
+"""
+    _cxpr = "heap index"
+
+    def invoke (self, argv):
+        HeapVisitor().ManageIndex(argv)
+
+class cli_heap_retainers(Command):
+    """Show the objects retain the object.
+
+Syntax: heap retainers <address> [<depth>]
+
+the retainers of the retainers are shown up to <depth> levels, default 1.
+the references are scanned once and saved next to the heap index.
+"""
+    _cxpr = "heap retainers"
+
+    def invoke (self, argv):
+        if len(argv) == 0:
+            print("usage: heap retainers <address> [<depth>]")
+            return
+        HeapVisitor().ShowRetainers(argv)
+
+class cli_heap_path_to_root(Command):
+    """Show the shortest retaining path from the GC roots to the object.
+
+Syntax: heap path-to-root <address>
+"""
+    _cxpr = "heap path-to-root"
+
+    def invoke (self, argv):
+        if len(argv) == 0:
+            print("usage: heap path-to-root <address>")
+            return
+        HeapVisitor().ShowPathToRoot(argv)
+
+class cli_heap_strings(CommandPrefix):
+    """Search the heap strings by the string index.
+
+the strings of the heap index are decoded once and saved to "<index>.strings",
+the address, encoding, length and hash of the contents of each string.
+"""
+    _cxpr = "heap strings"
+    _is_prefix = True
+
+class cli_heap_strings_build(Command):
+    """Build the string index of the heap index.
+
+Syntax: heap strings build [--trigrams]
+
+--trigrams also saves the trigram postings, heap strings grep only decodes
+the strings contain the literals of the regex.
+"""
+    _cxpr = "heap strings build"
+
+    def invoke (self, argv):
+        HeapVisitor().BuildStrings(argv)
+
+class cli_heap_strings_grep(Command):
+    """Show the heap strings match the regex.
+
+Syntax: heap strings grep [-i] [--limit <n>] <regex>
+"""
+    _cxpr = "heap strings grep"
+
+    def invoke (self, argv):
+        HeapVisitor().GrepStrings(argv)
+
+class cli_heap_strings_dup(Command):
+    """Show the duplicated heap strings by the wasted bytes.
+
+Syntax: heap strings dup [<top>]
+"""
+    _cxpr = "heap strings dup"
+
+    def invoke (self, argv):
+        HeapVisitor().ShowDuplicateStrings(argv)
+
+class cli_heap_strings_top(Command):
+    """Show the biggest heap strings.
+
+Syntax: heap strings top [<top>]
+"""
+    _cxpr = "heap strings top"
+
+    def invoke (self, argv):
+        HeapVisitor().ShowTopStrings(argv)
+
+class cli_heap_stats(Command):
+    """Show the statistics of heap objects by instance type, map and constructor.
+
+Syntax: heap stats [--all | <space> ...] [--top <n>] [--json <file>]
+        heap stats [--all] --part <k>/<n> --save <file>
+        heap stats --merge <file> ...
+
+all spaces are walked once, the count, bytes and size histogram of each
+instance type, map and constructor name are aggregated by chunk.
+--part walks the part k of n partitions of the chunks and --save keeps the
+partial result, --merge reports the partial results of the workers,
+"loader -m stats -j <n>" runs the parts in parallel processes.
+"""
+    _cxpr = "heap stats"
+
+    def invoke (self, argv):
+        HeapVisitor().ShowHeapStats(argv)
+
 class cli_heap_follow(Command):
     _cxpr = "heap follow"
 
@@ -303,6 +526,9 @@ from andb.shadow import (
     HeapSnapshot,
     StackVisitor,
     StringVisitor,
+    SnapshotGraph,
+    DominatorTree,
+    HeapDiff,
 )
 
 from andb.utility import Logging as log
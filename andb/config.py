@@ -51,6 +51,16 @@ class Config:
     """
     cfgHeapSnapshotShowFreeSapce = 0
 
+    """ the byte budget of ChunkBlock cache, 
+        least recently used chunks are evicted over the budget.
+    """
+    cfgChunkCacheSize = 1024 * 1024 * 1024
+
+    """ the rate of pages walked in each space by 'heap summary --sample',
+        at least 2 pages of a space are walked, large object spaces are walked fully.
+    """
+    cfgHeapSampleRate = 0.05
+
     @classmethod
     def Show(cls, Key=None):
         for k in cls.__dict__:
@@ -9,6 +9,7 @@ import os
 from .dbg_select import * 
 from .base import *
 from .dwf import * 
+from .core_memory import CoreMemory
 
 import sys
 sys.setrecursionlimit(2000)
@@ -34,3 +35,18 @@ def LoadDwf():
     # load dwf 
     Dwf.Load(dwf_file)
 
+
+def LoadCoreMemory():
+    # get the corefile debugger opened
+    
+    if os.environ.get('ANDB_CORE'):
+         core_file = os.environ.get('ANDB_CORE')
+    else:
+         core_file = Target.GetCoreFile()
+
+    if core_file is None:
+         return False
+
+    # serve memory reads from corefile
+    return CoreMemory.Load(core_file)
+
@@ -4,6 +4,7 @@ from __future__ import print_function, division
 import os
 import re
 import shlex
+from array import array
 
 from . import dbg_select as dbg
 from andb.fmt import Dwf as DwfClass
@@ -41,6 +42,56 @@ def AllSubClasses(cls):
     WalkClass(cls)
     return ordered_cls
 
+class MemberPath(object):
+    """ a member path compiled from 'typ' file to raw reads.
+
+        e.g.
+            p = MemberPath.Compile('v8::internal::Space', 'memory_chunk_list_.front_')
+            front = p.Read(space_address)
+
+        the path is resolved once to a flat offset and the width of the
+        final scalar, members behind pointers are followed by loads.
+    """
+
+    # compiled paths, {(type_name, path): MemberPath or None}
+    _cache = {}
+
+    def __init__(self, offsets, byte_size, is_signed):
+        self._offsets = offsets
+        self._byte_size = byte_size
+        self._is_signed = is_signed
+
+    @classmethod
+    def Compile(cls, type_name, path):
+        """ return MemberPath, or None if the path can't be resolved.
+        """
+        key = (type_name, path)
+        if key in cls._cache:
+            return cls._cache[key]
+
+        from .dwf import Dwf
+        pyo = None
+        raw = getattr(Dwf, 'raw', None)
+        if raw is not None and type_name is not None:
+            try:
+                r = raw.ResolveMemberPath(type_name, path.split('.'))
+            except Exception as e:
+                log.debug("compile '%s' of '%s' failed, %s" % (path, type_name, e))
+                r = None
+            if r is not None:
+                pyo = cls(*r)
+        cls._cache[key] = pyo
+        return pyo
+
+    def Read(self, address):
+        """ read the member value of the structure at address.
+        """
+        address = int(address)
+        for off in self._offsets[:-1]:
+            address = dbg.Target.ReadInt(address + off, 8)
+        return dbg.Target.ReadInt(address + self._offsets[-1], 
+                self._byte_size, self._is_signed)
+
 class Struct(dbg.Value):
     """ represets a C++ Structure 
 
@@ -96,6 +147,34 @@ class Struct(dbg.Value):
         """ tell whether the structure has been diabled due to dwarf absence """
         return cls._S_type is None
 
+    @classmethod
+    def ReadPath(cls, address, path):
+        """ read scalar member by dotted path from the structure at address,
+            e.g. Space.ReadPath(addr, 'memory_chunk_list_.front_')
+            fallback to the debugger if the path can't be compiled.
+        """
+        p = MemberPath.Compile(cls._typeName, path)
+        if p is not None:
+            return p.Read(address)
+        v = cls(address)
+        for name in path.split('.'):
+            v = v[name]
+        return int(v)
+
+    def LoadPath(self, path):
+        """ read scalar member by dotted path, see ReadPath() """
+        return self.ReadPath(self.address, path)
+
+    @classmethod
+    def OffsetOf(cls, path):
+        """ return offset of the scalar member from the structure start,
+            or None if the member is behind a pointer or can't be compiled.
+        """
+        p = MemberPath.Compile(cls._typeName, path)
+        if p is None or len(p._offsets) != 1:
+            return None
+        return p._offsets[0]
+
     def Jsonify(self):
         pass
 
@@ -432,6 +511,32 @@ def Slot(address):
     v = dbg.Target.ReadInt(address)
     return v
 
+def WordsFromBytes(data):
+    """ decode bytes (or memoryview) to 64bits words, return array('Q').
+    """
+    words = array('Q')
+    if Py23.PY3:
+        words.frombytes(data)
+    else:
+        words.fromstring(bytes(data))
+    return words
+
+def ReadWords(start_address, end_address):
+    """ read all 64bits words in [start_address, end_address) by one read.
+        return array('Q'), or None if the memory is not readable.
+    """
+    addr = int(start_address)
+    size = (int(end_address) - addr) // 8 * 8
+    if size <= 0:
+        return array('Q')
+    try:
+        data = dbg.Target.MemoryRead(addr, size)
+    except Exception:
+        return None
+    if data is None or len(data) != size:
+        return None
+    return WordsFromBytes(data)
+
 class Slots:
     """ return ptrs in slots between start_address and end_address.
         end_address is not inclueded.
@@ -445,10 +550,17 @@ class Slots:
         example,
             for tag in Slots(0, 0x20):
                 print(tag)
+
+        slots are read in bulk by windows of kWindowSlots,
+        a window can't be read falls back to slot by slot.
     """
-    def __init__(self, start_address, end_address):
+
+    kWindowSlots = 8192
+
+    def __init__(self, start_address, end_address, data=None):
         """ start_address : int or Value
             end_address : int or Value
+            data : bytes of the slots if already read (e.g. memoryview)
         """
         addr = int(start_address)
         addr_end = int(end_address)
@@ -458,17 +570,37 @@ class Slots:
         self._max_slot = slots
         self._start_addr = addr
 
+        # current window, slots [_window_start, _window_end), 
+        # _window is None if the window is not readable.
+        self._window = None
+        self._window_start = 0
+        self._window_end = 0
+        if data is not None and len(data) >= slots * 8:
+            self._window = WordsFromBytes(data[:slots * 8])
+            self._window_end = slots
+
     def __iter__(self):
         return self
 
+    def LoadWindow(self, index):
+        cnt = min(self.kWindowSlots, self._max_slot - index)
+        addr = self._start_addr + index * 8
+        self._window = ReadWords(addr, addr + cnt * 8)
+        self._window_start = index
+        self._window_end = index + cnt
+
     def __next__(self):
         """ iter.next for py3"""
-        if self._next_slot < self._max_slot:
-            addr = self._start_addr + (self._next_slot * 8)
-            v = dbg.Target.ReadInt(addr)
-            #print(addr, v, type(v))
+        i = self._next_slot
+        if i < self._max_slot:
+            if i >= self._window_end:
+                self.LoadWindow(i)
+            w = self._window
             self._next_slot += 1
-            return v
+            if w is None:
+                addr = self._start_addr + (i * 8)
+                return dbg.Target.ReadInt(addr)
+            return w[i - self._window_start]
         raise StopIteration 
 
     def next(self):
@@ -0,0 +1,235 @@
+# -*- coding: UTF-8 -*-
+from __future__ import print_function, division
+
+""" andb.dbg.core_memory : read target memory from corefile directly.
+
+    the debuggers read memory word by word, each ReadInt() is a round-trip
+    into gdb/lldb. CoreMemory mmaps the corefile and serves the reads inside
+    PT_LOAD segments (dumped part only), reads outside of the segments
+    return None and the callers fallback to the debugger.
+"""
+
+import os
+import struct
+from bisect import bisect_right
+
+from andb.loader.elf import Elf
+from andb.utility import Logging as log
+
+
+class CoreMemory:
+    """ singleton
+    """
+
+    # opened corefile Elf
+    _I_elf = None
+
+    # path of the corefile
+    _I_filename = None
+
+    # mmap of the corefile
+    _I_mmap = None
+
+    # sorted segments, (start_address, end_address, file_offset)
+    _I_starts = None
+    _I_segments = None
+
+    # fallback files (e.g. the program), [(starts, segments, mmap)]
+    _I_files = []
+
+    # struct formats by (byte_size, is_sign)
+    _formats = {
+        (1, 0): struct.Struct('<B'),
+        (2, 0): struct.Struct('<H'),
+        (4, 0): struct.Struct('<I'),
+        (8, 0): struct.Struct('<Q'),
+        (1, 1): struct.Struct('<b'),
+        (2, 1): struct.Struct('<h'),
+        (4, 1): struct.Struct('<i'),
+        (8, 1): struct.Struct('<q'),
+    }
+
+    PT_LOAD = 1
+    ET_CORE = 4
+
+    @classmethod
+    def Load(cls, filename):
+        """ mmap the corefile and index all dumped PT_LOAD segments.
+        """
+        if cls._I_mmap is not None and cls._I_filename == filename:
+            return True
+
+        cls.Unload()
+
+        if filename is None or not os.path.isfile(filename):
+            return False
+
+        elf = Elf()
+        elf.Load(filename)
+        if elf._ehdr is None or elf.GetEhdr()['e_type'] != cls.ET_CORE:
+            elf.Unload()
+            return False
+
+        segments = []
+        for p in elf.GetPhdrs():
+            if p['p_type'] != cls.PT_LOAD:
+                continue
+
+            # the segment is not dumped (e.g. readonly file mappings).
+            if p['p_filesz'] == 0:
+                continue
+
+            start = p['p_vaddr']
+            segments.append((start, start + p['p_filesz'], p['p_offset']))
+        segments.sort()
+
+        cls._I_elf = elf
+        cls._I_filename = filename
+        cls._I_mmap = elf._I_mmap
+        cls._I_segments = segments
+        cls._I_starts = [s[0] for s in segments]
+        log.verbose("core memory: %d segments from '%s'." % (len(segments), filename))
+        return True
+
+    @classmethod
+    def Unload(cls):
+        if cls._I_elf is not None:
+            cls._I_elf.Unload()
+        cls._I_elf = None
+        cls._I_filename = None
+        cls._I_mmap = None
+        cls._I_segments = None
+        cls._I_starts = None
+        cls._I_files = []
+
+    @classmethod
+    def AddFile(cls, elf, bias=0):
+        """ add loadable segments of an Elf (e.g. the program) as fallback,
+            the readonly segments are usually not dumped in corefile.
+        """
+        segments = []
+        for p in elf.GetPhdrs():
+            if p['p_type'] != cls.PT_LOAD or p['p_filesz'] == 0:
+                continue
+            start = p['p_vaddr'] + bias
+            segments.append((start, start + p['p_filesz'], p['p_offset']))
+        segments.sort()
+        cls._I_files.append(([s[0] for s in segments], segments, elf._I_mmap))
+
+    @classmethod
+    def GetElf(cls):
+        """ return the corefile Elf """
+        return cls._I_elf
+
+    @classmethod
+    def IsLoaded(cls):
+        return cls._I_mmap is not None
+
+    @classmethod
+    def Offset(cls, address, size):
+        """ return the file offset of [address, address + size),
+            None if the range is not in one dumped segment.
+        """
+        i = bisect_right(cls._I_starts, address) - 1
+        if i < 0:
+            return None
+        start, end, offset = cls._I_segments[i]
+        if address + size > end:
+            return None
+        return offset + (address - start)
+
+    @classmethod
+    def Locate(cls, address, size):
+        """ return (mmap, offset) holds [address, address + size),
+            search the corefile first, then the fallback files.
+        """
+        off = cls.Offset(address, size)
+        if off is not None:
+            return cls._I_mmap, off
+
+        for starts, segments, m in cls._I_files:
+            i = bisect_right(starts, address) - 1
+            if i < 0:
+                continue
+            start, end, offset = segments[i]
+            if address + size <= end:
+                return m, offset + (address - start)
+        return None, None
+
+    @classmethod
+    def ReadInt(cls, address, byte_size=8, is_sign=0):
+        """ read int from corefile, return None if not dumped.
+        """
+        if cls._I_mmap is None:
+            return None
+        m, off = cls.Locate(address, byte_size)
+        if m is None:
+            return None
+        fmt = cls._formats.get((byte_size, 1 if is_sign else 0))
+        if fmt is not None:
+            return fmt.unpack_from(m, off)[0]
+
+        # odd sizes (e.g. bit-field storage), little endian
+        v = 0
+        for i, c in enumerate(bytearray(m[off:off + byte_size])):
+            v |= c << (i * 8)
+        if is_sign and byte_size > 0 and v >> (byte_size * 8 - 1):
+            v -= 1 << (byte_size * 8)
+        return v
+
+    @classmethod
+    def ReadDouble(cls, address):
+        if cls._I_mmap is None:
+            return None
+        m, off = cls.Locate(address, 8)
+        if m is None:
+            return None
+        return struct.unpack_from('<d', m, off)[0]
+
+    @classmethod
+    def MemoryRead(cls, address, size):
+        """ read bytes from corefile, return None if not dumped.
+        """
+        if cls._I_mmap is None:
+            return None
+        m, off = cls.Locate(address, size)
+        if m is None:
+            return None
+        return m[off:off + size]
+
+    @classmethod
+    def DumpedRanges(cls, start, end):
+        """ return sorted [(start, end)] parts of [start, end) readable from
+            the corefile or the fallback files, each part is in one segment.
+        """
+        parts = []
+        for starts, segments in [(cls._I_starts, cls._I_segments)] + \
+                [(f[0], f[1]) for f in cls._I_files]:
+            if not segments:
+                continue
+            i = max(bisect_right(starts, start) - 1, 0)
+            while i < len(segments) and segments[i][0] < end:
+                lo = max(segments[i][0], start)
+                hi = min(segments[i][1], end)
+                if lo < hi:
+                    parts.append((lo, hi))
+                i += 1
+        parts.sort()
+
+        # the fallback files may overlap the corefile
+        out = []
+        last = start
+        for lo, hi in parts:
+            lo = max(lo, last)
+            if lo < hi:
+                out.append((lo, hi))
+                last = hi
+        return out
+
+    @classmethod
+    def GetSegments(cls):
+        """ return all dumped segments, [(start_address, end_address, file_offset)]
+        """
+        if cls._I_segments is None:
+            return []
+        return cls._I_segments
@@ -0,0 +1,1101 @@
+# -*- coding: UTF-8 -*-
+from __future__ import print_function, division
+
+""" andb.dbg.dbg_core : the headless debugger engine.
+
+    dbg_core implements the andb.dbg interface without gdb or lldb,
+    types and constants come from the 'typ' file (andb.fmt.dwf),
+    memory comes from the corefile (and the program's loadable segments).
+
+    environment,
+      ANDB_CORE : path to the corefile.
+      ANDB_EXEC : path to the program (node), for symbols and readonly segments.
+"""
+
+import os
+import struct
+
+from . import intf_dbg as intf
+from .core_memory import CoreMemory
+from andb.loader.elf import Elf
+from andb.fmt import TAG, AT, ATE
+import andb.py23 as py23
+
+core_file = os.environ.get('ANDB_CORE')
+exec_file = os.environ.get('ANDB_EXEC')
+
+if not CoreMemory.Load(core_file):
+    raise Exception("'%s' is not a valid corefile." % core_file)
+core = CoreMemory.GetElf()
+
+# machine of the corefile
+arch = 'aarch64' if core.GetEhdr()['e_machine'] == Elf.EMTYPE.EM_AARCH64 else 'x86_64'
+
+# the program, and its load bias from auxv (for PIE)
+program = None
+program_bias = 0
+if exec_file and os.path.isfile(exec_file):
+    program = Elf()
+    program.Load(exec_file)
+    auxv = core.GetNtAuxv()
+    AT_ENTRY = 9
+    if program.GetEhdr()['e_type'] == 3 and auxv and AT_ENTRY in auxv:
+        program_bias = auxv[AT_ENTRY] - program.GetEhdr()['e_entry']
+    CoreMemory.AddFile(program, program_bias)
+else:
+    print("andb.warn: ANDB_EXEC is not set, symbols are not available.")
+
+
+""" DWARF helpers, the dwarf comes from andb.dbg.Dwf (loaded by LoadDwf).
+"""
+
+# tag groups used by the engine
+STRUCT_TAGS = (TAG.DW_TAG_structure_type, TAG.DW_TAG_class_type, TAG.DW_TAG_union_type)
+POINTER_TAGS = (TAG.DW_TAG_pointer_type, TAG.DW_TAG_reference_type, TAG.DW_TAG_rvalue_reference_type)
+TYPEDEF_TAGS = (TAG.DW_TAG_typedef, TAG.DW_TAG_const_type, TAG.DW_TAG_volatile_type, TAG.DW_TAG_restrict_type)
+
+
+def GetRawDwarf():
+    from .dwf import Dwf
+    return getattr(Dwf, 'raw', None)
+
+
+def SplitTypeName(name):
+    """ split c++ name by '::', template arguments are not splitted.
+
+        e.g. 'std::vector<v8::internal::Page*>' to ['std', 'vector<v8::internal::Page*>']
+    """
+    out = []
+    depth = 0
+    start = 0
+    i = 0
+    while i < len(name):
+        c = name[i]
+        if c == '<' or c == '(':
+            depth += 1
+        elif c == '>' or c == ')':
+            depth -= 1
+        elif depth == 0 and name.startswith('::', i):
+            out.append(name[start:i])
+            i += 2
+            start = i
+            continue
+        i += 1
+    out.append(name[start:])
+    return out
+
+
+def Mangle(name):
+    """ mangle a qualified variable name, 'a::bc::d' to '_ZN1a2bc1dE'
+    """
+    names = name.split('::')
+    if len(names) == 1:
+        return name
+    return '_ZN' + ''.join(['%d%s' % (len(i), i) for i in names]) + 'E'
+
+
+class DieIndex:
+    """ cached die lookups on the RawDwarf.
+    """
+
+    # children by name for each parent die, {secoff: {name: [die]}}
+    _I_children = {}
+
+    # definitions by simple name, for resolving declarations
+    _I_definitions = None
+
+    @classmethod
+    def Children(cls, parent):
+        if parent.secoff in cls._I_children:
+            return cls._I_children[parent.secoff]
+        raw = GetRawDwarf()
+        children = {}
+        for die in raw.WalkDiesNoChild(parent):
+            name = die.AtName()
+            if name is None:
+                continue
+            if name in children:
+                children[name].append(die)
+            else:
+                children[name] = [die]
+        cls._I_children[parent.secoff] = children
+        return children
+
+    @classmethod
+    def Find(cls, type_name):
+        """ find type die by qualified name, definition is preferred.
+        """
+        raw = GetRawDwarf()
+        if raw is None:
+            return None
+
+        top = raw._cus[0].GetFirstDie()
+        top.Decode()
+
+        dies = [top]
+        for name in SplitTypeName(type_name):
+            found = []
+            for parent in dies:
+                found.extend(cls.Children(parent).get(name, []))
+            if len(found) == 0:
+                return None
+            dies = found
+
+        for die in dies:
+            if die.GetAt(AT.DW_AT_declaration) is None:
+                return die
+        return dies[0]
+
+    @classmethod
+    def Definition(cls, die):
+        """ return the definition die of a declaration.
+        """
+        if cls._I_definitions is None:
+            raw = GetRawDwarf()
+            top = raw._cus[0].GetFirstDie()
+            top.Decode()
+            definitions = {}
+            for i in raw.WalkDies(top):
+                if i.Tag() not in STRUCT_TAGS or i.GetAt(AT.DW_AT_declaration):
+                    continue
+                name = i.AtName()
+                if name and name not in definitions:
+                    definitions[name] = i
+            cls._I_definitions = definitions
+        return cls._I_definitions.get(die.AtName(), die)
+
+
+class BasicTypes:
+
+    # name : (byte_size, is_signed, is_float)
+    _basic = {
+        'void': (0, False, False),
+        'bool': (1, False, False),
+        'char': (1, True, False),
+        'signed char': (1, True, False),
+        'unsigned char': (1, False, False),
+        'short': (2, True, False),
+        'unsigned short': (2, False, False),
+        'char16_t': (2, False, False),
+        'int': (4, True, False),
+        'unsigned int': (4, False, False),
+        'long': (8, True, False),
+        'unsigned long': (8, False, False),
+        'long long': (8, True, False),
+        'unsigned long long': (8, False, False),
+        'float': (4, True, True),
+        'double': (8, True, True),
+    }
+
+    @classmethod
+    def GetType(cls, typ):
+        return Type(typ)
+
+    @classmethod
+    def Lookup(cls, name):
+        if name not in cls._basic:
+            return None
+        size, signed, is_float = cls._basic[name]
+        t = Type()
+        t._I_kind = Type.kBase
+        t._I_name = name
+        t._I_size = size
+        t._I_signed = signed
+        t._I_float = is_float
+        return t
+
+
+class Command(intf.Command):
+
+    _cxpr = None
+
+    # registered commands, {cxpr: Command()}
+    _I_commands = {}
+
+    def __init__(self):
+        pass
+
+    @classmethod
+    def Register(cls):
+        Command._I_commands[cls._cxpr] = cls()
+
+    @classmethod
+    def Execute(cls, command):
+        """ execute a command line, e.g. 'heap snapshot core.heapsnapshot'
+        """
+        line = command.strip()
+        if len(line) == 0 or line.startswith('#'):
+            return
+        arr = line.split(None, 1)
+        pyo = Command._I_commands.get(arr[0])
+        if pyo is None:
+            print("error: '%s' is not a valid command." % arr[0])
+            return
+        pyo.Dispatch(arr[1] if len(arr) > 1 else '')
+
+
+class Block(intf.Block):
+
+    _address = None
+
+    @property
+    def address(self):
+        return self._address
+
+    def LoadPtr(self, off):
+        return Target.ReadInt(self._address + off, 8)
+
+    def LoadU64(self, off):
+        return Target.ReadInt(self._address + off, 8)
+
+    def LoadU32(self, off):
+        return Target.ReadInt(self._address + off, 4)
+
+    def LoadU16(self, off):
+        return Target.ReadInt(self._address + off, 2)
+
+    def LoadU8(self, off):
+        return Target.ReadInt(self._address + off, 1)
+
+    def LoadDouble(self, off):
+        address = self._address + off
+        return Target.ReadDouble(address)
+
+    """ String function.
+    """
+    def GetCString(self, length=-1):
+        return Target.ReadCStr(self.address, length=length)
+
+    def LoadCString(self, off, length = -1):
+        address = self.address + off
+        return Target.ReadCStr(address, length=length)
+
+    def LoadUString(self, off, length = -1):
+        address = self.address + off
+        return Target.ReadUStr(address, length=length)
+
+
+class Value(intf.Value):
+    """ a Value is a Type at memory address (lvalue),
+        or a computed Type value, e.g. pointer created from integer.
+    """
+
+    # holds the Type
+    _I_type = None
+
+    # memory address of the value
+    _I_loc = None
+
+    # computed value, used when _I_loc is None
+    _I_data = None
+
+    def __init__(self, pyo_value=None):
+        if isinstance(pyo_value, Value):
+            self._I_type = pyo_value._I_type
+            self._I_loc = pyo_value._I_loc
+            self._I_data = pyo_value._I_data
+        elif pyo_value is None:
+            pass
+        else:
+            raise Exception
+
+    @staticmethod
+    def _Create(pyo_type, loc=None, data=None):
+        o = Value()
+        o._I_type = pyo_type
+        o._I_loc = loc
+        o._I_data = data
+        return o
+
+    def __getitem__(self, member_name_or_index):
+        if isinstance(member_name_or_index, py23.integer_types):
+            t = self._I_type.Strip()
+            elem = t.GetTarget()
+            if t._I_kind == Type.kPointer:
+                base = int(self)
+            elif t._I_kind == Type.kArray:
+                base = self._I_loc
+            else:
+                raise IndexError(member_name_or_index)
+            return Value._Create(elem, loc=base + member_name_or_index * elem.SizeOf())
+
+        v = self
+        if v.is_pointer:
+            v = v.Dereference()
+        member = v._I_type.Strip().FindMember(member_name_or_index)
+        if member is None:
+            raise KeyError("There is no member named %s." % member_name_or_index)
+        off, typ = member
+        return Value._Create(typ, loc=v._I_loc + off)
+
+    @classmethod
+    def CreateTypedAddress(cls, pyo_type, address):
+        return Value._Create(pyo_type, data=int(address))
+
+    @classmethod
+    def CreateFromString(cls, type_name, address):
+        t = Type.LookupType(type_name)
+        if t is None:
+            return None
+        return cls.CreateTypedAddress(t.GetPointerType(), address)
+
+    def Cast(self, pyo_type):
+        return Value._Create(pyo_type, loc=self._I_loc, data=self._I_data)
+
+    """ pointer and reference
+    """
+
+    @property
+    def address(self):
+        if self.is_pointer:
+            return int(self)
+        return self._I_loc
+
+    def IsPointerType(self):
+        return self._I_type.IsPointerType()
+
+    is_pointer = property(IsPointerType)
+
+    @property
+    def size(self):
+        return self._I_type.SizeOf()
+
+    def GetType(self):
+        return self._I_type
+
+    def has(self, name):
+        try:
+            self[name]
+            return True
+        except:
+            return False
+
+    def AddressOf(self):
+        if self._I_loc is None:
+            return None
+        return Value._Create(self._I_type.GetPointerType(), data=self._I_loc)
+
+    def Dereference(self):
+        if not self.is_pointer:
+            return None
+        return Value._Create(self._I_type.Strip().GetTarget(), loc=int(self))
+
+    """ String function.
+    """
+    def GetCString(self, length=-1):
+        return Target.ReadCStr(self.address, length=length)
+
+    def LoadCString(self, off, length = -1):
+        address = self.address + off
+        return Target.ReadCStr(address, length=length)
+
+    def LoadUString(self, off, length = -1):
+        address = self.address + off
+        return Target.ReadUStr(address, length=length)
+
+    """ Load functions.
+    """
+    def LoadType(self, off, typ):
+        """ Load 'type' value from offset """
+        v = Value.CreateFromString(typ, self.address + off)
+        return v
+
+    def LoadIntValue(self, off, size=1, is_signed=False):
+        return Target.ReadInt(self.address + off, size, is_signed)
+
+    def LoadPtr(self, off):
+        return self.LoadIntValue(off, 8, is_signed=False)
+
+    def LoadU8(self, off):
+        return self.LoadIntValue(off, 1, is_signed=False)
+
+    def LoadU16(self, off):
+        return self.LoadIntValue(off, 2, is_signed=False)
+
+    def LoadU32(self, off):
+        return self.LoadIntValue(off, 4, is_signed=False)
+
+    def LoadU64(self, off):
+        return self.LoadIntValue(off, 8, is_signed=False)
+
+    def LoadS8(self, off):
+        return self.LoadIntValue(off, 1, is_signed=True)
+
+    def LoadS16(self, off):
+        return self.LoadIntValue(off, 2, is_signed=True)
+
+    def LoadS32(self, off):
+        return self.LoadIntValue(off, 4, is_signed=True)
+
+    def LoadS64(self, off):
+        return self.LoadIntValue(off, 8, is_signed=True)
+
+    def LoadDouble(self, off):
+        address = self.address + off
+        return Target.ReadDouble(address)
+
+    """ magic methods
+    """
+    def __eq__(self, other):
+        if isinstance(other, Value):
+            return self.address == other.address
+        elif isinstance(other, py23.integer_types):
+            return int(self) == int(other)
+        return False
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __int__(self):
+        """ return the integer number for pointer, integer and enum values,
+            return the start address for struct, class and array values.
+        """
+        if self._I_data is not None:
+            return self._I_data
+
+        t = self._I_type.Strip()
+        if t._I_kind == Type.kStruct or t._I_kind == Type.kArray:
+            return self._I_loc
+
+        size = min(t.SizeOf(), 8)
+        if size not in (1, 2, 4, 8):
+            raise Exception('Cannot convert value to int.')
+
+        if t._I_float:
+            if size == 8:
+                return int(Target.ReadDouble(self._I_loc))
+            return int(struct.unpack('<f', Target.MemoryRead(self._I_loc, 4))[0])
+        return Target.ReadInt(self._I_loc, size, t._I_signed)
+
+    def __add__(self, other):
+        if self.is_pointer and isinstance(other, py23.integer_types):
+            t = self._I_type.Strip()
+            return Value._Create(self._I_type, data=int(self) + other * t.GetTarget().SizeOf())
+        return int(self) + int(other)
+
+    def __sub__(self, other):
+        if self.is_pointer and isinstance(other, py23.integer_types):
+            t = self._I_type.Strip()
+            return Value._Create(self._I_type, data=int(self) - other * t.GetTarget().SizeOf())
+        return int(self) - int(other)
+
+    def __str__(self):
+        t = self._I_type.Strip()
+        if t._I_kind == Type.kStruct or t._I_kind == Type.kArray:
+            return "(%s) @0x%x" % (self._I_type, self._I_loc)
+        elif t._I_kind == Type.kPointer:
+            return "(%s) 0x%x" % (self._I_type, int(self))
+        return "(%s) %d" % (self._I_type, int(self))
+
+
+class Type(intf.Type):
+    """ a Type built from a DWARF die,
+        or synthesized (basic types, pointer to types, array of types).
+    """
+
+    # kinds
+    kBase = 0
+    kPointer = 1
+    kArray = 2
+    kStruct = 3
+    kEnum = 4
+    kTypedef = 5
+    kOther = 6
+
+    # holds the RawDie
+    _I_type = None
+
+    _I_kind = kOther
+    _I_name = None
+    _I_size = 0
+    _I_signed = False
+    _I_float = False
+
+    # pointee, element or aliased Type
+    _I_target = None
+    _I_count = 0
+
+    # members, {name: (offset, Type)}
+    _I_members = None
+
+    # Type by die offset
+    _die_types = {}
+
+    def __init__(self, pyo_type=None):
+        if isinstance(pyo_type, Type):
+            self.__dict__.update(pyo_type.__dict__)
+        elif pyo_type is not None:
+            raise Exception
+
+    @classmethod
+    def FromDie(cls, die):
+        """ return Type for the RawDie, cached by die offset.
+        """
+        if die.secoff in cls._die_types:
+            return cls._die_types[die.secoff]
+
+        tag = die.Tag()
+        if tag in STRUCT_TAGS and die.GetAt(AT.DW_AT_declaration) is not None:
+            die = DieIndex.Definition(die)
+
+        t = Type()
+        t._I_type = die
+        t._I_name = die.AtName()
+        size = die.AtByteSize()
+        t._I_size = size if size else 0
+
+        if tag == TAG.DW_TAG_base_type:
+            t._I_kind = cls.kBase
+            enc = die.GetAt(AT.DW_AT_encoding)
+            enc = int(enc.unsigned) if enc else 0
+            t._I_signed = enc in (ATE.DW_ATE_signed, ATE.DW_ATE_signed_char, ATE.DW_ATE_float)
+            t._I_float = enc == ATE.DW_ATE_float
+        elif tag in POINTER_TAGS:
+            t._I_kind = cls.kPointer
+            t._I_size = 8
+        elif tag in TYPEDEF_TAGS:
+            t._I_kind = cls.kTypedef
+        elif tag == TAG.DW_TAG_array_type:
+            t._I_kind = cls.kArray
+            t._I_count = 0
+            raw = GetRawDwarf()
+            for i in raw.WalkDiesNoChild(die):
+                if i.Tag() != TAG.DW_TAG_subrange_type:
+                    continue
+                count = i.GetAt(AT.DW_AT_count)
+                upper = i.GetAt(AT.DW_AT_upper_bound)
+                if count is not None:
+                    t._I_count = int(count.unsigned)
+                elif upper is not None:
+                    t._I_count = int(upper.unsigned) + 1
+                break
+        elif tag in STRUCT_TAGS:
+            t._I_kind = cls.kStruct
+        elif tag == TAG.DW_TAG_enumeration_type:
+            t._I_kind = cls.kEnum
+        else:
+            t._I_kind = cls.kOther
+
+        cls._die_types[die.secoff] = t
+        return t
+
+    @classmethod
+    def LookupType(cls, type_name):
+        name = type_name.strip()
+        if name.endswith('*'):
+            t = cls.LookupType(name[:-1])
+            if t is None:
+                return None
+            return t.GetPointerType()
+
+        t = BasicTypes.Lookup(name)
+        if t is not None:
+            return t
+
+        die = DieIndex.Find(name)
+        if die is None:
+            return None
+        t = Type(cls.FromDie(die))
+        t._I_name = name
+        return t
+
+    def GetTarget(self):
+        """ return the pointee/element/aliased Type, 'void' if not typed.
+        """
+        if self._I_target is None:
+            die = self._I_type.AtType() if self._I_type else None
+            if die is None:
+                self._I_target = BasicTypes.Lookup('void')
+            else:
+                die.Decode()
+                self._I_target = Type.FromDie(die)
+        return self._I_target
+
+    def Strip(self):
+        """ strip typedefs and cv-qualifiers """
+        t = self
+        while t._I_kind == Type.kTypedef:
+            t = t.GetTarget()
+        return t
+
+    def GetPointerType(self):
+        t = Type()
+        t._I_kind = Type.kPointer
+        t._I_size = 8
+        t._I_target = self
+        return t
+
+    def GetArrayType(self, size):
+        t = Type()
+        t._I_kind = Type.kArray
+        t._I_count = size
+        t._I_target = self
+        return t
+
+    def GetEnumMembers(self):
+        t = self.Strip()
+        if t._I_kind != Type.kEnum:
+            return []
+        out = []
+        raw = GetRawDwarf()
+        for die in raw.WalkDiesNoChild(t._I_type):
+            if die.Tag() != TAG.DW_TAG_enumerator:
+                continue
+            out.append({"name": die.AtName(), "value": die.GetConstValue()})
+        return out
+
+    def FindMember(self, name):
+        """ return (offset, Type) of the member (include base classes), or None.
+        """
+        if self._I_members is None:
+            self._I_members = self._LoadMembers()
+        return self._I_members.get(name)
+
+    def _LoadMembers(self):
+        members = {}
+        if self._I_kind != Type.kStruct or self._I_type is None:
+            return members
+
+        raw = GetRawDwarf()
+        for off, die in raw.IterMembers(self._I_type):
+            name = die.AtName()
+            if name in members:
+                continue
+            typ_die = die.AtType()
+            typ_die.Decode()
+            members[name] = (off, Type.FromDie(typ_die))
+        return members
+
+    def SizeOf(self):
+        t = self.Strip()
+        if t._I_kind == Type.kPointer:
+            return 8
+        elif t._I_kind == Type.kArray:
+            return t._I_count * t.GetTarget().SizeOf()
+        return t._I_size
+
+    def IsIntergralType(self):
+        t = self.Strip()
+        if t._I_kind == Type.kEnum:
+            return True
+        return t._I_kind == Type.kBase and not t._I_float and t._I_size > 0
+
+    IsIntegralType = IsIntergralType
+
+    def IsFloatType(self):
+        t = self.Strip()
+        return t._I_kind == Type.kBase and t._I_float
+
+    def IsPointerType(self):
+        return self.Strip()._I_kind == Type.kPointer
+
+    def GetTemplateArgument(self, index):
+        t = self.Strip()
+        raw = GetRawDwarf()
+        i = 0
+        for die in raw.WalkDiesNoChild(t._I_type):
+            if die.Tag() != TAG.DW_TAG_template_type_parameter:
+                continue
+            if i == index:
+                typ_die = die.AtType()
+                typ_die.Decode()
+                return Type.FromDie(typ_die)
+            i += 1
+        raise IndexError(index)
+
+    def __str__(self):
+        if self._I_kind == Type.kPointer:
+            return "%s *" % self.GetTarget()
+        elif self._I_kind == Type.kArray:
+            return "%s [%d]" % (self.GetTarget(), self._I_count)
+        elif self._I_name is None:
+            return "(anonymous)"
+        return self._I_name
+
+    def __eq__(self, other):
+        if not isinstance(other, Type):
+            return False
+        a = self.Strip()
+        b = other.Strip()
+        if a._I_type is not None or b._I_type is not None:
+            return a._I_type is not None and b._I_type is not None and \
+                a._I_type.secoff == b._I_type.secoff
+        if a._I_kind != b._I_kind:
+            return False
+        if a._I_kind == Type.kBase:
+            return a._I_name == b._I_name
+        return a.GetTarget() == b.GetTarget()
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    __hash__ = object.__hash__
+
+
+class Thread(intf.Thread):
+    """ thread from NT_PRSTATUS note.
+    """
+
+    # registers of x86_64 user_regs_struct
+    kRegsX64 = ['r15', 'r14', 'r13', 'r12', 'rbp', 'rbx', 'r11', 'r10',
+                'r9', 'r8', 'rax', 'rcx', 'rdx', 'rsi', 'rdi', 'orig_rax',
+                'rip', 'cs', 'eflags', 'rsp', 'ss', 'fs_base', 'gs_base',
+                'ds', 'es', 'fs', 'gs']
+
+    # registers of aarch64 user_pt_regs
+    kRegsArm64 = ['x%d' % i for i in range(31)] + ['sp', 'pc', 'pstate']
+
+    # offset of pr_reg in elf_prstatus
+    kPrRegOffset = 112
+
+    def __init__(self, prstatus=None):
+        self._I_thread = prstatus
+        self._I_regs = {}
+        if prstatus is None:
+            return
+        names = self.kRegsArm64 if arch == 'aarch64' else self.kRegsX64
+        for i, name in enumerate(names):
+            off = self.kPrRegOffset + i * 8
+            if off + 8 > len(prstatus):
+                break
+            self._I_regs[name] = struct.unpack_from('<Q', prstatus, off)[0]
+
+    @property
+    def tid(self):
+        return struct.unpack_from('<I', self._I_thread, 32)[0]
+
+    @property
+    def name(self):
+        return ''
+
+    def GetRegister(self, name):
+        return self._I_regs.get(name)
+
+    def GetFrameTop(self):
+        return Frame(self)
+
+    @classmethod
+    def BacktraceCurrent(cls, parser):
+        frame = Target.GetCurrentThread().GetFrameTop()
+        v8f = parser(frame)
+        if v8f:
+            print("#%-2d %s" % (0, v8f.Description()))
+        else:
+            print("#%-2d %s" % (0, frame.Description()))
+
+    @classmethod
+    def GetV8Frames(cls, parser):
+        frame = Target.GetCurrentThread().GetFrameTop()
+        v8f = parser(frame)
+        if v8f:
+            return [v8f.Flatten()]
+        return [frame.Flatten()]
+
+    def GetEnviron(self):
+        top = self.GetFrameTop()
+        sp = top.GetSP()
+        if not sp:
+            return None
+        mmap = Target.GetMemoryRegions().Search(sp)
+        if not mmap:
+            return None
+
+        names = []
+        hit = 0
+        addr = mmap.end_address - 8
+        for i in range(4096*100):
+            p = addr - i
+            c = Target.ReadInt(p, 1)
+            if c == 0:
+                hit = hit + 1
+            else:
+                hit = 0
+            if hit > 64:
+                env_start = p + 64
+                env_end = mmap.end_address - 8
+                env_len = env_end - env_start
+                names = Target.MemoryRead(env_start, env_len).decode('utf8').split('\0')
+                names = filter(lambda x: x != "", names)
+                break
+        return names
+
+
+class Symval(intf.Symval):
+    pass
+
+
+class Frame(intf.Frame):
+    """ only the top frame is available, no unwinding.
+    """
+
+    def GetSP(self):
+        return self._I_frame.GetRegister('sp' if arch == 'aarch64' else 'rsp')
+
+    def GetPC(self):
+        return self._I_frame.GetRegister('pc' if arch == 'aarch64' else 'rip')
+
+    def GetFP(self):
+        return self._I_frame.GetRegister('x29' if arch == 'aarch64' else 'rbp')
+
+    def GetRegister(self, name):
+        return self._I_frame.GetRegister(name)
+
+    def GetFunctionName(self):
+        return Target.LookupFunction(self.GetPC())
+
+    def GetArgs(self):
+        return []
+
+    def GetLocals(self):
+        return []
+
+    def GetPosition(self):
+        return None
+
+
+class MemoryRegionInfo(intf.MemoryRegionInfo):
+    pass
+
+
+class MemoryRegions(intf.MemoryRegions):
+    _I_regions = None
+
+    # p_flags
+    PF_X = 1
+    PF_W = 2
+    PF_R = 4
+
+    @classmethod
+    def LoadFromCore(cls):
+        files = []
+        if core.GetNotes():
+            files = core.GetNtFiles() or []
+        for i, p in enumerate(core.GetPhdrs()):
+            if p['p_type'] != CoreMemory.PT_LOAD:
+                continue
+
+            v = 0
+            if p['p_flags'] & cls.PF_R: v |= MemoryRegionInfo.READ
+            if p['p_flags'] & cls.PF_W: v |= MemoryRegionInfo.WRITE
+            if p['p_flags'] & cls.PF_X: v |= MemoryRegionInfo.EXECUTE
+
+            pyo = MemoryRegionInfo()
+            pyo._I_mode = v
+            pyo._I_start_address = p['p_vaddr']
+            pyo._I_end_address = p['p_vaddr'] + p['p_memsz']
+            pyo._I_name = "load%d" % i
+            for f in files:
+                if f['start_addr'] <= p['p_vaddr'] < f['end_addr']:
+                    pyo._I_name = f['name']
+                    break
+
+            cls._I_regions.append(pyo)
+
+    @classmethod
+    def Load(cls):
+        if cls._I_regions is None:
+            cls._I_regions = []
+            cls.LoadFromCore()
+        return cls._I_regions
+
+
+class ConvenienceVariables(object):
+
+    _I_vars = {}
+
+    @classmethod
+    def Get(cls, name):
+        return cls._I_vars.get(name)
+
+    @classmethod
+    def Set(cls, name, value):
+        print("$%s = %s" % (name, value))
+        cls._I_vars[name] = value
+
+
+""" Target
+"""
+class Target(intf.Target):
+
+    # threads from NT_PRSTATUS
+    _I_threads = None
+
+    # function symbols sorted by address, for frame names
+    _I_functions = None
+
+    @classmethod
+    def GetThreads(cls):
+        if cls._I_threads is None:
+            cls._I_threads = []
+            for (name, desc, n_type) in core.GetNotes() or []:
+                if n_type == Elf.NTYPE.NT_PRSTATUS:
+                    cls._I_threads.append(Thread(desc))
+        return cls._I_threads
+
+    @classmethod
+    def GetCurrentThread(cls):
+        threads = cls.GetThreads()
+        if len(threads) == 0:
+            return None
+        # the first thread is the one received the signal.
+        return threads[0]
+
+    @classmethod
+    def GetMemoryRegions(cls):
+        m = MemoryRegions()
+        m.Load()
+        return m
+
+    @classmethod
+    def AddDwfFile(cls, filename):
+        # types are read from andb.dbg.Dwf directly.
+        pass
+
+    @classmethod
+    def GetCoreFile(cls):
+        return core_file
+
+    @classmethod
+    def GetSymbols(cls):
+        if program is None:
+            return {}
+        return program.GetSymbols()
+
+    @classmethod
+    def LookupSymbol(cls, symbol_name):
+        """ return (address, size) of the symbol, or None.
+        """
+        syms = cls.GetSymbols()
+        for name in (symbol_name, Mangle(symbol_name)):
+            if name in syms:
+                value, size = syms[name]
+                return (value + program_bias, size)
+        return None
+
+    @classmethod
+    def LookupFunction(cls, address):
+        """ return the symbol name contains the address, or None.
+        """
+        from bisect import bisect_right
+        if cls._I_functions is None:
+            cls._I_functions = sorted([
+                (v[0] + program_bias, v[1], k) for k, v in cls.GetSymbols().items() if v[1] > 0])
+        if address is None:
+            return None
+        i = bisect_right(cls._I_functions, (address, 1 << 64)) - 1
+        if i < 0:
+            return None
+        start, size, name = cls._I_functions[i]
+        if address < start + size:
+            return name
+        return None
+
+    @classmethod
+    def LoadRaw(cls, name):
+        """ read raw value of a global variable, e.g. "'v8::internal::Version'::major_"
+        """
+        return cls.ReadSymbolValue(name.replace("'", ""))
+
+    @classmethod
+    def ReadSymbolAddress(cls, symbol_name):
+        sym = cls.LookupSymbol(symbol_name)
+        if sym is None:
+            return None
+        return sym[0]
+
+    @classmethod
+    def ReadSymbolValue(cls, symbol_name):
+        sym = cls.LookupSymbol(symbol_name)
+        if sym is None:
+            return None
+        address, size = sym
+        if size not in (1, 2, 4, 8):
+            size = 8
+        return cls.ReadInt(address, size)
+
+    @classmethod
+    def _ReadUntilZero(cls, address, char_size, max_size=4096):
+        """ read bytes until a zero char, at most max_size bytes.
+        """
+        out = []
+        step = 256
+        while max_size > 0:
+            size = min(step, max_size)
+            s = cls.MemoryRead(address, size)
+            if s is None:
+                # cross the segment end, try a smaller read.
+                if step == char_size:
+                    break
+                step = char_size
+                continue
+            for i in range(0, len(s), char_size):
+                if s[i:i + char_size] == b'\0' * char_size:
+                    out.append(s[:i])
+                    return b''.join(out)
+            out.append(s)
+            address += size
+            max_size -= size
+        return b''.join(out)
+
+    @classmethod
+    def ReadCStr(cls, address, length=-1):
+        if length == 0:
+            return ''
+        elif length > 0:
+            s = cls.MemoryRead(address, length)
+        else:
+            s = cls._ReadUntilZero(address, 1)
+        if s is None:
+            return None
+        return s.decode('utf8', 'ignore')
+
+    @classmethod
+    def ReadUStr(cls, address, length=-1):
+        if length == 0:
+            return ''
+        elif length > 0:
+            s = cls.MemoryRead(address, length * 2)
+        else:
+            s = cls._ReadUntilZero(address, 2)
+        if s is None:
+            return None
+        return s.decode('utf-16', 'ignore')
+
+    @classmethod
+    def ReadInt(cls, addr, byte_size=8, is_sign=0):
+        address = int(addr)
+
+        if not 1 <= byte_size <= 8:
+            raise Exception
+
+        v = CoreMemory.ReadInt(address, byte_size, is_sign)
+        if v is None:
+            raise MemoryError("Cannot access memory at address 0x%x" % address)
+        return v
+
+    @classmethod
+    def MemoryRead(cls, address, size):
+        s = CoreMemory.MemoryRead(address, size)
+        if s is None:
+            return None
+        return bytes(s)
+
+    @classmethod
+    def ReadDouble(cls, address):
+        v = CoreMemory.ReadDouble(address)
+        if v is None:
+            raise MemoryError("Cannot access memory at address 0x%x" % address)
+        return v
+
+    @classmethod
+    def MemoryDump(cls, file_to_save, start_address, end_address):
+        size = end_address - start_address
+        data = cls.MemoryRead(start_address, size)
+        with open(file_to_save, 'wb') as f:
+            f.write(data)
+
+    @classmethod
+    def TryDecodeIr(cls, addr):
+        return "0x%x: (no disassembler in core engine)" % addr
+
+print('core engine loaded')
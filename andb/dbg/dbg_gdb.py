@@ -10,6 +10,7 @@ import re
 import itertools
 
 from . import intf_dbg as intf
+from .core_memory import CoreMemory
 import andb.py23 as py23
 
 inferior = gdb.selected_inferior()
@@ -82,30 +83,37 @@ class Block(intf.Block):
     def address(self):
         return self._address
 
+    def LoadIntValue(self, off, byte_size, typ):
+        address = self._address + off
+        v = CoreMemory.ReadInt(address, byte_size)
+        if v is not None:
+            return v
+        return int(gdb.Value(address).cast(typ).dereference())
+
     def LoadPtr(self, off):
         #b = inferior.read_memory(self._address + off, 8)
         #return struct.unpack('Q', b)[0]
-        return int(gdb.Value(self._address + off).cast(BasicTypes.u64p_t).dereference())
+        return self.LoadIntValue(off, 8, BasicTypes.u64p_t)
 
     def LoadU64(self, off):
         #b = inferior.read_memory(self._address + off, 8)
         #return struct.unpack('Q', b)[0]
-        return int(gdb.Value(self._address + off).cast(BasicTypes.u64p_t).dereference())
+        return self.LoadIntValue(off, 8, BasicTypes.u64p_t)
 
     def LoadU32(self, off):
         #b = inferior.read_memory(self._address + off, 4)
         #return struct.unpack('I', b)[0]
-        return int(gdb.Value(self._address + off).cast(BasicTypes.u32p_t).dereference())
+        return self.LoadIntValue(off, 4, BasicTypes.u32p_t)
 
     def LoadU16(self, off):
         #b = inferior.read_memory(self._address + off, 2)
         #return struct.unpack('H', b)[0]
-        return int(gdb.Value(self._address + off).cast(BasicTypes.u16p_t).dereference())
+        return self.LoadIntValue(off, 2, BasicTypes.u16p_t)
 
     def LoadU8(self, off):
         #b = inferior.read_memory(self._address + off, 1)
         #return struct.unpack('B', b)[0]
-        return int(gdb.Value(self._address + off).cast(BasicTypes.u8p_t).dereference())
+        return self.LoadIntValue(off, 1, BasicTypes.u8p_t)
 
     def LoadDouble(self, off):
         address = self._address + off
@@ -244,40 +252,39 @@ class Value(intf.Value):
         v = Value.CreateFromString(typ, self.address + off)
         return v 
 
-    def LoadIntValue(self, off, typ):
-        v = gdb.Value(self.address + off).cast(typ).dereference()
-        return int(v)
+    def LoadIntValue(self, off, size=1, is_signed=False):
+        return Target.ReadInt(self.address + off, size, is_signed)
 
     def LoadPtr(self, off):
-        return self.LoadIntValue(off, BasicTypes.u64p_t)
+        return self.LoadIntValue(off, 8, is_signed=False)
 
     def LoadU8(self, off):
-        return self.LoadIntValue(off, BasicTypes.u8p_t)
+        return self.LoadIntValue(off, 1, is_signed=False)
 
     def LoadU16(self, off):
-        return self.LoadIntValue(off, BasicTypes.u16p_t)
+        return self.LoadIntValue(off, 2, is_signed=False)
     
     def LoadU32(self, off):
-        return self.LoadIntValue(off, BasicTypes.u32p_t)
+        return self.LoadIntValue(off, 4, is_signed=False)
    
     def LoadU64(self, off):
-        return self.LoadIntValue(off, BasicTypes.u64p_t)
+        return self.LoadIntValue(off, 8, is_signed=False)
 
     def LoadS8(self, off):
-        return self.LoadIntValue(off, BasicTypes.s8p_t)
+        return self.LoadIntValue(off, 1, is_signed=True)
 
     def LoadS16(self, off):
-        return self.LoadIntValue(off, BasicTypes.s16p_t)
+        return self.LoadIntValue(off, 2, is_signed=True)
  
     def LoadS32(self, off):
-        return self.LoadIntValue(off, BasicTypes.s32p_t)
+        return self.LoadIntValue(off, 4, is_signed=True)
    
     def LoadS64(self, off):
-        return self.LoadIntValue(off, BasicTypes.s64p_t)
+        return self.LoadIntValue(off, 8, is_signed=True)
 
     def LoadDouble(self, off):
         address = self.address + off
-        return TarGet.ReadDouble(address)
+        return Target.ReadDouble(address)
     
     """ magic methods
     """
@@ -673,6 +680,16 @@ class Target(intf.Target):
     def AddDwfFile(cls, filename):
         gdb.execute("add-symbol-file '%s'" % filename)
 
+    @classmethod
+    def GetCoreFile(cls):
+        """ return the corefile path, None if not debugging a corefile.
+        """
+        v = gdb.execute('info target', to_string = True)
+        m = re.search(r"Local core dump file:\s+`(.*)', file type", v)
+        if m is None:
+            return None
+        return m.group(1)
+
     @classmethod
     def LoadRaw(cls, name):
         """ read raw value from GDB """
@@ -743,6 +760,11 @@ class Target(intf.Target):
         if not 1 <= byte_size <= 8:
             raise Exception
 
+        # served from corefile if dumped.
+        v = CoreMemory.ReadInt(address, byte_size, is_sign)
+        if v is not None:
+            return v
+
         if is_sign:
             if byte_size == 1:
                 t = BasicTypes.s8p_t
@@ -767,33 +789,18 @@ class Target(intf.Target):
 
     @classmethod
     def MemoryRead(cls, address, size):
+        s = CoreMemory.MemoryRead(address, size)
+        if s is not None:
+            return bytes(s)
         inferior = gdb.selected_inferior()
         s = inferior.read_memory(address, size)
         return bytes(s)
 
-    @classmethod
-    def MemoryFind(cls, start, end, addr, byte_size=8):
-        cmd = "find /g 0x%x, 0x%x, 0x%x" % (start, end, addr)
-        out = ""
-        try:
-            out = gdb.execute(cmd, False, True)
-        except Exception as e:
-            print(start, end, e)
-        lines = out.splitlines(False)
-        find = []
-        for i in lines:
-            if i.startswith('0x'):
-                end = i.find(' ')
-                if end > 0:
-                    i = i[:end]
-                find.append(int(i, 16))
-        
-        if len(find) > 0:
-            return find
-        return None
-
     @classmethod
     def ReadDouble(cls, address):
+        v = CoreMemory.ReadDouble(address)
+        if v is not None:
+            return v
         t = BasicTypes.p_double 
         v = gdb.Value(address).cast(t).dereference()
         return v
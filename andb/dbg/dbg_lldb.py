@@ -3,6 +3,7 @@ from __future__ import print_function
 
 import lldb
 from . import intf_dbg as intf
+from .core_memory import CoreMemory
 import andb.py23 as py23
 import struct
 
@@ -85,25 +86,28 @@ class Block(intf.Block):
     def address(self):
         return self._address
 
-    def LoadPtr(self, off):
+    def LoadIntValue(self, off, byte_size):
+        address = self._address + off
+        v = CoreMemory.ReadInt(address, byte_size)
+        if v is not None:
+            return v
         error = lldb.SBError()
-        return process.ReadUnsignedFromMemory(self._address + off, 8, error)
+        return process.ReadUnsignedFromMemory(address, byte_size, error)
+
+    def LoadPtr(self, off):
+        return self.LoadIntValue(off, 8)
 
     def LoadU64(self, off):
-        error = lldb.SBError()
-        return process.ReadUnsignedFromMemory(self._address + off, 8, error)
+        return self.LoadIntValue(off, 8)
 
     def LoadU32(self, off):
-        error = lldb.SBError()
-        return process.ReadUnsignedFromMemory(self._address + off, 4, error)
+        return self.LoadIntValue(off, 4)
 
     def LoadU16(self, off):
-        error = lldb.SBError()
-        return process.ReadUnsignedFromMemory(self._address + off, 2, error)
+        return self.LoadIntValue(off, 2)
 
     def LoadU8(self, off):
-        error = lldb.SBError()
-        return process.ReadUnsignedFromMemory(self._address + off, 1, error)
+        return self.LoadIntValue(off, 1)
 
     def LoadDouble(self, off):
         address = self.address + off
@@ -264,10 +268,15 @@ class Value(intf.Value):
         address = self.address + off
         return Target.ReadUStr(address, length)
 
-    def LoadIntValue(self, off, size=1, is_signed = True):
-        e = lldb.SBError()
+    def LoadIntValue(self, off, size=1, is_signed=False):
         addr = self.address + off
+        v = CoreMemory.ReadInt(addr, size, is_signed)
+        if v is not None:
+            return v
+        e = lldb.SBError()
         v = process.ReadUnsignedFromMemory(addr, size, e)
+        if is_signed:
+            v = py23.SIC.toS64(v << (64 - size * 8)) >> (64 - size * 8)
         return int(v)
 
     def LoadPtr(self, off):
@@ -504,6 +513,7 @@ class MemoryRegionInfo(intf.MemoryRegionInfo):
 
 
 class MemoryRegions(intf.MemoryRegions):
+    _I_regions = None
 
     @classmethod
     def LoadMemoryRegions(cls):
@@ -530,7 +540,10 @@ class MemoryRegions(intf.MemoryRegions):
 
     @classmethod
     def Load(cls):
-        cls.LoadMemoryRegions()
+        if cls._I_regions is None:
+            cls._I_regions = []
+            cls.LoadMemoryRegions()
+        return cls._I_regions
 
 class ConvenienceVariables(object):
 
@@ -620,6 +633,19 @@ class Target(intf.Target):
     def AddDwfFile(cls, filename):
         debugger.HandleCommand("im add '%s'" % filename) 
 
+    @classmethod
+    def GetCoreFile(cls):
+        """ return the corefile path, None if not debugging a corefile.
+        """
+        try:
+            f = process.GetCoreFile()
+        except AttributeError:
+            # SBProcess.GetCoreFile() is not supported in old lldb.
+            return None
+        if not f.IsValid():
+            return None
+        return f.fullpath
+
     @classmethod
     def ReadInt(cls, addr, byte_size=8, is_sign=0):
         #if not isinstance(address, int):
@@ -629,6 +655,11 @@ class Target(intf.Target):
         if not 1 <= byte_size <= 8:
             raise Exception
 
+        # served from corefile if dumped.
+        v = CoreMemory.ReadInt(address, byte_size, is_sign)
+        if v is not None:
+            return v
+
         # read unsgiend int from memory by byte_size
         v = process.ReadUnsignedFromMemory(address, byte_size, cls._error)
         if not cls._error.Success():
@@ -729,34 +760,13 @@ class Target(intf.Target):
 
     @classmethod
     def MemoryRead(cls, address, size):
+        s = CoreMemory.MemoryRead(address, size)
+        if s is not None:
+            return bytes(s)
         s = process.ReadMemory(address, size, cls._error)
         cls._error.Clear()
         return bytes(s)
 
-    @classmethod
-    def MemoryFind(cls, start, end, addr, byte_size=8):
-        cmd = "mem find -c 100000 -e 0x%x -- 0x%x 0x%x" % (addr, start, end)
-        out = ""
-        try:
-            interpreter = debugger.GetCommandInterpreter()
-            res = lldb.SBCommandReturnObject()
-            interpreter.HandleCommand(cmd, res)
-            out = res.GetOutput()
-        except Exception as e:
-            print(start, end, e)
-        lines = out.splitlines(False)
-        find = []
-        for i in lines:
-            if i.startswith('data found at '):
-                end = i.find('0x')
-                if end > 0:
-                    i = i[end:]
-                find.append(int(i, 16))
-        
-        if len(find) > 0:
-            return find
-        return None
-
     @classmethod
     def MemoryDump(cls, file_to_save, start_address, end_address):
         size = end_address - start_address
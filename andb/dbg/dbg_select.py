@@ -1,6 +1,7 @@
 # -*- coding: UTF-8 -*-
 
 from __future__ import print_function, division
+import os
 
 def isGDB():
     try:
@@ -20,8 +21,14 @@ def isLLDB():
     except:
         return False
 
+def isCORE():
+    return os.environ.get('ANDB_ENGINE') == 'core'
+
 type = 'unknown'
-if isLLDB():
+if isCORE():
+    from .dbg_core import *
+    type = "core"
+elif isLLDB():
     from .dbg_lldb import *
     type = "lldb"
 elif isGDB():
@@ -4,6 +4,9 @@ from __future__ import print_function, division
 """ defined a common debugger interface.
 """
 
+import heapq
+from bisect import bisect_right
+
 class Command(object):
     """ Register User-defined Command
     """
@@ -783,15 +786,19 @@ class MemoryRegionInfo:
     def IsExecutable(self):
         return bool(self._I_mode & 4)
 
-    def __str__(self):
+    @property
+    def mode_str(self):
         mode_str = "r" if self._I_mode & self.READ else '-'
         mode_str += "w" if self._I_mode & self.WRITE else '-'
         mode_str += "x" if self._I_mode & self.EXECUTE else '-'
+        return mode_str
+
+    def __str__(self):
         return " 0x%x-0x%x %s %s %d" % (
                 self.start_address,
                 self.end_address,
                 self.name,
-                mode_str,
+                self.mode_str,
                 self.size)
 
 class MemoryRegions:
@@ -800,6 +807,10 @@ class MemoryRegions:
     
     # holds the regions list
     _I_regions = [] 
+
+    # sorted non-overlapped intervals of the regions, 
+    # (regions, count, [start], [end], [MemoryRegionInfo])
+    _I_index = None
  
     @classmethod
     def GetRegions(cls):
@@ -835,17 +846,98 @@ class MemoryRegions:
             return None
         return bool(mode_v & m.mode == mode_v)
 
+    @classmethod
+    def BuildIndex(cls):
+        """ split the regions into sorted non-overlapped intervals,
+            the interval belongs to the first region (in list order) covers it.
+        """
+        regions = cls._I_regions
+        order = sorted(range(len(regions)), key=lambda i: regions[i].start_address)
+        points = set()
+        for i in regions:
+            points.add(i.start_address)
+            points.add(i.end_address)
+        points = sorted(points)
+
+        starts = []
+        ends = []
+        infos = []
+        active = []
+        k = 0
+        for j in range(len(points) - 1):
+            p = points[j]
+            while k < len(order) and regions[order[k]].start_address <= p:
+                i = order[k]
+                heapq.heappush(active, (i, regions[i].end_address))
+                k += 1
+            while active and active[0][1] <= p:
+                heapq.heappop(active)
+            if not active:
+                continue
+
+            m = regions[active[0][0]]
+            if infos and infos[-1] is m and ends[-1] == p:
+                ends[-1] = points[j + 1]
+            else:
+                starts.append(p)
+                ends.append(points[j + 1])
+                infos.append(m)
+
+        cls._I_index = (regions, len(regions), starts, ends, infos)
+        return cls._I_index
+
+    @classmethod
+    def GetIndex(cls):
+        """ return the index, rebuild if the regions are changed.
+        """
+        index = cls._I_index
+        if index is None or index[0] is not cls._I_regions or \
+                index[1] != len(cls._I_regions):
+            index = cls.BuildIndex()
+        return index
+
     @classmethod
     def Search(cls, address):
         """ return MemoryRegionInfo if found, 
             otherwise None.
         """
         ptr = int(address)
-        for i in cls._I_regions:
-            if ptr >= i.start_address and ptr < i.end_address:
-                return i
+        _, _, starts, ends, infos = cls.GetIndex()
+        i = bisect_right(starts, ptr) - 1
+        if i >= 0 and ptr < ends[i]:
+            return infos[i]
         return None
 
+    @classmethod
+    def SearchAll(cls, addresses):
+        """ batch Search(), return [MemoryRegionInfo or None] in same order.
+        """
+        _, _, starts, ends, infos = cls.GetIndex()
+        out = []
+        for address in addresses:
+            ptr = int(address)
+            i = bisect_right(starts, ptr) - 1
+            if i >= 0 and ptr < ends[i]:
+                out.append(infos[i])
+            else:
+                out.append(None)
+        return out
+
+    @classmethod
+    def Stats(cls):
+        """ return bytes by permission and by name,
+            ({mode_str: bytes}, {name: bytes}), overlaps are counted once.
+        """
+        _, _, starts, ends, infos = cls.GetIndex()
+        by_mode = {}
+        by_name = {}
+        for i in range(len(starts)):
+            size = ends[i] - starts[i]
+            m = infos[i]
+            by_mode[m.mode_str] = by_mode.get(m.mode_str, 0) + size
+            by_name[m.name] = by_name.get(m.name, 0) + size
+        return (by_mode, by_name)
+
     @classmethod
     def Load(cls):
         """ load memory regions info from debugger.
@@ -895,6 +987,12 @@ class Target:
         """
         raise NotImplementedError()
 
+    @classmethod
+    def GetCoreFile(cls):
+        """ return path of the corefile, None for live process.
+        """
+        raise NotImplementedError()
+
     @classmethod
     def LoadRaw(cls, value_name):
         """ Load global variable by linkage name
@@ -944,3 +1042,37 @@ class Target:
         """
         raise NotImplementedError()
 
+    @classmethod
+    def MemoryRead(cls, address, size):
+        """ read bytes from memory.
+        """
+        raise NotImplementedError()
+
+    @classmethod
+    def MemoryFind(cls, start, end, addr, byte_size=8):
+        """ search value in [start, end), aligned to byte_size.
+            return [address] or None if not found.
+        """
+        found = cls.MemoryFindAll(start, end, [addr], byte_size)
+        return found.get(int(addr))
+
+    @classmethod
+    def MemoryFindAll(cls, start, end, values, byte_size=8):
+        """ search all values in [start, end) in one sweep.
+            return {value: [address]}
+        """
+        if not CoreMemory.IsLoaded():
+            return MemorySearch.Find(cls.MemoryRead, start, end, values, byte_size)
+
+        # only the dumped parts are searched, the others are not readable
+        found = {}
+        for lo, hi in CoreMemory.DumpedRanges(int(start), int(end)):
+            r = MemorySearch.Find(cls.MemoryRead, lo, hi, values, byte_size)
+            for k, v in r.items():
+                if k not in found:
+                    found[k] = []
+                found[k].extend(v)
+        return found
+
+from .memory_search import MemorySearch
+from .core_memory import CoreMemory
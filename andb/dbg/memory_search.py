@@ -0,0 +1,123 @@
+# -*- coding: UTF-8 -*-
+from __future__ import print_function, division
+
+""" andb.dbg.memory_search : search values in target memory.
+
+    the memory is read in blocks and searched by bytes.find() or a set
+    intersection over the decoded words, all needles are searched in one
+    sweep. only the matches aligned to the value size are reported.
+"""
+
+import struct
+from array import array
+
+
+class MemorySearch:
+    """ singleton
+    """
+
+    # bytes read at once
+    kBlockSize = 4 * 1024 * 1024
+
+    # unreadable block is retried by pages
+    kPageSize = 4096
+
+    # more needles than this are matched by set intersection
+    kMaxFindNeedles = 8
+
+    # (struct format, array typecode) by byte_size
+    _formats = {
+        1: ('<B', 'B'),
+        2: ('<H', 'H'),
+        4: ('<I', 'I'),
+        8: ('<Q', 'Q'),
+    }
+
+    @classmethod
+    def ReadBlock(cls, read, address, size):
+        """ read the block, return bytes or None.
+        """
+        try:
+            data = read(address, size)
+        except Exception:
+            return None
+        if data is None or len(data) != size:
+            return None
+        return bytes(data)
+
+    @classmethod
+    def Blocks(cls, read, start, end):
+        """ yield (address, bytes) of the readable blocks in [start, end).
+        """
+        address = start
+        while address < end:
+            size = min(cls.kBlockSize, end - address)
+            data = cls.ReadBlock(read, address, size)
+            if data is not None:
+                yield (address, data)
+            else:
+                # retry by pages, skip the unreadable ones.
+                page = address
+                while page < address + size:
+                    n = min(cls.kPageSize - (page % cls.kPageSize), address + size - page)
+                    data = cls.ReadBlock(read, page, n)
+                    if data is not None:
+                        yield (page, data)
+                    page += n
+            address += size
+
+    @classmethod
+    def FindInBlock(cls, data, needle, align):
+        """ return aligned offsets of needle (bytes) in data.
+        """
+        out = []
+        i = data.find(needle)
+        while i >= 0:
+            if i % align == 0:
+                out.append(i)
+                i = data.find(needle, i + align)
+            else:
+                i = data.find(needle, i + 1)
+        return out
+
+    @classmethod
+    def Find(cls, read, start, end, needles, byte_size=8):
+        """ search all needles in [start, end),
+
+            read : function(address, size) returns bytes
+            needles : iterable of int values
+            return {needle: [address]}, only found needles are included.
+        """
+        fmt, code = cls._formats[byte_size]
+        start = int(start)
+        end = int(end)
+        needles = set(int(i) for i in needles)
+        found = {}
+        if len(needles) == 0 or end <= start:
+            return found
+
+        # keep blocks aligned to the value size
+        start = (start + byte_size - 1) // byte_size * byte_size
+        packed = dict((n, struct.pack(fmt, n)) for n in needles)
+
+        for address, data in cls.Blocks(read, start, end):
+            data = data[:len(data) // byte_size * byte_size]
+            if len(needles) <= cls.kMaxFindNeedles:
+                hits = needles
+            else:
+                words = array(code)
+                if hasattr(words, 'frombytes'):
+                    words.frombytes(data)
+                else:
+                    words.fromstring(data)
+                hits = needles.intersection(words)
+
+            for n in hits:
+                offs = cls.FindInBlock(data, packed[n], byte_size)
+                if len(offs) == 0:
+                    continue
+                if n not in found:
+                    found[n] = []
+                found[n].extend([address + i for i in offs])
+
+        return found
@@ -1863,6 +1863,145 @@ class RawDwarf:
         WalkInhert(parent, 0)
 
 
+    def StripType(self, die):
+        """ strip typedef and cv-qualifiers, return the underlying type die.
+        """
+        while die is not None and die.Tag() in (TAG.DW_TAG_typedef,
+                TAG.DW_TAG_const_type, TAG.DW_TAG_volatile_type):
+            die = die.AtType()
+            if die is not None:
+                die.Decode()
+        return die
+
+    @staticmethod
+    def MemberOffset(at):
+        """ decode DW_AT_data_member_location, constant or DW_OP_plus_uconst.
+        """
+        if at.form in (FORM.DW_FORM_exprloc, FORM.DW_FORM_block1, FORM.DW_FORM_block):
+            data = bytearray(at.bytes)
+            if len(data) == 0 or data[0] != OP.DW_OP_plus_uconst:
+                return None
+            result = 0
+            shift = 0
+            for b in data[1:]:
+                result |= (b & 0x7f) << shift
+                shift += 7
+                if not b & 0x80:
+                    break
+            return result
+        return at.unsigned
+
+    def IterMembers(self, parent):
+        """ iterate data members of struct/class/union die,
+            base classes and anonymous unions are searched too.
+            yield (offset, member die), the own members come first.
+        """
+        search_list = [(0, parent)]
+        while len(search_list) > 0:
+            base_off, base = search_list.pop(0)
+            is_union = base.Tag() == TAG.DW_TAG_union_type
+            for die in self.WalkDiesNoChild(base):
+                tag = die.Tag()
+                if tag != TAG.DW_TAG_member and tag != TAG.DW_TAG_inheritance:
+                    continue
+
+                at = die.GetAt(AT.DW_AT_data_member_location)
+                if at is not None:
+                    off = self.MemberOffset(at)
+                elif is_union:
+                    off = 0
+                else:
+                    # static member
+                    continue
+                if off is None:
+                    continue
+
+                member_name = die.AtName()
+                if tag == TAG.DW_TAG_inheritance or member_name is None:
+                    t = die.AtType()
+                    t.Decode()
+                    search_list.append((base_off + off, self.StripType(t)))
+                    continue
+                yield (base_off + off, die)
+
+    def FindMember(self, parent, name):
+        """ find data member in struct/class/union die, 
+            base classes and anonymous unions are searched too.
+            return (offset, member die) or None.
+        """
+        for off, die in self.IterMembers(parent):
+            if die.AtName() != name:
+                continue
+            # bitfields are not supported
+            if die.GetAt(AT.DW_AT_bit_size) is not None:
+                continue
+            return (off, die)
+        return None
+
+    def ResolveMemberPath(self, cls_str, path):
+        """ compile member path to raw reads.
+
+            e.g.
+            ResolveMemberPath('v8::internal::Space', ['memory_chunk_list_', 'front_'])
+            returns ([24], 8, False)
+
+            return ([offset], byte_size, is_signed) or None,
+            each offset but the last is followed by a pointer load.
+        """
+        die = self.FindDie(cls_str)
+        if die is None:
+            return None
+        die = self.StripType(die)
+
+        offsets = [0]
+        for i, name in enumerate(path):
+            if die is None or die.GetAt(AT.DW_AT_declaration) is not None:
+                return None
+
+            found = self.FindMember(die, name)
+            if found is None:
+                return None
+            off, member = found
+            offsets[-1] += off
+
+            t = member.AtType()
+            t.Decode()
+            die = self.StripType(t)
+            if die is None:
+                return None
+
+            tag = die.Tag()
+            last = i == len(path) - 1
+            if tag in (TAG.DW_TAG_pointer_type, TAG.DW_TAG_reference_type,
+                    TAG.DW_TAG_rvalue_reference_type):
+                if last:
+                    return (offsets, 8, False)
+                # load the pointer and continue on the pointee
+                offsets.append(0)
+                die = die.AtType()
+                if die is None:
+                    return None
+                die.Decode()
+                die = self.StripType(die)
+
+            elif tag == TAG.DW_TAG_base_type or tag == TAG.DW_TAG_enumeration_type:
+                if not last:
+                    return None
+                size = die.AtByteSize()
+                if size not in (1, 2, 4, 8):
+                    return None
+                is_signed = False
+                enc = die.GetAt(AT.DW_AT_encoding)
+                if enc is not None:
+                    is_signed = enc.unsigned in (ATE.DW_ATE_signed, ATE.DW_ATE_signed_char)
+                return (offsets, size, is_signed)
+
+            elif last:
+                # struct or array can't be loaded as scalar
+                return None
+
+        return None
+
     def ReadAllVariables(self):
         """from node-v18 lots of const was saved in DW_TAG_variable in CU.
         """
@@ -3,3 +3,4 @@ from .core import *
 from .loader import *
 from .tsr import *
 from .sysroot import *
+from .mapreduce import *
@@ -6,6 +6,7 @@ from mmap import mmap, ACCESS_READ, ACCESS_WRITE, PAGESIZE
 import struct
 
 import andb.py23 as py23
+from andb.utility import Logging as log
 
 class Enum:
    
@@ -63,6 +64,9 @@ class Elf:
     # notes
     _notes = None
 
+    # symbols
+    _symbols = None
+
     class SHTYPE(Enum):
         """Section Header Type
         """
@@ -305,7 +309,7 @@ class Elf:
         self.Restore()
 
         self._phdrs = proghdrs 
-        return hdr 
+        return proghdrs 
 
     def SecEntry(self):
         """ for elf shares one mmap entry,
@@ -508,6 +512,54 @@ class Elf:
             if n_type == Elf.NTYPE.NT_PRPSINFO:
                 return self.NtPrPsInfo(desc)
         return None 
+
+    def GetNtAuxv(self):
+        """ return auxiliary vector in dict, {a_type: a_val}
+        """
+        for (name, desc, n_type) in self.GetNotes() or []:
+            if n_type == Elf.NTYPE.NT_AUXV:
+                o = {}
+                for off in range(0, len(desc) - 15, 16):
+                    t = struct.unpack_from('2Q', desc, off)
+                    o[t[0]] = t[1]
+                return o
+        return None
+
+    def GetSymbols(self):
+        """ parse .symtab and .dynsym, return {name: (st_value, st_size)}
+        """
+        if self._symbols is not None:
+            return self._symbols
+
+        shdrs = self.GetShdrs()
+        symbols = {}
+        for s in shdrs:
+            if s['sh_type'] != Elf.SHTYPE.SYMTAB and \
+               s['sh_type'] != Elf.SHTYPE.DYNSYM:
+                continue
+
+            m = self.Seek(s['sh_offset'])
+            syms = m.read(s['sh_size'])
+            self.Restore()
+
+            strtab = shdrs[s['sh_link']]
+            m = self.Seek(strtab['sh_offset'])
+            names = m.read(strtab['sh_size'])
+            self.Restore()
+
+            # Elf64_Sym
+            for off in range(0, len(syms) - 23, 24):
+                t = struct.unpack_from('I2BH2Q', syms, off)
+                st_name, st_shndx, st_value, st_size = t[0], t[3], t[4], t[5]
+                if st_shndx == 0 or st_value == 0:
+                    continue
+                end = names.find(b'\0', st_name)
+                name = names[st_name:end].decode('utf8', 'ignore')
+                if name not in symbols:
+                    symbols[name] = (st_value, st_size)
+
+        self._symbols = symbols
+        return symbols
     
     def GetBuildId(self):
         noteBuildId = None
@@ -618,7 +670,7 @@ class Elf:
             self._I_file.close()
         self._I_mmap = None
         self._I_file = None
-        print('Elf Unloaded')
+        log.verbose('Elf Unloaded')
 
     @property
     def filename(self):
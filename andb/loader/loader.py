@@ -1,5 +1,6 @@
 from __future__ import print_function
 import os
+import sys
 
 class FileWrap(object):
     """ warp object for file input.
@@ -111,6 +112,7 @@ class GdbLoader(Loader):
         
         if self._core:
             opts.extend(['--core', '%s' % self._core])
+            os.environ['ANDB_CORE'] = os.path.abspath(self._core)
         
         if self._typ:
             os.environ['ANDB_TYP'] = self._typ 
@@ -155,6 +157,7 @@ class LldbLoader(Loader):
         
         if self._core:
             opts.extend(['-c', self._core])
+            os.environ['ANDB_CORE'] = os.path.abspath(self._core)
         
         if self._typ:
             os.environ['ANDB_TYP'] = self._typ 
@@ -178,3 +181,45 @@ class LldbLoader(Loader):
         print(opts)
         return opts
 
+
+class HeadlessLoader(Loader):
+    """ Headless loader, runs andb without gdb/lldb (core engine).
+    """
+
+    @property
+    def default(self):
+        return [sys.executable,
+            '%s/init/coreinit.py' % self._andb_dir,  # core engine python script
+           ]
+
+    def Opts(self):
+        opts = self.default
+        os.environ['ANDB_ENGINE'] = 'core'
+
+        if self._exec:
+            os.environ['ANDB_EXEC'] = os.path.abspath(self._exec)
+
+        if self._core:
+            os.environ['ANDB_CORE'] = os.path.abspath(self._core)
+
+        if self._typ:
+            os.environ['ANDB_TYP'] = self._typ
+
+        if self._pid:
+            raise Exception('live process is not supported in headless mode.')
+
+        if self._is_batch:
+            opts.append('--batch')
+
+        if self._commands:
+            for i in self._commands:
+                if isinstance(i, FileWrap):
+                    opts.extend(["-x", '%s' % i.FileName()])
+                else:
+                    opts.extend(["-ex", " ".join(i)])
+
+        if self._args:
+            opts.extend(self._args)
+
+        print(opts)
+        return opts
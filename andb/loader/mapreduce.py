@@ -0,0 +1,300 @@
+from __future__ import print_function, division
+import os
+import sys
+import time
+import select
+import subprocess
+
+class MapReduceScheduler(object):
+    """ schedules the heap snapshot shards to persistent workers.
+
+        the index process splits the pages into shards by committed bytes,
+        each worker debugger initializes once and parses the shards requested
+        by the scheduler, the reducer merges the shards once they complete.
+
+        snapshot.d/
+          snapshot.idx    : shards written by 'mapreduce index', '<index> <bytes> <pages>'
+          snapshot_N.map  : pages of the shard N
+          snapshot_N.rec  : the shard N parsed by a worker (ShardFile)
+          worker_W.fifo   : requests to worker W, 'map <N>' or 'quit'
+          leader.fifo     : completions from workers, 'ok <N> <W>' or 'fail <N> <W>'
+          reduce.fifo     : completed shards to the reducer, 'done <N>' or 'end'
+    """
+
+    kDirectory = "snapshot.d"
+
+    # committed bytes of the pages in one shard
+    kShardBytes = 64 * 1024 * 1024
+
+    # a failed shard is retried
+    kMaxRetries = 2
+
+    # check the workers and show progress at least every
+    kWaitSeconds = 1.0
+    kProgressSeconds = 5.0
+
+    def __init__(self, make_loader, jobs):
+        # returns a new Loader in batch mode for the corefile
+        self._make_loader = make_loader
+        self._jobs = max(1, jobs)
+
+        # shard index to committed bytes
+        self._shards = {}
+
+        # shards to be parsed
+        self._pending = []
+
+        # shard index to retried times
+        self._retries = {}
+
+        # shard index done or failed
+        self._done = set()
+        self._failed = set()
+
+        # wid to [Popen, fifo fd, shard or None]
+        self._workers = {}
+        self._next_wid = 0
+
+        self._reducer = None
+        self._reduce_fd = None
+        self._leader_fd = None
+
+        self._done_bytes = 0
+        self._total_bytes = 0
+        self._t_start = 0
+        self._t_progress = 0
+
+    def Path(self, name):
+        return "%s/%s" % (self.kDirectory, name)
+
+    def MakeFifo(self, name):
+        """ (re)create the fifo, return fd opened for read and write,
+            the open doesn't block on fifo and never sees EOF.
+        """
+        path = self.Path(name)
+        if os.path.exists(path):
+            os.unlink(path)
+        os.mkfifo(path)
+        return os.open(path, os.O_RDWR)
+
+    def Spawn(self, command, log_name=None):
+        loader = self._make_loader()
+        loader.AddCommandLine(command)
+        opts = loader.Opts()
+        out = None
+        if log_name is not None:
+            out = open(self.Path(log_name), 'w')
+        return subprocess.Popen(opts, stdout=out, stderr=subprocess.STDOUT if out else None)
+
+    def Index(self):
+        """ run the index process, load the shards.
+        """
+        p = self.Spawn('mapreduce index %d' % self.kShardBytes)
+        if p.wait() != 0 or not os.path.exists(self.Path("snapshot.idx")):
+            print("Index process failed.")
+            return False
+
+        with open(self.Path("snapshot.idx")) as f:
+            for line in f:
+                a = line.split()
+                if len(a) < 2:
+                    continue
+                self._shards[int(a[0])] = int(a[1])
+        self._pending = sorted(self._shards.keys())
+        self._total_bytes = sum(self._shards.values())
+        print("%d shards, %.1f MB." % (len(self._shards), self._total_bytes / 1024 / 1024))
+        return True
+
+    def SpawnWorker(self):
+        wid = self._next_wid
+        self._next_wid += 1
+        fd = self.MakeFifo("worker_%d.fifo" % wid)
+        p = self.Spawn('mapreduce worker %d %s %s' % (wid,
+                self.Path("worker_%d.fifo" % wid), self.Path("leader.fifo")),
+                "worker_%d.log" % wid)
+        self._workers[wid] = [p, fd, None]
+
+    def StopWorker(self, wid, kill=False):
+        p, fd, shard = self._workers.pop(wid)
+        if kill:
+            p.kill()
+        else:
+            self.Send(fd, "quit")
+        p.wait()
+        os.close(fd)
+        os.unlink(self.Path("worker_%d.fifo" % wid))
+
+    def Send(self, fd, msg):
+        os.write(fd, ("%s\n" % msg).encode())
+
+    def Assign(self):
+        """ give pending shards to idle workers """
+        for wid, w in self._workers.items():
+            if len(self._pending) == 0:
+                return
+            if w[2] is not None:
+                continue
+            w[2] = self._pending.pop(0)
+            self.Send(w[1], "map %d" % w[2])
+
+    def Retry(self, index, why):
+        n = self._retries.get(index, 0) + 1
+        self._retries[index] = n
+        if n > self.kMaxRetries:
+            print("shard %d failed (%s), giving up." % (index, why))
+            self._failed.add(index)
+        else:
+            print("shard %d failed (%s), retry %d." % (index, why, n))
+            self._pending.append(index)
+
+    def OnMessage(self, line):
+        a = line.split()
+        if len(a) != 3:
+            return
+        status, index, wid = a[0], int(a[1]), int(a[2])
+        if wid in self._workers and self._workers[wid][2] == index:
+            self._workers[wid][2] = None
+        if status == 'ok':
+            self._done.add(index)
+            self._done_bytes += self._shards[index]
+            self.Send(self._reduce_fd, "done %d" % index)
+        else:
+            self.Retry(index, "worker %d" % wid)
+        self.ShowProgress(force=True)
+
+    def CheckWorkers(self):
+        """ respawn the dead workers, the shard is retried """
+        for wid in list(self._workers.keys()):
+            p, fd, shard = self._workers[wid]
+            if p.poll() is None:
+                continue
+            self.StopWorker(wid)
+            if shard is not None:
+                self.Retry(shard, "worker %d exited (%d)" % (wid, p.returncode))
+            self.SpawnWorker()
+
+    def ShowProgress(self, force=False):
+        now = time.time()
+        if not force and now - self._t_progress < self.kProgressSeconds:
+            return
+        self._t_progress = now
+        elapsed = max(now - self._t_start, 0.001)
+        speed = self._done_bytes / elapsed
+        eta = (self._total_bytes - self._done_bytes) / speed if speed > 0 else 0
+        busy = len([w for w in self._workers.values() if w[2] is not None])
+        print("[mapreduce] shards %d/%d, %.1f/%.1f MB, %.1f MB/s, workers %d/%d, failed %d, eta %ds" % (
+            len(self._done), len(self._shards),
+            self._done_bytes / 1024 / 1024, self._total_bytes / 1024 / 1024,
+            speed / 1024 / 1024, busy, len(self._workers),
+            len(self._failed), eta))
+        sys.stdout.flush()
+
+    def Finished(self):
+        return len(self._done) + len(self._failed) == len(self._shards)
+
+    def Map(self):
+        """ parse all shards by the workers """
+        self._leader_fd = self.MakeFifo("leader.fifo")
+        for i in range(min(self._jobs, len(self._shards))):
+            self.SpawnWorker()
+
+        buf = b''
+        while not self.Finished():
+            self.Assign()
+            r, _, _ = select.select([self._leader_fd], [], [], self.kWaitSeconds)
+            if len(r) > 0:
+                buf += os.read(self._leader_fd, 4096)
+                while b'\n' in buf:
+                    line, buf = buf.split(b'\n', 1)
+                    self.OnMessage(line.decode())
+            self.CheckWorkers()
+            if self._reducer.poll() is not None:
+                print("Reduce process exited (%d)." % self._reducer.returncode)
+                return False
+            self.ShowProgress()
+
+        for wid in list(self._workers.keys()):
+            self.StopWorker(wid)
+        return True
+
+    def Run(self):
+        """ return True if the heap snapshot is generated """
+        t0 = time.time()
+        if not self.Index():
+            return False
+        t1 = time.time()
+
+        # the reducer iterates roots while the shards are parsing
+        self._reduce_fd = self.MakeFifo("reduce.fifo")
+        self._reducer = self.Spawn('mapreduce reduce %s' % self.Path("reduce.fifo"), "reduce.log")
+
+        self._t_start = time.time()
+        if not self.Map():
+            return False
+        t2 = time.time()
+
+        if len(self._failed) > 0:
+            print("%d shards failed, the snapshot is incomplete: %s" % (
+                len(self._failed), sorted(self._failed)))
+
+        print("Wait ReduceProcess to complete ...")
+        self.Send(self._reduce_fd, "end")
+        ret = self._reducer.wait()
+        t3 = time.time()
+
+        for fd, name in ((self._leader_fd, "leader.fifo"), (self._reduce_fd, "reduce.fifo")):
+            os.close(fd)
+            os.unlink(self.Path(name))
+
+        print('real   {:.3f}s'.format(t3-t0))
+        print('index  {:.3f}s'.format(t1-t0))
+        print('parse  {:.3f}s'.format(t2-t1))
+        print('reduce {:.3f}s'.format(t3-t2))
+        return ret == 0
+
+
+class StatsScheduler(MapReduceScheduler):
+    """ runs 'heap stats' of all spaces by parallel workers.
+
+        each worker walks one partition of the chunks and saves the partial
+        result, the partials are merged by one more process once all done.
+
+        stats.d/
+          part_N.json : partial result of the part N
+          part_N.log  : output of the worker N
+    """
+
+    kDirectory = "stats.d"
+
+    def Run(self):
+        """ return True if all parts are merged """
+        t0 = time.time()
+        if not os.path.exists(self.kDirectory):
+            os.mkdir(self.kDirectory)
+
+        parts = []
+        for k in range(self._jobs):
+            path = self.Path("part_%d.json" % k)
+            if os.path.exists(path):
+                os.unlink(path)
+            p = self.Spawn('heap stats --all --part %d/%d --save %s' % (k, self._jobs, path),
+                    "part_%d.log" % k)
+            parts.append((p, path))
+
+        failed = 0
+        for k, (p, path) in enumerate(parts):
+            if p.wait() != 0 or not os.path.exists(path):
+                print("part %d failed, see %s." % (k, self.Path("part_%d.log" % k)))
+                failed += 1
+        t1 = time.time()
+        if failed > 0:
+            return False
+
+        p = self.Spawn('heap stats --merge %s' % ' '.join(path for p, path in parts))
+        ret = p.wait()
+        t2 = time.time()
+
+        print('real   {:.3f}s'.format(t2-t0))
+        print('walk   {:.3f}s'.format(t1-t0))
+        print('merge  {:.3f}s'.format(t2-t1))
+        return ret == 0
@@ -15,6 +15,25 @@ from .heap_snapshot import (
     HeapSnapshot
 )
 
+from .dominator import (
+    SnapshotGraph,
+    DominatorTree,
+)
+
+from .heap_diff import (
+    HeapDiff,
+)
+
+from .heap_index import (
+    HeapIndex,
+    RetainerIndex,
+    StringIndex,
+)
+
+from .heap_stats import (
+    HeapStats,
+)
+
 from .report import (
     AndbTechReport
 )
@@ -0,0 +1,645 @@
+from __future__ import print_function, division
+
+""" andb.shadow.dominator : dominator tree and retained sizes of heap snapshot.
+
+    SnapshotGraph holds the snapshot as CSR arrays, made from the in-memory
+    HeapSnapshot or a '.heapsnapshot' file (streamed, the file is never
+    loaded as json objects).
+
+    DominatorTree runs Lengauer-Tarjan (with path compression) from the root
+    node, weak edges are ignored like DevTools. the retained size of a node
+    is the self size of all the nodes it dominates.
+"""
+
+import gzip
+import heapq
+import json
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class SnapshotFileReader(object):
+    """ read the sections of '.heapsnapshot' file in blocks.
+    """
+
+    kBlockSize = 4 * 1024 * 1024
+
+    def __init__(self, filename):
+        if filename.endswith('.gz'):
+            self._file = gzip.open(filename, 'rb')
+        else:
+            self._file = open(filename, 'rb')
+        self._buf = b''
+
+    def Fill(self):
+        data = self._file.read(self.kBlockSize)
+        self._buf += data
+        return len(data) > 0
+
+    def ReadUntil(self, token, keep=True):
+        """ return the text before token (or None if not keep),
+            the token is consumed.
+        """
+        text = []
+        while True:
+            i = self._buf.find(token)
+            if i >= 0:
+                text.append(self._buf[:i])
+                self._buf = self._buf[i + len(token):]
+                break
+            # keep a partial token at the end
+            n = max(0, len(self._buf) - len(token) + 1)
+            if keep:
+                text.append(self._buf[:n])
+            self._buf = self._buf[n:]
+            if not self.Fill():
+                raise Exception("'%s' not found in heap snapshot." % token.decode())
+        if keep:
+            return b''.join(text)
+        return None
+
+    def ReadMeta(self):
+        """ return the meta of snapshot, then the nodes are read. """
+        head = self.ReadUntil(b'"nodes":').decode('utf-8').rstrip().rstrip(',')
+        meta = json.loads(head + '}')['snapshot']['meta']
+        self.ReadUntil(b'[', keep=False)
+        return meta
+
+    def ReadEdgesStart(self):
+        """ skip to the edges """
+        self.ReadUntil(b'"edges":', keep=False)
+        self.ReadUntil(b'[', keep=False)
+
+    def ReadStrings(self):
+        """ skip to the strings, return the strings. """
+        self.ReadUntil(b'"strings":', keep=False)
+        return json.loads(self.ReadAll().decode('utf-8').rstrip().rstrip('}'))
+
+    def ReadAll(self):
+        while self.Fill():
+            pass
+        text = self._buf
+        self._buf = b''
+        return text
+
+    @staticmethod
+    def Parse(out, text):
+        """ append the numbers separated by ',' to out """
+        if len(text.strip()) == 0:
+            return
+        if numpy is not None:
+            a = numpy.fromstring(text.decode('ascii'), dtype=numpy.int64, sep=',')
+            out.frombytes(a.tobytes())
+        else:
+            out.extend(int(x) for x in text.split(b','))
+
+    def IterNumbers(self):
+        """ yield array('q') of the numbers until ']', block by block """
+        while True:
+            out = array('q')
+            i = self._buf.find(b']')
+            if i >= 0:
+                self.Parse(out, self._buf[:i])
+                self._buf = self._buf[i + 1:]
+                yield out
+                return
+            j = self._buf.rfind(b',')
+            if j >= 0:
+                self.Parse(out, self._buf[:j])
+                self._buf = self._buf[j + 1:]
+                yield out
+            if not self.Fill():
+                raise Exception("heap snapshot is truncated.")
+
+    def IterRows(self, width):
+        """ yield array('q') of whole rows (width numbers each) until ']' """
+        rest = array('q')
+        for block in self.IterNumbers():
+            rest.extend(block)
+            n = len(rest) // width * width
+            if n > 0:
+                yield rest[:n]
+                del rest[:n]
+        if len(rest) > 0:
+            raise Exception("heap snapshot has a partial row.")
+
+    def ReadNumbers(self):
+        """ return array('q') of the numbers until ']' """
+        out = array('q')
+        for block in self.IterNumbers():
+            out.extend(block)
+        return out
+
+    def Close(self):
+        self._file.close()
+
+
+class SnapshotGraph(object):
+    """ the snapshot graph in CSR arrays,
+          node i : node_type_[i], node_name_[i], node_id_[i], self_size_[i],
+          edges of node i : first_edge_[i] to first_edge_[i + 1],
+          edge j : edge_type_[j], edge_to_[j] (node index).
+        the node 0 is the root.
+    """
+
+    def __init__(self):
+        self.node_type_ = array('B')
+        self.node_name_ = array('I')
+        self.node_id_ = array('Q')
+        self.self_size_ = array('Q')
+        self.first_edge_ = array('Q', [0])
+        self.edge_type_ = array('B')
+        self.edge_to_ = array('I')
+
+        # string table
+        self.names_ = []
+
+        # names of the node types, edge type of weak
+        self.node_types_ = []
+        self.weak_type_ = -1
+
+    def __len__(self):
+        return len(self.node_type_)
+
+    def FillFirstEdge(self, edge_count):
+        if numpy is not None:
+            first = numpy.zeros(len(edge_count) + 1, dtype=numpy.uint64)
+            numpy.cumsum(numpy.asarray(edge_count, dtype=numpy.uint64), out=first[1:])
+            self.first_edge_ = array('Q', first.tobytes())
+            return
+        first = array('Q', [0]) * (len(edge_count) + 1)
+        n = 0
+        for i in range(len(edge_count)):
+            n += edge_count[i]
+            first[i + 1] = n
+        self.first_edge_ = first
+
+    @classmethod
+    def FromHeapSnapshot(cls, snap):
+        """ make graph from HeapSnapshot, after FillChild(). """
+        from .heap_snapshot import HeapEntry, HeapGraphEdge
+
+        g = cls()
+        e = snap.entries_
+        g.node_type_ = array('B', e.type_)
+        g.node_name_ = array('I', e.name_)
+        g.node_id_ = array('Q', e.id_)
+        g.self_size_ = array('Q', e.self_size_)
+        g.FillFirstEdge(e.edge_count_)
+
+        # edges ordered by the parent
+        children = snap.children_
+        edges = snap.edges_
+        if numpy is not None and len(children) > 0:
+            idx = numpy.frombuffer(children, dtype=numpy.uint32)
+            g.edge_type_.frombytes(numpy.frombuffer(edges.type_, dtype=numpy.uint8)[idx].tobytes())
+            to = ~numpy.frombuffer(edges.to_, dtype=numpy.int64)[idx]
+            g.edge_to_.frombytes(to.astype(numpy.uint32).tobytes())
+        else:
+            g.edge_type_ = array('B', [edges.type_[i] for i in children])
+            g.edge_to_ = array('I', [~edges.to_[i] for i in children])
+
+        g.names_ = list(snap.names_)
+        g.node_types_ = [HeapEntry.type_strings[t].strip('/') for t in sorted(HeapEntry.type_strings)]
+        g.weak_type_ = HeapGraphEdge.kWeak
+        return g
+
+    @classmethod
+    def FromFile(cls, filename):
+        """ make graph from '.heapsnapshot' file. """
+        r = SnapshotFileReader(filename)
+        try:
+            meta = r.ReadMeta()
+            nodes = r.ReadNumbers()
+            r.ReadEdgesStart()
+            edges = r.ReadNumbers()
+            strings = r.ReadStrings()
+        finally:
+            r.Close()
+
+        g = cls()
+        fields = meta['node_fields']
+        nf = len(fields)
+        g.node_type_ = cls.Column(nodes, fields.index('type'), nf, 'B')
+        g.node_name_ = cls.Column(nodes, fields.index('name'), nf, 'I')
+        g.node_id_ = cls.Column(nodes, fields.index('id'), nf, 'Q')
+        g.self_size_ = cls.Column(nodes, fields.index('self_size'), nf, 'Q')
+        g.FillFirstEdge(cls.Column(nodes, fields.index('edge_count'), nf, 'Q'))
+        del nodes
+
+        fields = meta['edge_fields']
+        ef = len(fields)
+        g.edge_type_ = cls.Column(edges, fields.index('type'), ef, 'B')
+        g.edge_to_ = cls.Column(edges, fields.index('to_node'), ef, 'I', nf)
+        del edges
+
+        g.names_ = strings
+        g.node_types_ = meta['node_types'][0]
+        edge_types = meta['edge_types'][0]
+        if 'weak' in edge_types:
+            g.weak_type_ = edge_types.index('weak')
+        return g
+
+    @staticmethod
+    def Column(numbers, field, width, typecode, divisor=1):
+        """ return array(typecode) of the field of the rows in numbers """
+        if numpy is not None and len(numbers) > 0:
+            a = numpy.frombuffer(numbers, dtype=numpy.int64)[field::width]
+            if divisor != 1:
+                a = a // divisor
+            return array(typecode, a.astype(numpy.dtype(typecode)).tobytes())
+        if divisor != 1:
+            return array(typecode, [t // divisor for t in numbers[field::width]])
+        return array(typecode, numbers[field::width])
+
+    @staticmethod
+    def MakeClassName(type_name, name):
+        """ constructor name of objects, '(type)' of the others """
+        if type_name in ('object', 'native'):
+            return name
+        return "(%s)" % type_name
+
+    def ClassName(self, i):
+        return self.MakeClassName(self.node_types_[self.node_type_[i]], self.names_[self.node_name_[i]])
+
+
+class DominatorTree(object):
+    """ dominator tree of SnapshotGraph.
+
+        idom_[i] : the immediate dominator of node i, -1 if not reachable,
+        retained_size_[i] : self size of the nodes dominated by node i.
+    """
+
+    def __init__(self, graph):
+        self._graph = graph
+        self.idom_ = array('q')
+        self.retained_size_ = array('Q')
+
+        # dfs preorder of the reachable nodes
+        self._vertex = array('I')
+
+        # immediate dominator in dfs number
+        self._idom = array('i')
+
+    def StrongEdges(self):
+        """ return (first, to) in CSR of the edges except the weak ones,
+            None if numpy is not installed.
+        """
+        g = self._graph
+        if numpy is None or len(g.edge_to_) == 0:
+            return None
+        first = numpy.frombuffer(g.first_edge_, dtype=numpy.uint64).astype(numpy.int64)
+        strong = numpy.frombuffer(g.edge_type_, dtype=numpy.uint8) != g.weak_type_
+        kept = numpy.zeros(len(strong) + 1, dtype=numpy.int64)
+        numpy.cumsum(strong, out=kept[1:])
+        to = numpy.frombuffer(g.edge_to_, dtype=numpy.uint32)[strong]
+        return kept[first], to
+
+    def DepthFirstSearch(self):
+        """ number the reachable nodes in preorder, return parent (dfs number). """
+        g = self._graph
+        n = len(g)
+        first = g.first_edge_
+        etype = g.edge_type_
+        to = g.edge_to_
+        weak = g.weak_type_
+
+        strong = self.StrongEdges()
+        if strong is not None:
+            # no weak edge left
+            first = array('Q', strong[0].astype(numpy.uint64).tobytes())
+            to = array('I', strong[1].tobytes())
+            etype = bytearray(len(to))
+            weak = 1
+
+        dfn = array('i', [-1]) * n
+        vertex = array('I')
+        parent = array('i')
+        pos = array('Q', first[:n])
+
+        dfn[0] = 0
+        vertex.append(0)
+        parent.append(-1)
+        stack = [0]
+        while stack:
+            v = stack[-1]
+            p = pos[v]
+            end = first[v + 1]
+            w = -1
+            while p < end:
+                if etype[p] != weak and dfn[to[p]] < 0:
+                    w = to[p]
+                    break
+                p += 1
+            if w < 0:
+                pos[v] = end
+                stack.pop()
+                continue
+            pos[v] = p + 1
+            dfn[w] = len(vertex)
+            vertex.append(w)
+            parent.append(dfn[v])
+            stack.append(w)
+
+        self._vertex = vertex
+        self._dfn = dfn
+        return parent
+
+    def Predecessors(self):
+        """ return (first, pred) in CSR, by dfs number. """
+        g = self._graph
+        first = g.first_edge_
+        etype = g.edge_type_
+        to = g.edge_to_
+        weak = g.weak_type_
+        vertex = self._vertex
+        dfn = self._dfn
+        count = len(vertex)
+
+        if numpy is not None and len(to) > 0:
+            F = numpy.frombuffer(first, dtype=numpy.uint64).astype(numpy.int64)
+            D = numpy.frombuffer(dfn, dtype=numpy.int32)
+            source = numpy.repeat(D[:len(F) - 1], numpy.diff(F))
+            target = D[numpy.frombuffer(to, dtype=numpy.uint32)]
+            # the targets of strong edges from reachable nodes are reachable
+            keep = (numpy.frombuffer(etype, dtype=numpy.uint8) != weak) & (source >= 0)
+            source = source[keep]
+            target = target[keep]
+            # by the child, then the parent in dfs order
+            order = numpy.lexsort((source, target))
+            head = numpy.zeros(count + 1, dtype=numpy.uint64)
+            numpy.cumsum(numpy.bincount(target, minlength=count), out=head[1:])
+            return (array('Q', head.tobytes()),
+                    array('I', source[order].astype(numpy.uint32).tobytes()))
+
+        # counting sort by the child
+        head = array('Q', [0]) * (count + 1)
+        for v in vertex:
+            for p in range(first[v], first[v + 1]):
+                if etype[p] != weak:
+                    head[dfn[to[p]] + 1] += 1
+        for i in range(count):
+            head[i + 1] += head[i]
+
+        pred = array('I', [0]) * head[count]
+        fill = array('Q', head[:count])
+        for i in range(count):
+            v = vertex[i]
+            for p in range(first[v], first[v + 1]):
+                if etype[p] != weak:
+                    w = dfn[to[p]]
+                    pred[fill[w]] = i
+                    fill[w] += 1
+        return head, pred
+
+    def Build(self):
+        """ Lengauer-Tarjan, simple version. """
+        parent = self.DepthFirstSearch()
+        head, pred = self.Predecessors()
+        count = len(self._vertex)
+
+        semi = array('i', range(count))
+        label = array('i', range(count))
+        ancestor = array('i', [-1]) * count
+        idom = array('i', [0]) * count
+
+        # bucket[semi] as linked lists
+        bucket = array('i', [-1]) * count
+        bucket_next = array('i', [-1]) * count
+
+        def Eval(v):
+            if ancestor[v] < 0:
+                return v
+            if ancestor[ancestor[v]] < 0:
+                return label[v]
+            # compress the path, the top first
+            path = []
+            u = v
+            while ancestor[ancestor[u]] >= 0:
+                path.append(u)
+                u = ancestor[u]
+            for u in reversed(path):
+                a = ancestor[u]
+                if semi[label[a]] < semi[label[u]]:
+                    label[u] = label[a]
+                ancestor[u] = ancestor[a]
+            return label[v]
+
+        for w in range(count - 1, 0, -1):
+            for i in range(head[w], head[w + 1]):
+                # Eval() inlined for the unlinked and the shallow nodes
+                u = pred[i]
+                a = ancestor[u]
+                if a >= 0:
+                    u = label[u] if ancestor[a] < 0 else Eval(u)
+                if semi[u] < semi[w]:
+                    semi[w] = semi[u]
+            s = semi[w]
+            bucket_next[w] = bucket[s]
+            bucket[s] = w
+
+            p = parent[w]
+            ancestor[w] = p
+            v = bucket[p]
+            while v >= 0:
+                u = Eval(v)
+                idom[v] = u if semi[u] < semi[v] else p
+                v = bucket_next[v]
+            bucket[p] = -1
+
+        for w in range(1, count):
+            if idom[w] != semi[w]:
+                idom[w] = idom[idom[w]]
+        self._idom = idom
+
+        # back to node index
+        vertex = self._vertex
+        if numpy is not None and count > 0:
+            V = numpy.frombuffer(vertex, dtype=numpy.uint32)
+            out = numpy.full(len(self._graph), -1, dtype=numpy.int64)
+            out[V] = V[numpy.frombuffer(idom, dtype=numpy.int32)]
+            self.idom_ = array('q', out.tobytes())
+        else:
+            self.idom_ = array('q', [-1]) * len(self._graph)
+            for w in range(count):
+                self.idom_[vertex[w]] = vertex[idom[w]]
+
+        self.FillRetainedSize()
+        del self._dfn
+        return self
+
+    # levels smaller are accumulated node by node
+    kLevelBatch = 64
+
+    def FillRetainedSizeByLevel(self):
+        """ accumulate to the dominator level by level, the deepest first,
+            the nodes of a level don't depend on each other.
+        """
+        V = numpy.frombuffer(self._vertex, dtype=numpy.uint32)
+        idom = numpy.frombuffer(self._idom, dtype=numpy.int32).astype(numpy.int64)
+        sizes = numpy.frombuffer(self._graph.self_size_, dtype=numpy.uint64)
+        count = len(V)
+
+        # depth in the dominator tree by pointer jumping
+        depth = numpy.ones(count, dtype=numpy.int64)
+        depth[0] = 0
+        jump = idom.copy()
+        while jump.any():
+            depth += depth[jump]
+            jump = jump[jump]
+
+        order = numpy.argsort(-depth, kind='stable')
+        bounds = numpy.flatnonzero(numpy.diff(depth[order])) + 1
+        retained = sizes[V].astype(numpy.uint64)
+        lo = 0
+        for hi in bounds.tolist() + [count]:
+            level = order[lo:hi]
+            if depth[level[0]] == 0:
+                break
+            if len(level) >= self.kLevelBatch:
+                # sums of a level are exact in float64 below 2^53 bytes
+                retained += numpy.bincount(idom[level], weights=retained[level],
+                        minlength=count).astype(numpy.uint64)
+            else:
+                for w in level.tolist():
+                    retained[idom[w]] += retained[w]
+            lo = hi
+
+        out = sizes.copy()
+        out[V] = retained
+        self.retained_size_ = array('Q', out.tobytes())
+
+    def FillRetainedSize(self):
+        """ accumulate to the dominator, in reverse preorder. """
+        if numpy is not None and len(self._vertex) > 0:
+            return self.FillRetainedSizeByLevel()
+
+        vertex = self._vertex
+        idom = self._idom
+        sizes = self._graph.self_size_
+        retained = array('Q', [sizes[v] for v in vertex])
+        for w in range(len(vertex) - 1, 0, -1):
+            retained[idom[w]] += retained[w]
+
+        self.retained_size_ = array('Q', sizes)
+        for w in range(len(vertex)):
+            self.retained_size_[vertex[w]] = retained[w]
+
+    def ClassSizes(self):
+        """ return {class name: [count, self size, retained size]},
+            the retained size of a class excludes the nodes dominated by the
+            same class, so it is not counted twice.
+        """
+        g = self._graph
+        vertex = self._vertex
+        idom = self._idom
+        count = len(vertex)
+        retained = self.retained_size_
+
+        # class of the nodes by dfs number
+        classes = {}
+        names = []
+        klass = array('I', [0]) * count
+        for w in range(count):
+            name = g.ClassName(vertex[w])
+            c = classes.get(name)
+            if c is None:
+                c = classes[name] = len(names)
+                names.append(name)
+            klass[w] = c
+
+        # children in the dominator tree
+        head = array('Q', [0]) * (count + 1)
+        for w in range(1, count):
+            head[idom[w] + 1] += 1
+        for i in range(count):
+            head[i + 1] += head[i]
+        children = array('I', [0]) * max(count - 1, 0)
+        fill = array('Q', head[:count])
+        for w in range(1, count):
+            children[fill[idom[w]]] = w
+            fill[idom[w]] += 1
+
+        sizes = [[0, 0, 0] for i in range(len(names))]
+        active = array('I', [0]) * len(names)
+        stack = [0]
+        while stack:
+            w = stack.pop()
+            if w < 0:
+                active[klass[~w]] -= 1
+                continue
+            v = vertex[w]
+            c = klass[w]
+            s = sizes[c]
+            s[0] += 1
+            s[1] += g.self_size_[v]
+            if active[c] == 0:
+                s[2] += retained[v]
+            active[c] += 1
+            stack.append(~w)
+            stack.extend(children[head[w]:head[w + 1]])
+
+        return dict(zip(names, sizes))
+
+    def Report(self, top=20):
+        """ return the report as dict. """
+        g = self._graph
+        retained = self.retained_size_
+        vertex = self._vertex
+
+        if numpy is not None and len(vertex) > top:
+            r = numpy.frombuffer(retained, dtype=numpy.uint64)
+            v = numpy.frombuffer(vertex, dtype=numpy.uint32)
+            # the root retains all
+            cand = v[numpy.argpartition(r[v], -(top + 1))[-(top + 1):]]
+            nodes = sorted((int(i) for i in cand), key=lambda i: -retained[i])
+        else:
+            nodes = heapq.nlargest(top + 1, vertex, key=lambda i: retained[i])
+        nodes = [i for i in nodes if i != 0][:top]
+
+        classes = self.ClassSizes()
+        top_classes = heapq.nlargest(top, classes.items(), key=lambda x: x[1][2])
+
+        return {
+            "node_count": len(g),
+            "reachable_count": len(vertex),
+            "total_size": sum(g.self_size_),
+            "reachable_size": retained[0] if len(vertex) > 0 else 0,
+            "top_objects": [{
+                "index": i,
+                "id": g.node_id_[i],
+                "type": g.node_types_[g.node_type_[i]],
+                "name": g.names_[g.node_name_[i]],
+                "self_size": g.self_size_[i],
+                "retained_size": retained[i],
+                "dominator": self.idom_[i],
+                } for i in nodes],
+            "top_classes": [{
+                "name": name,
+                "count": s[0],
+                "self_size": s[1],
+                "retained_size": s[2],
+                } for name, s in top_classes],
+        }
+
+    @staticmethod
+    def PrintReport(report):
+        def short(s, n=80):
+            s = s.replace('\n', ' ')
+            return s if len(s) <= n else s[:n] + '...'
+
+        print("nodes %d, reachable %d, total %d bytes, reachable %d bytes." % (
+            report["node_count"], report["reachable_count"],
+            report["total_size"], report["reachable_size"]))
+        print("")
+        print("%-16s %-14s %-14s %s" % ("retained", "self", "count", "constructor"))
+        for c in report["top_classes"]:
+            print("%-16d %-14d %-14d %s" % (c["retained_size"], c["self_size"], c["count"], short(c["name"])))
+        print("")
+        print("%-16s %-14s %-14s %s" % ("retained", "self", "id", "object"))
+        for o in report["top_objects"]:
+            print("%-16d %-14d @%-13d %s %s" % (o["retained_size"], o["self_size"], o["id"], o["type"], short(o["name"])))
@@ -0,0 +1,326 @@
+from __future__ import print_function, division
+
+""" andb.shadow.heap_diff : compare two heap snapshots of the same process.
+
+    each '.heapsnapshot' file is streamed into a few per-node columns
+    (address, class, size), the edges are only read for the 'map' of each
+    node. the counts and sizes are aggregated by constructor and by shape
+    (constructor and Map address), an object is taken as the same one if
+    both snapshots have it at the same address with the same constructor.
+    the node ids are not stable across cores, so the snapshots without
+    'mem_addr' have no survivors (new and freed are not reported).
+"""
+
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .dominator import SnapshotFileReader, SnapshotGraph
+
+
+class SnapshotSummary(object):
+    """ per-node columns of a '.heapsnapshot' file,
+          addr_[i]  : mem_addr (0 if the snapshot has no mem_addr),
+          class_[i] : class id, classes_[id] is the constructor name,
+          size_[i]  : self size,
+        shapes_ : {(constructor, map address): [count, size]}.
+
+        the file is read twice, the strings first, then nodes and edges.
+    """
+
+    def __init__(self, filename):
+        self.filename_ = filename
+        self.addr_ = array('Q')
+        self.has_addr_ = False
+        self.class_ = array('I')
+        self.size_ = array('Q')
+        self.classes_ = []
+        self.shapes_ = {}
+
+    @classmethod
+    def FromFile(cls, filename):
+        r = SnapshotFileReader(filename)
+        try:
+            meta = r.ReadMeta()
+            strings = r.ReadStrings()
+        finally:
+            r.Close()
+
+        s = cls(filename)
+        r = SnapshotFileReader(filename)
+        try:
+            r.ReadMeta()
+            edge_count, node_fields = s.ReadNodes(r, meta, strings)
+            r.ReadEdgesStart()
+            maps = s.ReadMaps(r, meta, strings, edge_count, node_fields)
+        finally:
+            r.Close()
+
+        s.FillShapes(maps)
+        return s
+
+    def ReadNodes(self, reader, meta, strings):
+        """ fill the columns, return (edge_count, node field count). """
+        fields = meta['node_fields']
+        nf = len(fields)
+        f_type = fields.index('type')
+        f_name = fields.index('name')
+        f_size = fields.index('self_size')
+        f_edges = fields.index('edge_count')
+        f_addr = fields.index('mem_addr') if 'mem_addr' in fields else None
+        self.has_addr_ = f_addr is not None
+        node_types = meta['node_types'][0]
+
+        # (type, name id) to class id
+        keys = {}
+        classes = {}
+        edge_count = array('I')
+        for rows in reader.IterRows(nf):
+            for k in zip(rows[f_type::nf], rows[f_name::nf]):
+                c = keys.get(k)
+                if c is None:
+                    name = SnapshotGraph.MakeClassName(node_types[k[0]], strings[k[1]])
+                    c = keys[k] = classes.setdefault(name, len(classes))
+                self.class_.append(c)
+            if f_addr is not None:
+                self.addr_.fromlist(rows[f_addr::nf].tolist())
+            else:
+                self.addr_.extend(array('Q', [0]) * (len(rows) // nf))
+            self.size_.fromlist(rows[f_size::nf].tolist())
+            edge_count.fromlist(rows[f_edges::nf].tolist())
+
+        self.classes_ = [None] * len(classes)
+        for name, c in classes.items():
+            self.classes_[c] = name
+        return edge_count, nf
+
+    def ReadMaps(self, reader, meta, strings, edge_count, node_fields):
+        """ return the Map address of each node, 0 if no 'map' edge. """
+        fields = meta['edge_fields']
+        ef = len(fields)
+        f_type = fields.index('type')
+        f_name = fields.index('name_or_index')
+        f_to = fields.index('to_node')
+        internal = meta['edge_types'][0].index('internal')
+        map_names = set(i for i, n in enumerate(strings) if n == 'map')
+
+        addrs = self.addr_
+        maps = array('Q', [0]) * len(addrs)
+        node = -1
+        left = 0
+        for rows in reader.IterRows(ef):
+            for t, n, to in zip(rows[f_type::ef], rows[f_name::ef], rows[f_to::ef]):
+                # edges are ordered by the parent node
+                while left == 0:
+                    node += 1
+                    left = edge_count[node]
+                left -= 1
+                if t == internal and n in map_names:
+                    maps[node] = addrs[to // node_fields]
+        return maps
+
+    def FillShapes(self, maps):
+        shapes = {}
+        classes = self.classes_
+        for c, m, size in zip(self.class_, maps, self.size_):
+            k = (classes[c], m)
+            s = shapes.get(k)
+            if s is None:
+                shapes[k] = [1, size]
+            else:
+                s[0] += 1
+                s[1] += size
+        self.shapes_ = shapes
+
+    def ClassSizes(self):
+        """ return [[count, size]] by class id """
+        sizes = [[0, 0] for i in range(len(self.classes_))]
+        for c, size in zip(self.class_, self.size_):
+            s = sizes[c]
+            s[0] += 1
+            s[1] += size
+        return sizes
+
+
+class HeapDiff(object):
+    """ difference from snapshot a to snapshot b.
+    """
+
+    def __init__(self, a, b):
+        self._a = a
+        self._b = b
+
+    @classmethod
+    def FromFiles(cls, file_a, file_b):
+        return cls(SnapshotSummary.FromFile(file_a), SnapshotSummary.FromFile(file_b))
+
+    def Survivors(self, class_map):
+        """ return [[count, size]] by class id of b, of the objects at the
+            same address with the same constructor in both snapshots.
+            class_map is the class id of b for each class of a.
+            return None if a snapshot has no 'mem_addr'.
+
+            nodes without an address (0) are skipped, an address seen more
+            than once is matched by its first node on each side.
+        """
+        a = self._a
+        b = self._b
+        if not a.has_addr_ or not b.has_addr_:
+            return None
+
+        out = [[0, 0] for i in range(len(b.classes_))]
+
+        if numpy is not None and len(a.addr_) > 0 and len(b.addr_) > 0:
+            # intersect1d returns the first index of each common address
+            common, ia, ib = numpy.intersect1d(
+                    numpy.frombuffer(a.addr_, dtype=numpy.uint64),
+                    numpy.frombuffer(b.addr_, dtype=numpy.uint64),
+                    return_indices=True)
+            nonzero = common != 0
+            ia = ia[nonzero]
+            ib = ib[nonzero]
+            ca = numpy.array(class_map, dtype=numpy.uint32)[numpy.frombuffer(a.class_, dtype=numpy.uint32)[ia]]
+            cb = numpy.frombuffer(b.class_, dtype=numpy.uint32)[ib]
+            same = ca == cb
+            c = cb[same]
+            w = numpy.frombuffer(b.size_, dtype=numpy.uint64)[ib[same]].astype(numpy.float64)
+            counts = numpy.bincount(c, minlength=len(out))
+            sizes = numpy.bincount(c, weights=w, minlength=len(out))
+            for i in range(len(out)):
+                out[i] = [int(counts[i]), int(sizes[i])]
+            return out
+
+        # merge the sorted addresses, the sort is stable so the first node
+        # of an address comes first.
+        order_a = sorted(range(len(a.addr_)), key=a.addr_.__getitem__)
+        order_b = sorted(range(len(b.addr_)), key=b.addr_.__getitem__)
+        na = len(order_a)
+        nb = len(order_b)
+        i = j = 0
+        while i < na and j < nb:
+            pa = a.addr_[order_a[i]]
+            pb = b.addr_[order_b[j]]
+            if pa < pb:
+                i += 1
+            elif pa > pb:
+                j += 1
+            else:
+                if pa != 0:
+                    k = order_b[j]
+                    c = b.class_[k]
+                    if class_map[a.class_[order_a[i]]] == c:
+                        out[c][0] += 1
+                        out[c][1] += b.size_[k]
+                # skip the duplicates of the address on both sides
+                while i < na and a.addr_[order_a[i]] == pa:
+                    i += 1
+                while j < nb and b.addr_[order_b[j]] == pb:
+                    j += 1
+        return out
+
+    def ClassMap(self):
+        """ return the class id of b for each class of a, new ids are
+            appended to b.classes_ for the classes not in b.
+        """
+        b = self._b
+        ids = dict((n, i) for i, n in enumerate(b.classes_))
+        out = []
+        for n in self._a.classes_:
+            if n not in ids:
+                ids[n] = len(b.classes_)
+                b.classes_.append(n)
+            out.append(ids[n])
+        return out
+
+    def Report(self, top=20):
+        """ return the report as dict. """
+        a = self._a
+        b = self._b
+
+        class_map = self.ClassMap()
+        survivors = self.Survivors(class_map)
+
+        sizes_b = b.ClassSizes()
+        sizes_b += [[0, 0] for i in range(len(b.classes_) - len(sizes_b))]
+        sizes_a = [[0, 0] for i in range(len(b.classes_))]
+        for c, s in enumerate(a.ClassSizes()):
+            sizes_a[class_map[c]] = s
+
+        classes = []
+        for c, name in enumerate(b.classes_):
+            ca, sa = sizes_a[c]
+            cb, sb = sizes_b[c]
+            if survivors is None:
+                if ca == cb and sa == sb:
+                    continue
+                new = freed = None
+            else:
+                kept = survivors[c][0]
+                if ca == cb and sa == sb and kept == cb:
+                    continue
+                new = cb - kept
+                freed = ca - kept
+            classes.append({
+                "name": name,
+                "count_a": ca,
+                "count_b": cb,
+                "count_delta": cb - ca,
+                "size_a": sa,
+                "size_b": sb,
+                "size_delta": sb - sa,
+                "new": new,
+                "freed": freed,
+            })
+        classes.sort(key=lambda x: -abs(x["size_delta"]))
+
+        shapes = []
+        for k in set(a.shapes_.keys()) | set(b.shapes_.keys()):
+            ca, sa = a.shapes_.get(k, (0, 0))
+            cb, sb = b.shapes_.get(k, (0, 0))
+            if ca == cb and sa == sb:
+                continue
+            shapes.append({
+                "name": k[0],
+                "map": k[1],
+                "count_delta": cb - ca,
+                "size_delta": sb - sa,
+            })
+        shapes.sort(key=lambda x: -abs(x["size_delta"]))
+
+        return {
+            "a": a.filename_,
+            "b": b.filename_,
+            "node_count_a": len(a.addr_),
+            "node_count_b": len(b.addr_),
+            "size_a": sum(a.size_),
+            "size_b": sum(b.size_),
+            "survivors": survivors is not None,
+            "classes": classes[:top],
+            "shapes": shapes[:top],
+        }
+
+    @staticmethod
+    def PrintReport(report):
+        def short(s, n=80):
+            s = s.replace('\n', ' ')
+            return s if len(s) <= n else s[:n] + '...'
+
+        def count(n):
+            return '-' if n is None else str(n)
+
+        print("a: %s, %d nodes, %d bytes." % (report["a"], report["node_count_a"], report["size_a"]))
+        print("b: %s, %d nodes, %d bytes." % (report["b"], report["node_count_b"], report["size_b"]))
+        if not report["survivors"]:
+            print("no 'mem_addr' in the snapshots, new and freed are not available.")
+        print("")
+        print("%-14s %-14s %-10s %-10s %-10s %s" % ("size delta", "size", "# delta", "# new", "# freed", "constructor"))
+        for c in report["classes"]:
+            print("%-+14d %-14d %-+10d %-10s %-10s %s" % (
+                c["size_delta"], c["size_b"], c["count_delta"], count(c["new"]), count(c["freed"]), short(c["name"])))
+        print("")
+        print("%-14s %-10s %-18s %s" % ("size delta", "# delta", "map", "constructor"))
+        for s in report["shapes"]:
+            print("%-+14d %-+10d 0x%-16x %s" % (s["size_delta"], s["count_delta"], s["map"], short(s["name"])))
@@ -0,0 +1,890 @@
+from __future__ import print_function, division
+
+""" andb.shadow.heap_index : persistent index of the heap objects of a corefile.
+
+    'heap index build' walks the spaces once, the objects are saved in
+    '<corefile>.<isolate>.heapidx' next to the corefile, sorted by address,
+      addr  : object address (Q)
+      map   : map tag (Q)
+      size  : object size (I)
+      type  : instance type (H)
+      space : AllocationSpace id (B)
+    the header keeps the identity of the corefile (path, size, mtime) and
+    the isolate, the index of another corefile or isolate is not used.
+
+    the reverse references (retainers) of the indexed objects are saved in
+    '<index>.retainers' once they are scanned, the contents of the strings
+    in '<index>.strings'.
+"""
+
+import os
+import re
+import mmap
+import time
+import struct
+import hashlib
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import re._parser as sre_parse
+except ImportError:
+    import sre_parse
+
+try:
+    unichr
+except NameError:
+    unichr = chr
+
+import andb.dbg as dbg
+import andb.v8 as v8
+from andb.utility import Logging as log
+from .heap_snapshot import SnapshotJournal
+
+
+class ColumnFile(object):
+    """ the header and identity are followed by fixed-width columns,
+        each padded to 8 bytes, the columns are memoryviews on the map.
+    """
+
+    kMagic = None
+    kVersion = 1
+
+    # magic, version, identity bytes, then the counts of Layout()
+    kHeader = None
+
+    # the opened files by file name
+    _opened = {}
+
+    @classmethod
+    def Layout(cls, *counts):
+        """ return [(column, typecode, count)] in the file order """
+        raise NotImplementedError()
+
+    @classmethod
+    def Write(cls, filename, identity, counts, columns):
+        text = identity.encode('utf-8')
+        tmp = "%s.tmp" % filename
+        with open(tmp, 'wb') as f:
+            f.write(cls.kHeader.pack(cls.kMagic, cls.kVersion, len(text), *counts))
+            f.write(text)
+            f.write(b'\0' * (-len(text) % 8))
+            for name, code, n in cls.Layout(*counts):
+                data = columns[name]
+                if not isinstance(data, array):
+                    data = array(code, data)
+                data = data.tobytes()
+                f.write(data)
+                f.write(b'\0' * (-len(data) % 8))
+        os.rename(tmp, filename)
+
+    @classmethod
+    def Open(cls, filename, identity):
+        """ return the opened file, None if not built for the identity. """
+        if filename in cls._opened:
+            return cls._opened[filename]
+        if not os.path.exists(filename):
+            return None
+        try:
+            f = cls(filename)
+        except Exception as e:
+            log.warn("%s" % e)
+            return None
+        if f.identity_ != identity:
+            print("'%s' is built for another corefile or isolate." % filename)
+            f.Release()
+            return None
+        cls._opened[filename] = f
+        return f
+
+    @classmethod
+    def Close(cls, filename):
+        f = cls._opened.pop(filename, None)
+        if f is not None:
+            f.Release()
+
+    @classmethod
+    def Remove(cls, filename):
+        cls.Close(filename)
+        if os.path.exists(filename):
+            os.unlink(filename)
+            return True
+        return False
+
+    def __init__(self, filename):
+        self.filename_ = filename
+        with open(filename, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        self._columns = {}
+
+        header = self.kHeader.unpack_from(self._mmap, 0)
+        magic, version, length = header[:3]
+        if magic != self.kMagic or version != self.kVersion:
+            self.Release()
+            raise Exception("%s: not a %s file (version %d)." % (filename, self.__class__.__name__, self.kVersion))
+
+        offset = self.kHeader.size
+        self.identity_ = self._mmap[offset:offset + length].decode('utf-8')
+        offset += length + (-length % 8)
+        for name, code, n in self.Layout(*header[3:]):
+            size = n * array(code).itemsize
+            if offset + size > len(self._mmap):
+                self.Release()
+                raise Exception("%s: truncated file." % filename)
+            self._columns[name] = self._view[offset:offset + size].cast(code)
+            offset += size + (-size % 8)
+        self.counts_ = header[3:]
+
+    def Release(self):
+        """ unmap the file, the columns are released """
+        for v in self._columns.values():
+            v.release()
+        self._columns.clear()
+        self._view.release()
+        self._mmap.close()
+
+    def __getitem__(self, name):
+        return self._columns[name]
+
+    def Array(self, name):
+        return numpy.frombuffer(self[name], dtype=self[name].format)
+
+
+class HeapIndex(ColumnFile):
+    """ the columns of the index file, sorted by address.
+    """
+
+    kMagic = b'ANDBHIDX'
+    kVersion = 1
+
+    # magic, version, identity bytes, objects
+    kHeader = struct.Struct('<8sIIQ')
+
+    # (column, typecode) in the file order
+    kColumns = [
+        ('addr', 'Q'),
+        ('map', 'Q'),
+        ('size', 'I'),
+        ('type', 'H'),
+        ('space', 'B'),
+    ]
+
+    @classmethod
+    def Layout(cls, count):
+        return [(name, code, count) for name, code in cls.kColumns]
+
+    @classmethod
+    def Path(cls, isolate):
+        """ return (file name, identity), (None, None) if not a corefile. """
+        identity = SnapshotJournal.Identity(isolate)
+        if identity is None:
+            return None, None
+        core = identity.rsplit(':', 3)[0]
+        return "%s.0x%x.heapidx" % (core, isolate.address), identity
+
+    @classmethod
+    def Build(cls, heap, isolate):
+        """ walk all spaces of the heap, write and open the index. """
+        filename, identity = cls.Path(isolate)
+        if filename is None:
+            print("heap index needs a corefile.")
+            return None
+
+        columns = dict((name, array(code)) for name, code in cls.kColumns)
+        addrs = columns['addr']
+        t0 = time.time()
+        for space_id in v8.AllocationSpace.NonROSpaces():
+            space = heap.getSpace(space_id)
+            if space is None:
+                continue
+            t1 = time.time()
+            n = len(addrs)
+            for chunk in space.getChunks():
+                for address, tag, size in v8.ChunkWalker(chunk).Objects():
+                    addrs.append(address)
+                    columns['map'].append(tag)
+                    columns['size'].append(size)
+                    columns['type'].append(v8.ChunkWalker.MapType(tag))
+                    columns['space'].append(space_id)
+            print("%s: %d objects, %.3fs" % (v8.AllocationSpace.SpaceName(space_id),
+                len(addrs) - n, time.time() - t1))
+
+        # the pages are not in address order
+        if numpy is not None:
+            order = numpy.argsort(numpy.frombuffer(addrs, dtype=numpy.uint64), kind='stable')
+            for name, code in cls.kColumns:
+                columns[name] = array(code, numpy.frombuffer(columns[name], dtype=code)[order].tobytes())
+        else:
+            order = sorted(range(len(addrs)), key=addrs.__getitem__)
+            for name, code in cls.kColumns:
+                col = columns[name]
+                columns[name] = array(code, [col[i] for i in order])
+
+        # the retainers and strings of the former index are stale
+        RetainerIndex.Remove(RetainerIndex.Path(filename))
+        StringIndex.Remove(StringIndex.Path(filename))
+        cls.Close(filename)
+        cls.Write(filename, identity, [len(addrs)], columns)
+        print("%d objects indexed to '%s', %.3fs" % (len(addrs), filename, time.time() - t0))
+        return cls.Open(filename, identity)
+
+    @classmethod
+    def Current(cls):
+        """ return the index of current isolate, or None """
+        iso = v8.Isolate.GetCurrent()
+        if iso is None:
+            return None
+        filename, identity = cls.Path(iso)
+        if filename is None:
+            return None
+        return cls.Open(filename, identity)
+
+    def __len__(self):
+        return self.counts_[0]
+
+    def Row(self, i):
+        """ return (address, map, size, instance type, space) """
+        return tuple(self._columns[name][i] for name, code in self.kColumns)
+
+    def Lookup(self, address):
+        """ return the row of the object at the address, or None """
+        addrs = self['addr']
+        i = bisect_left(addrs, address)
+        if i < len(addrs) and addrs[i] == address:
+            return i
+        return None
+
+    def Find(self, address):
+        """ return the row of the object contains the address, or None """
+        i = bisect_right(self['addr'], address) - 1
+        if i >= 0 and address < self['addr'][i] + self['size'][i]:
+            return i
+        return None
+
+    def Rows(self, space=None, map=None, typ=None):
+        """ return the rows in address order match all given filters,
+            numpy array if numpy is installed.
+        """
+        filters = [(n, v) for n, v in (('space', space), ('map', map), ('type', typ)) if v is not None]
+        if numpy is not None:
+            mask = numpy.ones(len(self), dtype=bool)
+            for n, v in filters:
+                mask &= self.Array(n) == v
+            return numpy.flatnonzero(mask)
+
+        rows = range(len(self))
+        for n, v in filters:
+            col = self[n]
+            rows = [i for i in rows if col[i] == v]
+        return list(rows)
+
+    def Select(self, space=None, map=None, typ=None):
+        """ return [row] in address order match all given filters """
+        rows = self.Rows(space, map, typ)
+        if numpy is not None:
+            return rows.tolist()
+        return rows
+
+    def MapSummary(self, space=None):
+        """ return {map: [count, size, instance type]} """
+        rows = self.Rows(space=space)
+        tbl = {}
+        if numpy is not None:
+            if len(rows) == 0:
+                return tbl
+            maps, first, inverse = numpy.unique(self.Array('map')[rows],
+                    return_index=True, return_inverse=True)
+            counts = numpy.bincount(inverse)
+            sizes = numpy.bincount(inverse, weights=self.Array('size')[rows])
+            types = self.Array('type')[rows][first]
+            for m, c, s, t in zip(maps.tolist(), counts.tolist(), sizes.tolist(), types.tolist()):
+                tbl[m] = [c, int(s), t]
+            return tbl
+
+        maps, sizes, types = self['map'], self['size'], self['type']
+        for i in rows:
+            m = maps[i]
+            if m in tbl:
+                a = tbl[m]
+                a[0] += 1
+                a[1] += sizes[i]
+            else:
+                tbl[m] = [1, sizes[i], types[i]]
+        return tbl
+
+    def Total(self, rows):
+        """ return (count, size) of the rows """
+        if numpy is not None:
+            return len(rows), int(self.Array('size')[rows].sum()) if len(rows) > 0 else 0
+        sizes = self['size']
+        return len(rows), sum(sizes[i] for i in rows)
+
+    def RunStarts(self):
+        """ return [row] of the first objects of the runs of contiguous
+            objects, computed once.
+        """
+        starts = getattr(self, '_run_starts', None)
+        if starts is not None:
+            return starts
+        n = len(self)
+        if n == 0:
+            starts = []
+        elif numpy is not None:
+            A = self.Array('addr')
+            S = self.Array('size')
+            starts = [0] + (numpy.flatnonzero(A[1:] != A[:-1] + S[:-1]) + 1).tolist()
+        else:
+            addrs = self['addr']
+            sizes = self['size']
+            starts = [0] + [i for i in range(1, n) if addrs[i] != addrs[i - 1] + sizes[i - 1]]
+        self._run_starts = starts
+        return starts
+
+    def Runs(self):
+        """ yield [lo, hi) of the rows of contiguous objects """
+        starts = self.RunStarts()
+        for k, lo in enumerate(starts):
+            yield lo, starts[k + 1] if k + 1 < len(starts) else len(self)
+
+    def ShowInfo(self):
+        print("index : %s" % self.filename_)
+        print("core  : %s" % self.identity_)
+        print("%-14s %10s %14s" % ("SPACE", "OBJECTS", "SIZE"))
+        for space_id in v8.AllocationSpace.NonROSpaces():
+            count, size = self.Total(self.Rows(space=space_id))
+            if count > 0:
+                print("%-14s %10d %14d" % (v8.AllocationSpace.SpaceName(space_id), count, size))
+
+
+class RetainerIndex(ColumnFile):
+    """ the reverse references of the heap index, by the target row,
+          sources[offsets[t]:offsets[t + 1]] : rows retain the row t, sorted
+          root_rows, root_ids : rows referenced by the GC roots, and the Root
+        the references are the strong tagged slots except the map word,
+        the objects of raw data (sequential strings, numbers, ...) are not
+        scanned, only the tagged header of code and bytecodes is scanned.
+    """
+
+    kMagic = b'ANDBRETN'
+    kVersion = 1
+
+    # magic, version, identity bytes, objects, references, roots
+    kHeader = struct.Struct('<8sIIQQQ')
+
+    # objects of the types are mostly raw data, the sequential strings
+    # are added by the representation bits, see ScanTable()
+    kRawDataTypes = [
+        'isFreeSpace',
+        'isByteArray',
+        'isFixedDoubleArray',
+        'isHeapNumber',
+        'isBigInt',
+    ]
+
+    # objects of the types are scanned up to the word count (the map word
+    # included), the instructions and bytecodes are raw data.
+    kTaggedHeaderTypes = [
+        # length, constant_pool, handler_table, source_position_table
+        ('isBytecodeArray', 5),
+        # relocation_info, deoptimization_data, source_position_table,
+        # code_data_container
+        ('isCode', 5),
+    ]
+
+    # scan all words of the object
+    kScanAll = 0xffffffff
+
+    # retainers shown for each object
+    kMaxRetainers = 20
+
+    @classmethod
+    def Layout(cls, objects, references, roots):
+        return [
+            ('offsets', 'Q', objects + 1),
+            ('sources', 'I', references),
+            ('root_rows', 'I', roots),
+            ('root_ids', 'H', roots),
+        ]
+
+    @classmethod
+    def Path(cls, index_filename):
+        return "%s.retainers" % index_filename
+
+    @classmethod
+    def ScanTable(cls):
+        """ return array of the scanned words by instance type,
+            0 if the objects are not scanned.
+        """
+        cases = [(n, 0) for n in cls.kRawDataTypes] + cls.kTaggedHeaderTypes
+        scan = array('I', v8.InstanceType.MakeDispatch(cases, cls.kScanAll))
+        is_string = v8.InstanceType.MakeDispatch([('isString', 1)], 0)
+        rep_mask = v8.Internal.kStringRepresentationMask
+        seq = v8.Internal.kSeqStringTag
+        for t in range(min(len(scan), len(is_string))):
+            if is_string[t] and t & rep_mask == seq:
+                scan[t] = 0
+        return scan
+
+    @classmethod
+    def Current(cls, index):
+        return cls.Open(cls.Path(index.filename_), index.identity_)
+
+    @classmethod
+    def Build(cls, index, heap):
+        """ scan the tagged slots of all indexed objects, write and open. """
+        t0 = time.time()
+        scan = cls.ScanTable()
+        targets, sources = cls.ScanReferences(index, scan)
+        t1 = time.time()
+        roots = cls.ScanRoots(index, heap)
+        offsets, sources = cls.MakeCSR(len(index), targets, sources)
+
+        filename = cls.Path(index.filename_)
+        cls.Close(filename)
+        cls.Write(filename, index.identity_, [len(index), len(sources), len(roots)], {
+            'offsets': offsets,
+            'sources': sources,
+            'root_rows': array('I', sorted(roots.keys())),
+            'root_ids': array('H', [roots[r] for r in sorted(roots.keys())]),
+        })
+        print("%d references, %d roots, scanned in %.3fs, saved to '%s' in %.3fs" % (
+            len(sources), len(roots), t1 - t0, filename, time.time() - t1))
+        return cls.Open(filename, index.identity_)
+
+    @classmethod
+    def ScanReferences(cls, index, scan):
+        """ return (targets, sources) rows of all references,
+            the objects of a run are read by one read,
+            scan is the ScanTable().
+        """
+        addrs = index['addr']
+        sizes = index['size']
+        types = index['type']
+        tag_mask = v8.Internal.kHeapObjectTagMask
+        tag = v8.Internal.kHeapObjectTag
+
+        # references found word by word
+        targets = array('I')
+        sources = array('I')
+
+        def ScanObject(i, words):
+            end = scan[types[i]] if types[i] < len(scan) else cls.kScanAll
+            # skip the map word
+            for w in words[1:end]:
+                if w & tag_mask == tag:
+                    t = index.Lookup(w - tag)
+                    if t is not None:
+                        targets.append(t)
+                        sources.append(i)
+
+        if numpy is not None:
+            n = len(index)
+            A = index.Array('addr')
+            limit = numpy.array(list(scan) + [cls.kScanAll], dtype=numpy.uint64)
+            T = index.Array('type').astype(numpy.int64)
+            T[T >= len(scan)] = len(scan)
+            found_targets = []
+            found_sources = []
+
+        for lo, hi in index.Runs():
+            start = addrs[lo]
+            words = dbg.ReadWords(start, addrs[hi - 1] + sizes[hi - 1])
+            if words is None:
+                # not readable in bulk
+                for i in range(lo, hi):
+                    ScanObject(i, v8.TaggedWords(addrs[i], addrs[i] + sizes[i]).words)
+
+            elif numpy is not None:
+                W = numpy.frombuffer(words, dtype=numpy.uint64)
+                at = numpy.flatnonzero((W & numpy.uint64(tag_mask)) == numpy.uint64(tag))
+                pos = numpy.uint64(start) + at.astype(numpy.uint64) * numpy.uint64(8)
+                src = numpy.searchsorted(A[lo:hi], pos, side='right') - 1 + lo
+                # word index in the object, the map word is skipped
+                word = (pos - A[src]) // numpy.uint64(8)
+                keep = (word > 0) & (word < limit[T[src]])
+                dst = W[at[keep]] - numpy.uint64(tag)
+                t = numpy.searchsorted(A, dst)
+                found = t < n
+                found[found] &= A[t[found]] == dst[found]
+                found_targets.append(t[found])
+                found_sources.append(src[keep][found])
+
+            else:
+                for i in range(lo, hi):
+                    first = (addrs[i] - start) // 8
+                    ScanObject(i, words[first:first + sizes[i] // 8])
+
+        if numpy is not None:
+            found_targets.append(numpy.array(targets, dtype=numpy.uint32))
+            found_sources.append(numpy.array(sources, dtype=numpy.uint32))
+            return (numpy.concatenate(found_targets).astype(numpy.uint32),
+                    numpy.concatenate(found_sources).astype(numpy.uint32))
+        return targets, sources
+
+    @classmethod
+    def ScanRoots(cls, index, heap):
+        """ return {row: Root id} of the objects referenced by the roots """
+
+        class RootCollector(v8.RootVisitor):
+            def __init__(self):
+                self.rows = {}
+
+            def VisitRootPointer(self, root, desc, p):
+                obj = v8.HeapObject(p)
+                if not obj.IsHeapObject():
+                    return
+                row = index.Lookup(obj.address)
+                if row is not None and row not in self.rows:
+                    self.rows[row] = root
+
+        v = RootCollector()
+        heap.IterateRoots(v, None)
+        return v.rows
+
+    @classmethod
+    def MakeCSR(cls, count, targets, sources):
+        """ return (offsets, sources) sorted by the target, then the source,
+            the duplicated references are removed.
+        """
+        if numpy is not None:
+            order = numpy.lexsort((sources, targets))
+            targets = targets[order]
+            sources = sources[order]
+            if len(targets) > 0:
+                keep = numpy.ones(len(targets), dtype=bool)
+                keep[1:] = (targets[1:] != targets[:-1]) | (sources[1:] != sources[:-1])
+                targets = targets[keep]
+                sources = sources[keep]
+            offsets = numpy.zeros(count + 1, dtype=numpy.uint64)
+            numpy.cumsum(numpy.bincount(targets, minlength=count), out=offsets[1:])
+            return array('Q', offsets.tobytes()), array('I', sources.tobytes())
+
+        refs = sorted(set(zip(targets, sources)))
+        offsets = array('Q', [0]) * (count + 1)
+        for t, s in refs:
+            offsets[t + 1] += 1
+        for i in range(count):
+            offsets[i + 1] += offsets[i]
+        return offsets, array('I', [s for t, s in refs])
+
+    def Retainers(self, row):
+        """ return [source row] retain the row """
+        offsets = self['offsets']
+        return self['sources'][offsets[row]:offsets[row + 1]].tolist()
+
+    def Roots(self):
+        """ return {row: Root id} """
+        roots = getattr(self, '_roots', None)
+        if roots is None:
+            roots = self._roots = dict(zip(self['root_rows'], self['root_ids']))
+        return roots
+
+    def PathToRoot(self, row):
+        """ return the shortest path [root row, ..., row] from the roots, None if unreachable """
+        roots = self.Roots()
+        parent = {row: None}
+        queue = deque([row])
+        while len(queue) > 0:
+            r = queue.popleft()
+            if r in roots:
+                path = []
+                while r is not None:
+                    path.append(r)
+                    r = parent[r]
+                return path
+            for s in self.Retainers(r):
+                if s not in parent:
+                    parent[s] = r
+                    queue.append(s)
+        return None
+
+
+class StringIndex(ColumnFile):
+    """ the strings of the heap index, in address order,
+          rows     : row of the string in the heap index
+          encoding : bytes per char, 1 or 2
+          length   : chars
+          hash     : 64bits hash of the flattened contents, 0 if not decodable
+        the trigram postings are optional,
+          postings[offsets[k]:offsets[k + 1]] : strings contain the trigram keys[k]
+        strings longer than the trigram length are not in the postings.
+    """
+
+    kMagic = b'ANDBSTRS'
+    kVersion = 1
+
+    # magic, version, identity bytes, strings, trigrams, postings, trigram length
+    kHeader = struct.Struct('<8sIIQQQQ')
+
+    # strings longer are always candidates of grep
+    kTrigramLength = 4096
+
+    @classmethod
+    def Layout(cls, strings, trigrams, postings, trigram_length):
+        return [
+            ('rows', 'I', strings),
+            ('encoding', 'B', strings),
+            ('length', 'I', strings),
+            ('hash', 'Q', strings),
+            ('keys', 'Q', trigrams),
+            ('offsets', 'Q', trigrams + 1 if trigram_length > 0 else 0),
+            ('postings', 'I', postings),
+        ]
+
+    @classmethod
+    def Path(cls, index_filename):
+        return "%s.strings" % index_filename
+
+    @classmethod
+    def Current(cls, index):
+        return cls.Open(cls.Path(index.filename_), index.identity_)
+
+    @classmethod
+    def StringRows(cls, index):
+        """ return [row] of the strings, ThinStrings forward to another one """
+        is_string = bytearray(v8.InstanceType.MakeDispatch([('isString', 1)], 0))
+        rep_mask = v8.Internal.kStringRepresentationMask
+        thin = v8.Internal.kThinStringTag
+        types = index['type']
+        return [i for i in range(len(index))
+                if types[i] < len(is_string) and is_string[types[i]] and types[i] & rep_mask != thin]
+
+    @classmethod
+    def Hash(cls, text):
+        data = text.encode('utf-8', 'surrogatepass')
+        return struct.unpack('<Q', hashlib.md5(data).digest()[:8])[0]
+
+    @classmethod
+    def TrigramKey(cls, a, b, c):
+        return (ord(a) << 42) | (ord(b) << 21) | ord(c)
+
+    @classmethod
+    def Trigrams(cls, text):
+        return set(cls.TrigramKey(*t) for t in zip(text, text[1:], text[2:]))
+
+    @classmethod
+    def Texts(cls, index, rows):
+        """ yield (row, encoding, length, text) of the string rows in address order,
+            text is None if not decodable.
+
+            the rows in the same run of contiguous objects are read by one
+            read, SeqOneByteString and SeqTwoByteString are decoded from the
+            bytes, the other strings are flattened by the String object.
+        """
+        addrs = index['addr']
+        sizes = index['size']
+        types = index['type']
+        rep_mask = v8.Internal.kStringRepresentationMask
+        seq = v8.Internal.kSeqStringTag
+        enc_mask = v8.Internal.kStringEncodingMask
+        one_byte = v8.Internal.kOneByteStringTag
+        length_offset = getattr(v8.String, 'length__offset', 12)
+        chars_offset = v8.String.kHeaderSize
+
+        def Decode(i, data, offset):
+            t = types[i]
+            encoding = 1 if t & enc_mask == one_byte else 2
+            if data is not None and t & rep_mask == seq:
+                length = struct.unpack_from('<i', data, offset + length_offset)[0]
+                start = offset + chars_offset
+                end = start + length * encoding
+                if 0 <= length and end <= offset + sizes[i]:
+                    chars = bytes(data[start:end])
+                    if encoding == 1:
+                        return encoding, length, chars.decode('latin-1')
+                    return encoding, length, chars.decode('utf-16-le', 'surrogatepass')
+            try:
+                o = v8.String(v8.HeapObject.FromAddress(addrs[i]))
+                length = int(o.length)
+                return encoding, length, o.to_string()[:length]
+            except Exception as e:
+                log.warn("string 0x%x: %s" % (addrs[i], e))
+                return encoding, 0, None
+
+        runs = index.RunStarts()
+        group = []
+        for n, i in enumerate(rows):
+            group.append(i)
+            if n + 1 < len(rows) and bisect_right(runs, rows[n + 1]) == bisect_right(runs, i):
+                continue
+
+            # read from the first to the end of the last string of the run
+            start = addrs[group[0]]
+            try:
+                data = dbg.Target.MemoryRead(start, addrs[i] + sizes[i] - start)
+            except Exception:
+                data = None
+            if data is not None and len(data) != addrs[i] + sizes[i] - start:
+                data = None
+            for j in group:
+                encoding, length, text = Decode(j, data, addrs[j] - start)
+                yield j, encoding, length, text
+            group = []
+
+    @classmethod
+    def Build(cls, index, trigrams=False):
+        """ decode all strings of the heap index, write and open. """
+        t0 = time.time()
+        columns = {
+            'rows': array('I'),
+            'encoding': array('B'),
+            'length': array('I'),
+            'hash': array('Q'),
+        }
+        postings = {}
+        limit = cls.kTrigramLength if trigrams else 0
+        for i, encoding, length, text in cls.Texts(index, cls.StringRows(index)):
+            sid = len(columns['rows'])
+            columns['rows'].append(i)
+            columns['encoding'].append(encoding)
+            columns['length'].append(length)
+            columns['hash'].append(0 if text is None else cls.Hash(text))
+            if text is not None and len(text) <= limit:
+                for k in cls.Trigrams(text):
+                    if k in postings:
+                        postings[k].append(sid)
+                    else:
+                        postings[k] = array('I', [sid])
+
+        keys = sorted(postings.keys())
+        offsets = array('Q', [0])
+        columns['postings'] = array('I')
+        for k in keys:
+            columns['postings'].extend(postings[k])
+            offsets.append(len(columns['postings']))
+        columns['keys'] = array('Q', keys)
+        columns['offsets'] = offsets if trigrams else array('Q')
+        t1 = time.time()
+
+        filename = cls.Path(index.filename_)
+        cls.Close(filename)
+        count = len(columns['rows'])
+        cls.Write(filename, index.identity_, [count, len(keys), len(columns['postings']), limit], columns)
+        print("%d strings, %d trigrams, decoded in %.3fs, saved to '%s' in %.3fs" % (
+            count, len(keys), t1 - t0, filename, time.time() - t1))
+        return cls.Open(filename, index.identity_)
+
+    def __len__(self):
+        return self.counts_[0]
+
+    def TrigramLength(self):
+        return self.counts_[3]
+
+    def Postings(self, key):
+        """ return the set of strings contain the trigram key """
+        keys = self['keys']
+        k = bisect_left(keys, key)
+        if k == len(keys) or keys[k] != key:
+            return set()
+        offsets = self['offsets']
+        return set(self['postings'][offsets[k]:offsets[k + 1]])
+
+    @classmethod
+    def Literals(cls, pattern):
+        """ return the literal runs every match of the pattern contains,
+            [] if the pattern ignores case.
+        """
+        regex = re.compile(pattern)
+        if regex.flags & re.IGNORECASE:
+            return []
+
+        runs = []
+        run = []
+
+        def Flush():
+            if len(run) > 0:
+                runs.append(''.join(run))
+                del run[:]
+
+        def Walk(items):
+            for op, av in items:
+                if op == sre_parse.LITERAL:
+                    run.append(unichr(av))
+                elif op == sre_parse.SUBPATTERN and not (len(av) == 4 and av[1] & re.IGNORECASE):
+                    # the group is matched in place
+                    Walk(av[-1])
+                else:
+                    Flush()
+
+        Walk(sre_parse.parse(pattern))
+        Flush()
+        return runs
+
+    def Candidates(self, pattern):
+        """ return the sorted strings may match the pattern """
+        every = range(len(self))
+        limit = self.TrigramLength()
+        if limit == 0:
+            return every
+
+        found = None
+        for s in self.Literals(pattern):
+            if max(ord(c) for c in s) > 0xffff:
+                # surrogate pairs in the heap
+                continue
+            for t in zip(s, s[1:], s[2:]):
+                p = self.Postings(self.TrigramKey(*t))
+                found = p if found is None else found & p
+        if found is None:
+            return every
+
+        lengths = self['length']
+        return sorted(found | set(i for i in every if lengths[i] > limit))
+
+    def Grep(self, index, pattern, flags=0):
+        """ yield (string, address, text, match) of the matched strings """
+        regex = re.compile(pattern, flags)
+        sids = self.Candidates(pattern) if flags & re.IGNORECASE == 0 else range(len(self))
+        rows = self['rows']
+        by_row = dict((rows[s], s) for s in sids)
+        for i, encoding, length, text in self.Texts(index, [rows[s] for s in sids]):
+            if text is None:
+                continue
+            m = regex.search(text)
+            if m is not None:
+                yield by_row[i], index['addr'][i], text, m
+
+    def Duplicates(self, index):
+        """ return [(wasted bytes, count, [string])] of the same contents,
+            the wasted bytes are the sizes except the biggest one.
+        """
+        groups = {}
+        hashes = self['hash']
+        lengths = self['length']
+        for s in range(len(self)):
+            if hashes[s] == 0:
+                continue
+            k = (hashes[s], lengths[s])
+            if k in groups:
+                groups[k].append(s)
+            else:
+                groups[k] = [s]
+
+        rows = self['rows']
+        sizes = index['size']
+        out = []
+        for g in groups.values():
+            if len(g) < 2:
+                continue
+            size = [sizes[rows[s]] for s in g]
+            out.append((sum(size) - max(size), len(g), g))
+        out.sort(key=lambda x: (x[0], x[1]), reverse=True)
+        return out
+
+    def Top(self, index, top=20):
+        """ return [string] of the biggest strings """
+        rows = self['rows']
+        sizes = index['size']
+        return sorted(range(len(self)), key=lambda s: sizes[rows[s]], reverse=True)[:top]
+
+    def Text(self, index, s):
+        """ return the contents of the string, or None """
+        for i, encoding, length, text in self.Texts(index, [self['rows'][s]]):
+            return text
@@ -4,11 +4,22 @@ from __future__ import print_function, division
 import os
 import time
 import json
+import gzip
+import heapq
+import mmap
+import struct
+from array import array
+from bisect import bisect_left
 try:
     import cPickle as pickle
 except:
     import pickle
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 from ..v8.internal import Version
 
 import andb.dbg as dbg 
@@ -35,9 +46,82 @@ class Picklable(object):
         for k,v in data.items():
             setattr(self,k,v)
 
-class HeapGraphEdge(Picklable):
-    """ HeapGraphEdge representa a edge between two HeapEntries.
-        
+class HeapGraphEdges(Picklable):
+    """ columnar storage of all HeapGraphEdges.
+
+        the edge i is (type_[i], name_[i], from_[i], to_[i]),
+          name_ : index for kElement and kHidden edges, or the name id,
+          from_ : index of the parent HeapEntry,
+          to_ : the child, ~index of the HeapEntry if resolved,
+                otherwise the HeapObject address (see GraphHolder).
+    """
+
+    __slots__ = ["type_", "name_", "from_", "to_"]
+
+    def __init__(self):
+        self.type_ = array('B')
+        self.name_ = array('I')
+        self.from_ = array('I')
+        self.to_ = array('q')
+
+    def __len__(self):
+        return len(self.type_)
+
+    def Append(self, typ, name, from_index, to):
+        self.type_.append(typ)
+        self.name_.append(name)
+        self.from_.append(from_index)
+        self.to_.append(to)
+
+    def Clear(self):
+        self.__init__()
+
+
+class HeapEntries(Picklable):
+    """ columnar storage of all HeapEntries,
+        a HeapEntry is referred by its index in the columns.
+    """
+
+    __slots__ = ["type_", "name_", "id_", "self_size_", "edge_count_", "mem_addr_"]
+
+    def __init__(self):
+        # HeapGraphNode type
+        self.type_ = array('B')
+
+        # name id of the HeapEntry
+        self.name_ = array('I')
+
+        # Snapshot Object Id ( by self.id )
+        self.id_ = array('Q')
+
+        # self but without children size
+        self.self_size_ = array('Q')
+
+        # edges count
+        self.edge_count_ = array('I')
+
+        # memory address
+        self.mem_addr_ = array('Q')
+
+    def __len__(self):
+        return len(self.type_)
+
+    def Append(self, typ, name, object_id, size, addr):
+        self.type_.append(typ)
+        self.name_.append(name)
+        self.id_.append(object_id)
+        self.self_size_.append(size)
+        self.edge_count_.append(0)
+        self.mem_addr_.append(addr)
+        return len(self.type_) - 1
+
+    def Clear(self):
+        self.__init__()
+
+
+class HeapGraphEdge(object):
+    """ HeapGraphEdge representa a edge between two HeapEntries,
+        a view of the edge in GraphHolder.edges_.
     """
 
     kContextVariable = 0
@@ -48,60 +132,62 @@ class HeapGraphEdge(Picklable):
     kShortcut = 5
     kWeak = 6
 
-    __slots__ = ["to_entry_", "from_entry_", "type_", "index_or_name_"]
-    
-    """
-    edges consums lots of memory.
-    """
-    def __init__(self, snapshot):
-        # the snapshot it belongs to
-        #self._snapshot = snapshot
-        # edge to object
-        self.to_entry_ = None
-        # edge from index (object index)
-        self.from_entry_ = None 
-        # type above
-        self.type_ = -1
-        # index of the edge, (either index or name) 
-        #self.index_ = 0
-        # index or name of the edge, None for uninialized
-        self.index_or_name_ = None
+    __slots__ = ["_holder", "index_"]
+
+    def __init__(self, holder, index):
+        self._holder = holder
+        self.index_ = index
+
+    @property
+    def type_(self):
+        return self._holder.edges_.type_[self.index_]
+
+    @property
+    def index_or_name_(self):
+        n = self._holder.edges_.name_[self.index_]
+        if self.IsIndexed(self.type_):
+            return n
+        return self._holder.names_[n]
 
     @property
     def to_entry(self):
-        return self.to_entry_
+        """ return HeapEntry, or the address if not resolved. """
+        to = self._holder.edges_.to_[self.index_]
+        if to < 0:
+            return HeapEntry(self._holder, ~to)
+        return to
 
     @property
     def from_entry(self):
-        return self.from_entry_ 
+        return HeapEntry(self._holder, self._holder.edges_.from_[self.index_])
+
+    @classmethod
+    def IsIndexed(cls, t):
+        return t == cls.kElement or t == cls.kHidden
 
     def type(self):
         return self.type_
 
     def index(self):
-        t = self.type
-        if t == self.kElement or t == self.kHidden:
+        if self.IsIndexed(self.type_):
             return int(self.index_or_name_)
         return None
 
     def name(self):
-        t = self.type
-        if t == self.kContextVariable or \
-           t == self.kProperty or \
-           t == self.kInternal or \
-           t == self.kShortcut or \
-           t == self.kWeak:
+        if not self.IsIndexed(self.type_):
             return self.index_or_name_
         return None
 
     def __str__(self):
-        return "edge: type(%d), index_or_name(%s), to(%s), from(%s)" % (self.type_, self.index_or_name_, self.to_entry_, self.from_entry_)
+        return "edge: type(%d), index_or_name(%s), to(%s), from(%s)" % (self.type_, self.index_or_name_, self.to_entry, self.from_entry)
 
     def DebugPrint(self):
         log.print(str(self))
 
 
-class HeapEntry(Picklable):
+class HeapEntry(object):
+    """ HeapEntry, a view of the entry in GraphHolder.entries_.
+    """
 
     # Type from 'HeapGraphNode'
     kHidden = 0
@@ -136,75 +222,35 @@ class HeapEntry(Picklable):
         kBigInt: '/bigint/',
     }
 
-    __slots__ = ["type_", "index_", "self_size_", "id_", "name_", "mem_addr_", "children_count_", "children_end_count_" ]
+    __slots__ = ["_holder", "index_"]
     
-    def __init__(self, snapshot):
-        #self._snapshot = snapshot
-
-        # keep as same as C++ code, with "_" tail
-        # HeapGraphNode type
-        self.type_ = -1
-
-        # array index
-        self.index_ = 0
-
-        # self but without children size
-        self.self_size_ = 0
-
-        # Snapshot Object Id ( by self.id )
-        self.id_ = 0
-
-        # name of the HeapEntry
-        self.name_ = None
-
-        # not used for now
-        #self.trace_node_id_ = 0
-
-        # memory address 
-        self.mem_addr_ = 0
+    def __init__(self, holder, index):
+        self._holder = holder
+        self.index_ = index
 
-        # edges count
-        self.children_count_ = 0
-
-        # edges end index
-        self.children_end_count_ = 0
-
-    def SetIndexedReference(self, snap, typ, index, child):
-        assert typ == HeapGraphEdge.kElement or typ == HeapGraphEdge.kHidden
-        self.children_count_ += 1
-        snap._AddEdge(typ, int(index), self, child)
-        #log.debug("SetIndexedReference: type(%d), index(%d), entry(%d)" % (typ, index, child.id_))
+    @property
+    def type_(self):
+        return self._holder.entries_.type_[self.index_]
 
-    def SetNamedReference(self, snap, typ, name, child):
-        assert typ != HeapGraphEdge.kElement and typ != HeapGraphEdge.kHidden
-        self.children_count_ += 1
-        snap._AddEdge(typ, str(name), self, child)
-        #log.debug("SetNamedReference: type(%d), name(%s), entry(%d)" % (typ, name, child.id_))
+    @property
+    def name_(self):
+        return self._holder.names_[self._holder.entries_.name_[self.index_]]
 
-    def SetIndexedAutoIndexReference(self, snap, typ, child_entry):
-        # heap snapshot count array from 1.
-        index = self.children_count_ + 1
-        self.SetIndexedReference(snap, typ, index, child_entry)
-    
-    def SetNamedAutoIndexReference(self, snap, typ, desc, child_entry):
-        index = self.children_count_ + 1
-        if isinstance(desc, str) and len(desc) > 0:
-            name = "%d / %s" % (index, desc)
-        else:
-            name = "%d" % index
-        #print("SetNamedAutoIndexReference", name, typ)
-        self.SetNamedReference(snap, typ, name, child_entry)
+    @property
+    def id_(self):
+        return self._holder.entries_.id_[self.index_]
 
-    def set_children_index(self, index):
-        next_index = index + self.children_count_
-        self.children_end_count_ = index
-        return next_index
+    @property
+    def self_size_(self):
+        return self._holder.entries_.self_size_[self.index_]
 
-    def GetRealEntry(self):
-        return self
+    @property
+    def mem_addr_(self):
+        return self._holder.entries_.mem_addr_[self.index_]
 
-    def GetLastEntry(self):
-        return self
+    @property
+    def children_count_(self):
+        return self._holder.entries_.edge_count_[self.index_]
 
     def DebugPrint(self):
         log.print("node: type(%s), id(%s), child(%d), size(%s), name(%s)" % (self.type_, self.id_, self.children_count_, self.self_size_, self.name_.encode('unicode_escape')))
@@ -213,70 +259,224 @@ class HeapEntry(Picklable):
         """ return type's string
         """
         root_type = self.type_
-        if root_type in type_strings:
-            return type_strings[root_type]
+        if root_type in self.type_strings:
+            return self.type_strings[root_type]
         return "???"
 
     def __str__(self):
         return "<Entry %s>" % (self.name_.encode('unicode_escape'))
 
-class LazyEntry(Picklable):
-    __slots__ = ['real_entry_']
 
-    def __init__(self):
-        # Unresolved HeapEntry should be None
-        self.real_entry_ = None 
+class SourceLocation(Picklable):
+    __slots__ = ["_entry", "_id", "_line", "_col"]
 
-    def GetRealEntry(self):
-        """ Get Last HeapEntry,
-            return None if not exists.
-        """
-        next_entry = self.real_entry_
-        while next_entry is not None:
-            if isinstance(next_entry, HeapEntry):
-                return next_entry
-            next_entry = next_entry.real_entry_
-        return None
+    def __init__(self, entry, script_id, line, col):
+        self._entry = entry 
+        self._id = script_id
+        self._line = line
+        self._col = col
 
-    def GetLastEntry(self):
-        """ Return Last Entry in list,
-            return self if only One entry in list.
-        """
-        if self.real_entry_ is None:
-            return self
 
-        last_entry = self.real_entry_
-        
-        while True:
-            if isinstance(last_entry, HeapEntry):
-                return last_entry
-            
-            if last_entry.real_entry_ is None:
-                return last_entry
-            
-            last_entry = next_entry.real_entry_
+class ShardFile(object):
+    """ binary file of a parsed shard (snapshot_N.rec).
+
+        the header is followed by fixed-width columns, each padded to 8 bytes,
+          entries   : type(B), name(I), self_size(Q), edge_count(I), mem_addr(Q)
+          addresses : mem_addr(q) in order, and the entry index(I)
+          edges     : type(B), name(I), from(I), to(q)
+          names     : offset(Q) of each name and the end, utf-8 text(B)
+          locations : entry, script_id, line, col (q)
+        name ids and entry indexes are local to the shard, object ids are
+        given when the shard is merged.
+
+        the file is mapped by Open(), the columns are memoryviews on the map.
+    """
+
+    kMagic = b'ANDBSHRD'
+    kVersion = 1
+
+    # magic, version, reserved, entries, edges, names, text bytes, locations
+    kHeader = struct.Struct('<8sIIQQQQQ')
+
+    @classmethod
+    def Layout(cls, entries, edges, names, text, locations):
+        """ return [(column, typecode, count)] in the file order """
+        return [
+            ('entry_type', 'B', entries),
+            ('entry_name', 'I', entries),
+            ('entry_size', 'Q', entries),
+            ('entry_edge_count', 'I', entries),
+            ('entry_addr', 'Q', entries),
+            ('addr_table', 'q', entries),
+            ('addr_entries', 'I', entries),
+            ('edge_type', 'B', edges),
+            ('edge_name', 'I', edges),
+            ('edge_from', 'I', edges),
+            ('edge_to', 'q', edges),
+            ('name_offsets', 'Q', names + 1),
+            ('name_text', 'B', text),
+            ('locations', 'q', locations * 4),
+        ]
+
+    @classmethod
+    def Write(cls, holder, filename):
+        """ write the columns of GraphHolder to file """
+        e = holder.entries_
+        g = holder.edges_
+
+        order = sorted(range(len(e)), key=e.mem_addr_.__getitem__)
+        texts = [n.encode('utf-8', 'surrogatepass') for n in holder.names_]
+        offsets = array('Q', [0])
+        for t in texts:
+            offsets.append(offsets[-1] + len(t))
+        locations = array('q')
+        for l in holder.locations_:
+            locations.extend([l._entry, int(l._id), int(l._line), int(l._col)])
+
+        columns = {
+            'entry_type': e.type_,
+            'entry_name': e.name_,
+            'entry_size': e.self_size_,
+            'entry_edge_count': e.edge_count_,
+            'entry_addr': e.mem_addr_,
+            'addr_table': array('q', [e.mem_addr_[i] for i in order]),
+            'addr_entries': array('I', order),
+            'edge_type': g.type_,
+            'edge_name': g.name_,
+            'edge_from': g.from_,
+            'edge_to': g.to_,
+            'name_offsets': offsets,
+            'name_text': b''.join(texts),
+            'locations': locations,
+        }
 
-    def SetRealEntry(self, entry):
-        """ Set entry to last of list.
+        with open(filename, 'wb') as f:
+            f.write(cls.kHeader.pack(cls.kMagic, cls.kVersion, 0,
+                len(e), len(g), len(texts), offsets[-1], len(holder.locations_)))
+            for name, code, n in cls.Layout(len(e), len(g), len(texts), offsets[-1], len(holder.locations_)):
+                data = columns[name]
+                if isinstance(data, array):
+                    data = data.tobytes()
+                f.write(data)
+                f.write(b'\0' * (-len(data) % 8))
+
+    @classmethod
+    def Open(cls, filename):
+        return cls(filename)
+
+    def __init__(self, filename):
+        with open(filename, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        self._columns = {}
+
+        magic, version, _, entries, edges, names, text, locations = \
+                self.kHeader.unpack_from(self._mmap, 0)
+        if magic != self.kMagic or version != self.kVersion:
+            self.Close()
+            raise Exception("%s: not a shard file (version %d)." % (filename, self.kVersion))
+
+        offset = self.kHeader.size
+        for name, code, n in self.Layout(entries, edges, names, text, locations):
+            size = n * array(code).itemsize
+            if offset + size > len(self._mmap):
+                self.Close()
+                raise Exception("%s: truncated shard file." % filename)
+            self._columns[name] = self._view[offset:offset + size].cast(code)
+            offset += size + (-size % 8)
+
+        self.entries_count_ = entries
+        self.edges_count_ = edges
+
+    def __getitem__(self, name):
+        return self._columns[name]
+
+    def __len__(self):
+        return self.entries_count_
+
+    def Names(self):
+        """ return the name strings, name id is the index """
+        offsets = self['name_offsets']
+        text = self['name_text']
+        return [text[offsets[i]:offsets[i + 1]].tobytes().decode('utf-8', 'surrogatepass') \
+                for i in range(len(offsets) - 1)]
+
+    def Entries(self):
+        return (self['entry_type'], self['entry_name'], self['entry_size'],
+                self['entry_edge_count'], self['entry_addr'])
+
+    def Edges(self):
+        return (self['edge_type'], self['edge_name'], self['edge_from'], self['edge_to'])
+
+    def Locations(self):
+        l = self['locations']
+        return [tuple(l[i:i + 4]) for i in range(0, len(l), 4)]
+
+    def Addresses(self, base=0):
+        """ yield (address, index + base) in address order """
+        for addr, index in zip(self['addr_table'], self['addr_entries']):
+            yield (addr, index + base)
+
+    def Close(self):
+        """ unmap the file, the columns are released """
+        for v in self._columns.values():
+            v.release()
+        self._columns.clear()
+        self._view.release()
+        self._mmap.close()
+
+
+class SnapshotWriter(object):
+    """ buffered writer for the heapsnapshot file,
+        the file is gzip compressed if the filename ends with '.gz'.
+    """
+
+    # flush the buffer over the size
+    kBufferSize = 1024 * 1024
+
+    def __init__(self, filename):
+        if filename.endswith('.gz'):
+            self._file = gzip.open(filename, 'wb')
+        else:
+            self._file = open(filename, 'wb')
+        self._buffer = []
+        self._size = 0
+
+    def Write(self, text):
+        self._buffer.append(text)
+        self._size += len(text)
+        if self._size >= self.kBufferSize:
+            self.Flush()
+
+    def WriteArray(self, rows):
+        """ write rows (text of each row) as a json array body,
+            rows are separated by ','.
         """
-        last_entry = self.GetLastEntry()
-        assert isinstance(last_entry, LazyEntry)
-        last_entry.real_entry_ = entry
+        first = True
+        for r in rows:
+            if first:
+                first = False
+                self.Write(r)
+            else:
+                self.Write(',')
+                self.Write(r)
 
-    #def __str__(self):
-    #    if self.real_entry_ is None:
-    #        return "<LazyEntry None>"
-    #    return "<LazyEntry %s>" % (self.real_entry_)
+    def Flush(self):
+        if len(self._buffer) == 0:
+            return
+        self._file.write(''.join(self._buffer).encode('utf-8'))
+        self._buffer = []
+        self._size = 0
 
+    def Close(self):
+        self.Flush()
+        self._file.close()
 
-class SourceLocation(Picklable):
-    __slots__ = ["_entry", "_id", "_line", "_col"]
+    def __enter__(self):
+        return self
 
-    def __init__(self, entry, script_id, line, col):
-        self._entry = entry 
-        self._id = script_id
-        self._line = line
-        self._col = col
+    def __exit__(self, *args):
+        self.Close()
 
 class v8HeapExplorer:
     """ iterator all objects in v8 heap """
@@ -346,6 +546,13 @@ class ProgressCounter:
 
 
 class GraphHolder(object):
+    """ holds the entries and edges in columns.
+
+        a HeapEntry is referred by its index (int) in entries_,
+        the child of an edge is either the ~index of the HeapEntry or the
+        address of the HeapObject, which is resolved by ResolveEdges() after
+        all HeapObjects are added.
+    """
    
     # id 
     kObjectIdStep = 2
@@ -362,17 +569,24 @@ class GraphHolder(object):
         self._next_id = 0
         
         # holds all objects resolved
-        self.entries_ = []
+        self.entries_ = HeapEntries()
 
         # holds all edges
-        self.edges_ = []
+        self.edges_ = HeapGraphEdges()
 
         # holds the location info
         self.locations_ = []
 
-        # address to HeapEntry or LazyEntry map 
+        # address to HeapEntry index map 
         self.entries_map_ = {}
 
+        # interned names, the name id is the index,
+        # heap snapshot string uses arrays start from 1.
+        self.names_ = ["<dummy>"]
+
+        # name to name id map
+        self.names_map_ = {}
+
     @property
     def id(self):
         """ return current object id """
@@ -381,6 +595,27 @@ class GraphHolder(object):
         self._next_id += self.kObjectIdStep 
         return i
 
+    def NameIndex(self, name_string):
+        """ return the name id of the string """
+        name = name_string
+        
+        # cut string
+        if cfg.cfgHeapSnapshotMaxStringLength > 0 and \
+            len(name) > cfg.cfgHeapSnapshotMaxStringLength:
+            name = name[:cfg.cfgHeapSnapshotMaxStringLength] + '...'
+
+        if name in self.names_map_:
+            # if exists
+            return self.names_map_[name] 
+        next_index = len(self.names_)
+        self.names_.append(name)
+        self.names_map_[name] = next_index
+        return next_index 
+
+    def GetEntry(self, index):
+        """ return HeapEntry view of the index """
+        return HeapEntry(self, index)
+
     def _AddEntry(self, typ, name, size, addr, object_id = -1):
         """ add HeapEntry to self.entries_ 
 
@@ -390,6 +625,8 @@ class GraphHolder(object):
             id : uniq object id 
             self_size : only self node size
             mem_addr : HeapObject memory address
+
+        return the index of the HeapEntry
         """
         # print(typ, name, size, addr, object_id)
         if isinstance(name, py23.string_types) or \
@@ -403,19 +640,8 @@ class GraphHolder(object):
 
         if object_id <= 0:
             object_id = self.id
-        e = HeapEntry(self)
-        e.index_ = len(self.entries_)
-        e.type_ = typ
-        e.name_ = name
-        e.self_size_ = size
-        e.mem_addr_ = addr 
-        e.id_ = object_id
-        #e.DebugPrint()
-        #if typ == 3 and len(name) == 0:
-        #    raise Exception('name is blank')
         #log.debug("_AddEntry: type(%d), id(%d), size(%d)" % (typ, object_id, size))
-        self.entries_.append(e)
-        return e
+        return self.entries_.Append(typ, self.NameIndex(name), object_id, size, addr)
     
     def _AddEdge(self, edge_type, name_or_index, entry, child):
         """ new HeapGraphEdge for self.edges_
@@ -423,34 +649,39 @@ class GraphHolder(object):
         arg:
           edge_type: the type of the Edge defined in HeapGraphEdge
           name_or_index : edge name or index
-          entry : parent HeapEntry (from)
-          child : child HeapEntry (to)
+          entry : parent HeapEntry index (from)
+          child : child, ~index of HeapEntry or address (to)
         """
-        e = HeapGraphEdge(self)
-        e.type_ = edge_type
-        #if isinstance(name_or_index, str):
-            # is string
-        #    e.name_ = name_or_index
-        #else:
-        #    e.index_ = name_or_index
-
-
-        e.index_or_name_ = name_or_index
-        e.from_entry_ = entry
-        e.to_entry_ = child
+        if HeapGraphEdge.IsIndexed(edge_type):
+            name = int(name_or_index)
+        else:
+            name = self.NameIndex(name_or_index)
+        self.entries_.edge_count_[entry] += 1
+        self.edges_.Append(edge_type, name, entry, child)
 
-        self.edges_.append(e)
-        #e.DebugPrint()
-        return e
+    def SetIndexedReference(self, entry, typ, index, child):
+        assert typ == HeapGraphEdge.kElement or typ == HeapGraphEdge.kHidden
+        self._AddEdge(typ, int(index), entry, child)
+        #log.debug("SetIndexedReference: type(%d), index(%d), entry(%d)" % (typ, index, entry))
 
-    def AddLazyEntry(self, obj):
-        assert isinstance(obj, v8.HeapObject)
-        ptr = obj.address
+    def SetNamedReference(self, entry, typ, name, child):
+        assert typ != HeapGraphEdge.kElement and typ != HeapGraphEdge.kHidden
+        self._AddEdge(typ, str(name), entry, child)
+        #log.debug("SetNamedReference: type(%d), name(%s), entry(%d)" % (typ, name, entry))
 
-        assert ptr not in self.entries_map_
-        entry = LazyEntry()
-        self.entries_map_[ptr] = entry
-        return entry
+    def SetIndexedAutoIndexReference(self, entry, typ, child):
+        # heap snapshot count array from 1.
+        index = self.entries_.edge_count_[entry] + 1
+        self.SetIndexedReference(entry, typ, index, child)
+    
+    def SetNamedAutoIndexReference(self, entry, typ, desc, child):
+        index = self.entries_.edge_count_[entry] + 1
+        if isinstance(desc, str) and len(desc) > 0:
+            name = "%d / %s" % (index, desc)
+        else:
+            name = "%d" % index
+        #print("SetNamedAutoIndexReference", name, typ)
+        self.SetNamedReference(entry, typ, name, child)
 
     def AddDummyEntry(self, obj):
         addr = obj.address 
@@ -484,8 +715,8 @@ class GraphHolder(object):
         return self.AddEntryObject(obj)
 
     def GetEntryOrLazy(self, tag):
-        """ Get tag HeapEntry or a LazyEntry should be created.
-
+        """ Get the child of an edge to the tag,
+            ~index of the HeapEntry if exists, or the address to be resolved.
         """
         if isinstance(tag, v8.HeapObject):
             obj = tag
@@ -501,11 +732,47 @@ class GraphHolder(object):
 
         # return cached entry
         if ptr in self.entries_map_:
-            log.debug("Found <0x%x> Entry." % ptr)
-            return self.entries_map_[ptr]
-
-        # Add New LazyEntry
-        return self.AddLazyEntry(obj)
+            return ~self.entries_map_[ptr]
+
+        # resolved later
+        return ptr
+
+    # (InstanceType predicate, HeapEntry type and name, or method) for AddEntryObject,
+    # the first matched wins.
+    _entry_cases = [
+        ('isJSFunction', 'AddEntryJSFunction'),
+        ('isJSBoundFunction', (HeapEntry.kClosure, "native_bind")),
+        ('isJSObject', 'AddEntryJSObject'),
+        ('isString', 'AddEntryString'),
+        ('isSymbol', 'AddEntrySymbol'),
+        ('isBigInt', (HeapEntry.kBigInt, "bigint")),
+        ('isCode', (HeapEntry.kCode, "")),
+        ('isSharedFunctionInfo', 'AddEntrySharedFunctionInfo'),
+        ('isScript', 'AddEntryScript'),
+        ('isNativeContext', (HeapEntry.kHidden, "system / NativeContext")),
+        ('isContext', (HeapEntry.kObject, "system / Context")),
+        ('isFixedArray', (HeapEntry.kArray, "")),
+        ('isFixedDoubleArray', (HeapEntry.kArray, "")),
+        ('isByteArray', (HeapEntry.kArray, "")),
+        ('isHeapNumber', (HeapEntry.kHeapNumber, "heap number")),
+    ]
+
+    # _entry_cases indexed by instance type, built after InstanceType is loaded.
+    _entry_table = []
+
+    @classmethod
+    def BuildDispatch(cls):
+        cls._entry_table = v8.InstanceType.MakeDispatch(cls._entry_cases)
+
+    @staticmethod
+    def Dispatch(table, cases, typ):
+        """ return the value of the first case matches the instance type. """
+        if 0 <= typ < len(table):
+            return table[typ]
+        for name, value in cases:
+            if getattr(v8.InstanceType, name)(typ):
+                return value
+        return None
 
     def AddEntryObject(self, obj):
         """ new HeapEntry by HeapObject address
@@ -519,68 +786,11 @@ class GraphHolder(object):
         #import traceback
         #traceback.print_stack()
 
-        if v8.InstanceType.isJSFunction(obj_type):
-            o = v8.JSFunction(obj)
-            shared = o.shared_function_info
-            script = shared.script
-            if script is not None:
-                name = "%s %s" % (shared.NameStr(), script.name)
-            else:
-                name = shared.NameStr()
-            return self.AddEntryObjectSize(heap_obj, HeapEntry.kClosure, name)
-
-        elif v8.InstanceType.isJSBoundFunction(obj_type):
-            return self.AddEntryObjectSize(heap_obj, HeapEntry.kClosure, "native_bind")
-        
-        elif v8.InstanceType.isJSObject(obj_type):
-            o = v8.JSObject(obj)
-            name = self.GetConstructorName(o)
-            return self.AddEntryObjectSize(heap_obj, HeapEntry.kObject, name)
-
-        elif v8.InstanceType.isString(obj_type):
-            o = v8.String(obj)
-            if o.IsConsString():
-                return self.AddEntryObjectSize(heap_obj, HeapEntry.kConsString, "(concatenated string)")
-            elif o.IsSlicedString():
-                return self.AddEntryObjectSize(heap_obj, HeapEntry.kSlicedString, "(sliced string)")
-            else:
-                #print("%x: %s" % (o.address, o.to_string()))
-                name = o.to_string()
-                return self.AddEntryObjectSize(heap_obj, HeapEntry.kString, name)
-
-        elif v8.InstanceType.isSymbol(obj_type):
-            o = v8.Symbol(obj)
-            if o.is_private:
-                return self.AddEntryObjectSize(heap_obj, HeapEntry.kHidden, "private symbol") 
-            return self.AddEntryObjectSize(heap_obj, HeapEntry.kSymbol, "symbol")
-
-        elif v8.InstanceType.isBigInt(obj_type):
-            return self.AddEntryObjectSize(heap_obj, HeapEntry.kBigInt, "bigint")
-
-        elif v8.InstanceType.isCode(obj_type):
-            return self.AddEntryObjectSize(heap_obj, HeapEntry.kCode, "")
-
-        elif v8.InstanceType.isSharedFunctionInfo(obj_type):
-            o = v8.SharedFunctionInfo(obj)
-            return self.AddEntryObjectSize(heap_obj, HeapEntry.kCode, o.DebugName())
-
-        elif v8.InstanceType.isScript(obj_type):
-            o = v8.Script(obj)
-            return self.AddEntryObjectSize(heap_obj, HeapEntry.kCode, o.DebugName())
-
-        elif v8.InstanceType.isNativeContext(obj_type):
-            return self.AddEntryObjectSize(heap_obj, HeapEntry.kHidden, "system / NativeContext")
-
-        elif v8.InstanceType.isContext(obj_type):
-            return self.AddEntryObjectSize(heap_obj, HeapEntry.kObject, "system / Context")
-
-        elif v8.InstanceType.isFixedArray(obj_type) or \
-             v8.InstanceType.isFixedDoubleArray(obj_type) or \
-             v8.InstanceType.isByteArray(obj_type):
-            return self.AddEntryObjectSize(heap_obj, HeapEntry.kArray, "")
-
-        elif v8.InstanceType.isHeapNumber(obj_type):
-            return self.AddEntryObjectSize(heap_obj, HeapEntry.kHeapNumber, "heap number")
+        case = self.Dispatch(self._entry_table, self._entry_cases, obj_type)
+        if isinstance(case, tuple):
+            return self.AddEntryObjectSize(heap_obj, case[0], case[1])
+        elif case is not None:
+            return getattr(self, case)(heap_obj)
 
         # STUB: remove after implemented.
         return self.AddEntryObjectSize(
@@ -588,6 +798,46 @@ class GraphHolder(object):
                 HeapEntry.kHidden, 
                 self.GetSystemEntryName(heap_obj))
 
+    def AddEntryJSFunction(self, heap_obj):
+        o = v8.JSFunction(heap_obj)
+        shared = o.shared_function_info
+        script = shared.script
+        if script is not None:
+            name = "%s %s" % (shared.NameStr(), script.name)
+        else:
+            name = shared.NameStr()
+        return self.AddEntryObjectSize(heap_obj, HeapEntry.kClosure, name)
+
+    def AddEntryJSObject(self, heap_obj):
+        o = v8.JSObject(heap_obj)
+        name = self.GetConstructorName(o)
+        return self.AddEntryObjectSize(heap_obj, HeapEntry.kObject, name)
+
+    def AddEntryString(self, heap_obj):
+        o = v8.String(heap_obj)
+        if o.IsConsString():
+            return self.AddEntryObjectSize(heap_obj, HeapEntry.kConsString, "(concatenated string)")
+        elif o.IsSlicedString():
+            return self.AddEntryObjectSize(heap_obj, HeapEntry.kSlicedString, "(sliced string)")
+        #print("%x: %s" % (o.address, o.to_string()))
+        limit = int(cfg.cfgHeapSnapshotMaxStringLength)
+        name = o.to_string(limit=limit + 1 if limit > 0 else -1)
+        return self.AddEntryObjectSize(heap_obj, HeapEntry.kString, name)
+
+    def AddEntrySymbol(self, heap_obj):
+        o = v8.Symbol(heap_obj)
+        if o.is_private:
+            return self.AddEntryObjectSize(heap_obj, HeapEntry.kHidden, "private symbol") 
+        return self.AddEntryObjectSize(heap_obj, HeapEntry.kSymbol, "symbol")
+
+    def AddEntrySharedFunctionInfo(self, heap_obj):
+        o = v8.SharedFunctionInfo(heap_obj)
+        return self.AddEntryObjectSize(heap_obj, HeapEntry.kCode, o.DebugName())
+
+    def AddEntryScript(self, heap_obj):
+        o = v8.Script(heap_obj)
+        return self.AddEntryObjectSize(heap_obj, HeapEntry.kCode, o.DebugName())
+
     def AddEntryObjectSize(self, obj, typ, name, size = -1):
         """ Add Object(with name and size) to snapshot.
             
@@ -653,77 +903,30 @@ class GraphHolder(object):
         else:
             return "system / %s" % v8.InstanceType.CamelName(typ)
 
-    """ Map Entries List API
+    """ Map Entries API
         
-        the map list holds the all address to HeapObject mappings.
+        the map holds the all address to HeapEntry index mappings.
 
-        FindMapEntry: get the first entry for address.
         FindMapHeapEntry: get the HeapEntry for address.
-        AddMapEntry: put HeapEntry or LazyEntry to list. 
-        AddMapHeapEntry: put HeapEntry to map list(last in list).
-        AddMapLazyEntry: put LazyEntry to map list(first in list).
+        AddMapHeapEntry: put HeapEntry to map.
     """
 
-    def FindMapEntry(self, addr):
+    def FindMapHeapEntry(self, addr):
         """ find by address
             
-            Return,
-              None: not found,
-              entry: HeapEntry or LazyEntry found
+            Return:
+              None: not found.
+              index of the HeapEntry
         """
         if addr in self.entries_map_:
             return self.entries_map_[addr]
         return None
 
-    def FindMapHeapEntry(self, addr):
-        """ get Real HeapEntry from LazyEntry list.
-            
-            Return:
-              None: no HeapEntry at end of list.
-              HeapEntry: first HeapEntry in list.
-        """
-        next_entry = self.FindMapEntry(addr)
-        while next_entry is not None:
-            if isinstance(next_entry, HeapEntry):
-                return next_entry
-            next_entry = next_entry.real_entry_
-        return None
-
-    def AddMapEntry(self, addr, entry):
-        """ Add Entry to entries map 
-        """
-        if isinstance(entry, HeapEntry):
-            return self.AddMapHeapEntry(addr, entry)
-        return self.AddMapLazyEntry(addr, entry) 
-
     def AddMapHeapEntry(self, addr, entry):
-        """ Add HeapEntry to MapEntry List
-        """
-        assert isinstance(entry, HeapEntry)
-        if addr not in self.entries_map_:
-            self.entries_map_[addr] = entry
-            return entry
-
-        cur = self.entries_map_[addr]
-        assert isinstance(cur, LazyEntry)
-        while cur is not None:
-            if cur.real_entry_ is None:
-                cur.real_entry_ = entry
-                return entry
-            cur = cur.real_entry_
-        return entry
-
-    def AddMapLazyEntry(self, addr, entry):
-        """ Add LazyEntry to MapEntry List
+        """ Add HeapEntry to map, the first one is kept.
         """
-        assert isinstance(entry, LazyEntry)
         if addr not in self.entries_map_:
             self.entries_map_[addr] = entry
-            return entry
-        
-        cur = self.entries_map_[addr]
-        entry.real_entry_ = cur
-        self.entries_map_[addr] = entry
         return entry
 
 
@@ -735,50 +938,112 @@ class GraphHolder(object):
         if entry is None:
             return None
 
-        if entry.name_ is None or len(entry.name_) == 0:
-            entry.name_ = name
+        if len(self.names_[self.entries_.name_[entry]]) == 0:
+            self.entries_.name_[entry] = self.NameIndex(name)
             log.debug("TagObject: 0x%x as '%s'" % (obj, name))
 
     def CleanAll(self):
         self.entries_map_.clear()
-        del self.entries_[:]
-        del self.edges_[:]
+        self.entries_.Clear()
+        self.edges_.Clear()
         del self.locations_[:]
+        self.names_ = ["<dummy>"]
+        self.names_map_.clear()
 
     def Validity(self):
-        id_map = {}
-        for p,e in self.entries_map_.items():
-            id_map[id(e)] = p
+        edges = self.edges_
+        addrs = self.entries_.mem_addr_
+        for i in range(len(edges)):
+            print(HeapGraphEdge(self, i))
+            to = edges.to_[i]
+            if to < 0:
+                to = addrs[~to]
+            print("from: %x, to: %x" % (addrs[edges.from_[i]], to))
+
+    def MergeColumns(self, names, entries, edges, locations):
+        """ append the columns of another GraphHolder or a ShardFile,
+              names : the name strings, the name id is the index,
+              entries : (type, name, self_size, edge_count, mem_addr) columns,
+              edges : (type, name, from, to) columns,
+              locations : [(entry, script_id, line, col)],
+            columns are arrays or memoryviews.
+
+            entries are appended after ours (index + base), name ids are
+            re-interned, edges to entries are rebased, edges to address are kept.
+            return base
+        """
+        base = len(self.entries_)
+
+        def raw(column):
+            # frombytes() takes byte buffers only
+            return memoryview(column).cast('B')
+
+        # name id in source to name id in self
+        remap = array('I', [0] + [self.NameIndex(n) for n in names[1:]])
+
+        # Move entries
+        e_type, e_name, e_size, e_count, e_addr = entries
+        n = len(e_type)
+        dst = self.entries_
+        dst.type_.frombytes(raw(e_type))
+        if numpy is not None:
+            r = numpy.frombuffer(remap, dtype=numpy.uint32)
+        if numpy is not None and n > 0:
+            dst.name_.frombytes(r[numpy.frombuffer(e_name, dtype=numpy.uint32)].tobytes())
+        else:
+            dst.name_.extend(array('I', [remap[i] for i in e_name]))
+        step = self.kObjectIdStep
+        dst.id_.extend(array('Q', range(self._next_id, self._next_id + n * step, step)))
+        self._next_id += n * step
+        dst.self_size_.frombytes(raw(e_size))
+        dst.edge_count_.frombytes(raw(e_count))
+        dst.mem_addr_.frombytes(raw(e_addr))
 
-        for i in self.edges_:
-            print(i)
-            from_entry = id(i.from_entry_)
-            to_entry = id(i.to_entry_)
-            print("from: %x, to: %x" % (id_map[from_entry], id_map[to_entry]))
+        # Move edges,
+        # ~index - base == ~(index + base)
+        g_type, g_name, g_from, g_to = edges
+        dst = self.edges_
+        dst.type_.frombytes(raw(g_type))
+        if numpy is not None and len(g_type) > 0:
+            t = numpy.frombuffer(g_type, dtype=numpy.uint8)
+            name = numpy.frombuffer(g_name, dtype=numpy.uint32)
+            indexed = (t == HeapGraphEdge.kElement) | (t == HeapGraphEdge.kHidden)
+            name = numpy.where(indexed, name, r[numpy.where(indexed, 0, name)])
+            dst.name_.frombytes(name.astype(numpy.uint32).tobytes())
+            frm = numpy.frombuffer(g_from, dtype=numpy.uint32).astype(numpy.int64) + base
+            dst.from_.frombytes(frm.astype(numpy.uint32).tobytes())
+            to = numpy.frombuffer(g_to, dtype=numpy.int64)
+            dst.to_.frombytes(numpy.where(to < 0, to - base, to).tobytes())
+        else:
+            dst.name_.extend(array('I', [n if HeapGraphEdge.IsIndexed(t) else remap[n] \
+                    for t, n in zip(g_type, g_name)]))
+            dst.from_.extend(array('I', [i + base for i in g_from]))
+            dst.to_.extend(array('q', [i - base if i < 0 else i for i in g_to]))
+
+        for entry, script_id, line, col in locations:
+            self.locations_.append(SourceLocation(entry + base, script_id, line, col))
+        return base
 
     @profiler
     def SaveFile(self, filename):
-        """ write data to file.
+        """ write data to shard file.
         """
-        a = {"entries_map": self.entries_map_,
-             "entries": self.entries_,
-             "edges": self.edges_,
-             "locations": self.locations_}
-
-        with open(filename, 'wb') as f:
-            pickle.dump(a, f, pickle.HIGHEST_PROTOCOL)
+        ShardFile.Write(self, filename)
 
     @profiler
     def LoadFile(self, filename):
-        """ read data from file.
+        """ read data from shard file.
         """
-        with open(filename, 'rb') as f:
-            a = pickle.load(f)
+        self.CleanAll()
+        shard = ShardFile.Open(filename)
+        try:
+            self.MergeColumns(shard.Names(), shard.Entries(), shard.Edges(), shard.Locations())
+        finally:
+            shard.Close()
 
-        self.entries_map_ = a['entries_map']
-        self.entries_ = a['entries']
-        self.edges_ = a['edges']
-        self.locations_ = a['locations']
+        # the first HeapEntry of the address is kept
+        for i, p in enumerate(self.entries_.mem_addr_):
+            self.AddMapHeapEntry(p, i)
 
 class ObjectParser(GraphHolder):
 
@@ -887,12 +1152,12 @@ class ObjectParser(GraphHolder):
         # based on typeof(name_or_index)
         if isinstance(name_or_index, int):
             raise Exception(name_or_index)
-            parent_entry.SetIndexedReference(self, typ, name_or_index, child_entry)
+            self.SetIndexedReference(parent_entry, typ, name_or_index, child_entry)
         elif isinstance(name_or_index, str):
-            parent_entry.SetNamedReference(self, typ, name_or_index, child_entry)
+            self.SetNamedReference(parent_entry, typ, name_or_index, child_entry)
         elif isinstance(name_or_index, unicode):
             name = name_or_index.encode('utf-8')
-            parent_entry.SetNamedReference(self, typ, name, child_entry)
+            self.SetNamedReference(parent_entry, typ, name, child_entry)
         else:
             print(name_or_index, type(name_or_index))
             raise Exception
@@ -906,7 +1171,7 @@ class ObjectParser(GraphHolder):
         child_entry = self.GetEntryOrLazy(child_obj)
         assert child_entry is not None
        
-        parent_entry.SetIndexedReference(self, typ, name_or_index, child_entry)
+        self.SetIndexedReference(parent_entry, typ, name_or_index, child_entry)
 
     def ExtractReferencesAccessorInfo(self, parent_entry, obj):
         o = v8.AccessorInfo(obj)
@@ -1000,9 +1265,9 @@ class ObjectParser(GraphHolder):
 
     def ExtractReferencesWeakArray(self, entry, obj):
         o = v8.WeakFixedArray(obj.address)
-        length = o.length
-        for i in range(length):
-            p = v8.HeapObject(o.Get(i))
+        elements = o.Elements()
+        for i in range(len(elements)):
+            p = v8.HeapObject(elements[i])
             #print("WeakArray[%d]: %s"%(i, p))
             if p.IsWeak():
                 self.SetReferenceObject(HeapGraphEdge.kWeak, entry, i, p)
@@ -1024,9 +1289,9 @@ class ObjectParser(GraphHolder):
 
     def ExtractReferencesFixedArray(self, entry, obj):
         o = v8.FixedArray(obj.address)
-        length = o.length
-        for i in range(length):
-            tag = o.Get(i)
+        elements = o.Elements()
+        for i in range(len(elements)):
+            tag = elements[i]
             self.SetReferenceObject(HeapGraphEdge.kInternal, entry, "%d" % i, v8.HeapObject(tag))
 
     def ExtractReferencesPropertyCell(self, entry, obj):
@@ -1185,90 +1450,175 @@ class ObjectParser(GraphHolder):
         o = v8.JSGlobalProxy(obj.address)
         self.SetReferenceObject(HeapGraphEdge.kInternal, entry, "native_context", v8.HeapObject(o.native_context))
 
+    # (InstanceType predicate, extractor) for ExtractReferences, the first matched wins.
+    # TBD: JSArrayBuffer, FeedbackCell, AllocationSite, WeakFixedArray, WeakArrayList,
+    #      EphemronHashTable
+    _extract_cases = [
+        ('isJSGlobalProxy', 'ExtractReferencesJSGlobalProxy'),
+        # TBD: JSWeakSet, JSSet, JSMap, JSPromise, JSGeneratorObject
+        ('isJSObject', 'ExtractReferencesJSObject'),
+        ('isString', 'ExtractReferencesString'),
+        ('isSymbol', 'ExtractReferencesSymbol'),
+        ('isMap', 'ExtractReferencesMap'),
+        ('isSharedFunctionInfo', 'ExtractReferencesSharedFunctionInfo'),
+        ('isScript', 'ExtractReferencesScript'),
+        ('isAccessorInfo', 'ExtractReferencesAccessorInfo'),
+        ('isAccessorPair', 'ExtractReferencesAccessorPair'),
+        ('isCode', 'ExtractReferencesCode'),
+        ('isCell', 'ExtractReferencesCell'),
+        ('isPropertyCell', 'ExtractReferencesPropertyCell'),
+        ('isFeedbackVector', 'ExtractReferencesFeedbackVector'),
+        ('isDescriptorArray', 'ExtractReferencesDescriptorArray'),
+        ('isContext', 'ExtractReferncesContext'),
+        ('isFixedArray', 'ExtractReferencesFixedArray'),
+    ]
+
+    # _extract_cases indexed by instance type, built after InstanceType is loaded.
+    _extract_table = []
+
+    @classmethod
+    def BuildExtractDispatch(cls):
+        cls._extract_table = v8.InstanceType.MakeDispatch(cls._extract_cases)
+
     def ExtractReferences(self, entry, obj):
         #log.debug("ExtractReferences : 0x%x"% (obj.address))
 
         typ = obj.instance_type
         #print("<0x%x> %s" % (obj, v8.InstanceType(typ).name))
 
-        """ only for debugging
-        """
-        if v8.InstanceType.isJSGlobalProxy(typ):
-            self.ExtractReferencesJSGlobalProxy(entry, obj)
-
-        # TBD: JSArrayBuffer
-
-        elif v8.InstanceType.isJSObject(typ):
-            # TBD: JSWeakSet, JSSet, JSMap, JSPromise, JSGeneratorObject
-            self.ExtractReferencesJSObject(entry, obj)
-        
-        elif v8.InstanceType.isString(typ):
-            self.ExtractReferencesString(entry, obj)
-
-        elif v8.InstanceType.isSymbol(typ):
-            self.ExtractReferencesSymbol(entry, obj)
-        
-        elif v8.InstanceType.isMap(typ):
-            self.ExtractReferencesMap(entry, obj)
-
-        elif v8.InstanceType.isSharedFunctionInfo(typ):
-            self.ExtractReferencesSharedFunctionInfo(entry, obj)
-
-        elif v8.InstanceType.isScript(typ):
-            self.ExtractReferencesScript(entry, obj)
-
-        elif v8.InstanceType.isAccessorInfo(typ):
-            self.ExtractReferencesAccessorInfo(entry, obj)
-
-        elif v8.InstanceType.isAccessorPair(typ):
-            self.ExtractReferencesAccessorPair(entry, obj)
+        extractor = self.Dispatch(self._extract_table, self._extract_cases, typ)
+        if extractor is not None:
+            getattr(self, extractor)(entry, obj)
 
-        elif v8.InstanceType.isCode(typ):
-            self.ExtractReferencesCode(entry, obj)
-
-        elif v8.InstanceType.isCell(typ):
-            self.ExtractReferencesCell(entry, obj)
+    def ExtractLocation(self, entry, obj):
+        if obj.IsJSFunction():
+            js_fun = v8.JSFunction(obj.address) 
+            script = js_fun.shared_function_info.script
+            if script is None:
+                return
 
-        # TBD: FeedbackCell
+            script_id = int(script.id)
+            self.AddLocation(entry, script_id, 0, 0)
 
-        elif v8.InstanceType.isPropertyCell(typ):
-            self.ExtractReferencesPropertyCell(entry, obj)
+        # TBD: JSObject Constructor
 
-        # TBD: AllocationSite
 
-        elif v8.InstanceType.isFeedbackVector(typ):
-            self.ExtractReferencesFeedbackVector(entry, obj)
+class SnapshotJournal(object):
+    """ progress journal of a resumable heap snapshot.
 
-        elif v8.InstanceType.isDescriptorArray(typ):
-            self.ExtractReferencesDescriptorArray(entry, obj)
+        '<filename>.d/' holds the parsed pages and the journal,
+          part_N.rec : parsed pages of checkpoint N (ShardFile)
+          journal    : 'journal <version> <identity>' in the first line,
+                       then 'part <N> <page> ...' once part_N.rec is written.
+        the identity is made of the corefile and the isolate address,
+        the journal of another core or isolate is discarded.
+    """
 
-        # TBD: WeakFixedArray
+    kVersion = 1
 
-        # TBD: WeakArrayList
+    # parsed pages are saved after the committed bytes
+    kCheckpointBytes = 64 * 1024 * 1024
 
-        elif v8.InstanceType.isContext(typ):
-            self.ExtractReferncesContext(entry, obj)
+    def __init__(self, filename, identity):
+        self._directory = "%s.d" % filename
+        self._identity = identity
 
-        # TBD: EphemronHashTable
+        # (checkpoint index, [page address])
+        self._parts = []
 
-        # TBD: FixedArray
-        elif v8.InstanceType.isFixedArray(typ):
-            self.ExtractReferencesFixedArray(entry, obj)
+        # addresses of the parsed pages
+        self._pages = set()
 
-    def ExtractLocation(self, entry, obj):
-        if obj.IsJSFunction():
-            js_fun = v8.JSFunction(obj.address) 
-            script = js_fun.shared_function_info.script
-            if script is None:
-                return
+        self._file = None
 
-            script_id = int(script.id)
-            self.AddLocation(entry, script_id, 0, 0)
+    @classmethod
+    def Identity(cls, isolate):
+        """ return the identity of the corefile and isolate, None if not a corefile. """
+        core = os.environ.get('ANDB_CORE') or dbg.Target.GetCoreFile()
+        if core is None:
+            return None
+        st = os.stat(core)
+        return "%s:%d:%d:0x%x" % (os.path.abspath(core), st.st_size, int(st.st_mtime), isolate.address)
+
+    def Path(self, name):
+        return "%s/%s" % (self._directory, name)
+
+    def Load(self):
+        """ load the journal, return True if it can be resumed. """
+        if self._identity is None or not os.path.exists(self.Path("journal")):
+            return False
+
+        with open(self.Path("journal")) as f:
+            lines = f.read().split('\n')
+        if lines[0] != "journal %d %s" % (self.kVersion, self._identity):
+            print("journal of another corefile or isolate, discarded.")
+            return False
+
+        # the last line is incomplete if not ended
+        for line in lines[1:-1]:
+            a = line.split()
+            if len(a) < 2 or a[0] != 'part':
+                continue
+            pages = [int(p, 16) for p in a[2:]]
+            if not os.path.exists(self.Path("part_%d.rec" % int(a[1]))):
+                break
+            self._parts.append((int(a[1]), pages))
+            self._pages.update(pages)
+        return True
 
-        # TBD: JSObject Constructor
+    def Open(self, resume=True):
+        """ resume the journal, or start a new one. """
+        if resume and self.Load():
+            print("resume from '%s', %d pages in %d parts." % (
+                self._directory, len(self._pages), len(self._parts)))
+        else:
+            self.Remove()
+            os.mkdir(self._directory)
+
+        # rewrite the journal without the incomplete lines
+        with open(self.Path("journal.tmp"), 'w') as f:
+            f.write("journal %d %s\n" % (self.kVersion, self._identity))
+            for n, pages in self._parts:
+                f.write(self.PartLine(n, pages))
+        os.rename(self.Path("journal.tmp"), self.Path("journal"))
+        self._file = open(self.Path("journal"), 'a')
+
+    def PartLine(self, n, pages):
+        return "part %d %s\n" % (n, " ".join("0x%x" % p for p in pages))
+
+    def IsDone(self, page):
+        return page in self._pages
+
+    def Commit(self, parser, pages):
+        """ save the parsed pages as a new part, then journal it. """
+        n = len(self._parts) and self._parts[-1][0] + 1
+        parser.SaveFile(self.Path("part_%d.rec.tmp" % n))
+        os.rename(self.Path("part_%d.rec.tmp" % n), self.Path("part_%d.rec" % n))
+
+        self._file.write(self.PartLine(n, pages))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._parts.append((n, pages))
+        self._pages.update(pages)
+        print("checkpoint %d, %d pages parsed." % (n, len(self._pages)))
+
+    def Parts(self):
+        """ return the files of the parts in order """
+        return [self.Path("part_%d.rec" % n) for n, pages in self._parts]
+
+    def Remove(self):
+        """ remove the journal and the parts """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if not os.path.isdir(self._directory):
+            return
+        for f in os.listdir(self._directory):
+            os.unlink(self.Path(f))
+        os.rmdir(self._directory)
 
 
-class HeapSnapshot(GraphHolder):
+class HeapSnapshot(ObjectParser):
 
     def __init__(self):
        
@@ -1300,13 +1650,10 @@ class HeapSnapshot(GraphHolder):
         # holds the location info
         #self.locations_ = []
 
-        # holds all names the snapshot has 
-        self.names_ = {}
-
         """ caches 
         """
-        # all edges belongs to HeapEntry, flat list
-        self.children_ = []
+        # all edges belongs to HeapEntry, edge indexes ordered by parent
+        self.children_ = array('I')
 
         # map for HeapObject adddress to HeapEntry (ptr to entry)
         #self.entries_map_ = {}
@@ -1317,6 +1664,16 @@ class HeapSnapshot(GraphHolder):
         # user roots
         self.user_roots_ = {}
 
+        # sorted address table of the HeapEntries and the entry indexes
+        self.addr_table_ = array('q')
+        self.addr_entries_ = array('I')
+
+        # HeapEntries are added in the address table
+        self._indexing = False
+
+        # (base, ShardFile) merged by ReduceGenerate()
+        self._shards = []
+
         """ counter
         """
         self._progress_counter = ProgressCounter(self)
@@ -1376,11 +1733,11 @@ class HeapSnapshot(GraphHolder):
         #raise Exception
 
         # root_entry -- Element --> gc_root_entry
-        self.root().SetIndexedAutoIndexReference(self, HeapGraphEdge.kElement, self.gc_roots())
+        self.SetIndexedAutoIndexReference(self.root(), HeapGraphEdge.kElement, ~self.gc_roots())
        
         # gc_root -- Element --> gc_subroot(i)
         for i in range(v8.Root.kNumberOfRoots):
-            self.gc_roots().SetIndexedAutoIndexReference(self, HeapGraphEdge.kElement, self.gc_subroot(i)) 
+            self.SetIndexedAutoIndexReference(self.gc_roots(), HeapGraphEdge.kElement, ~self.gc_subroot(i)) 
 
         # a memory entry for object address
         self.mem_entry_ = self._AddEntry(HeapEntry.kSynthetic, "(Tagged Pointer)", 0, 0)
@@ -1393,9 +1750,9 @@ class HeapSnapshot(GraphHolder):
         # TBD: is_weak
         name = self.RootName(child_obj.tag)
         if name is None:
-            self.gc_subroot(root).SetNamedAutoIndexReference(self, HeapGraphEdge.kInternal, desc, child_entry)
+            self.SetNamedAutoIndexReference(self.gc_subroot(root), HeapGraphEdge.kInternal, desc, child_entry)
         else:
-            self.gc_subroot(root).SetNamedReference(self, HeapGraphEdge.kInternal, name, child_entry)
+            self.SetNamedReference(self.gc_subroot(root), HeapGraphEdge.kInternal, name, child_entry)
 
         # treat global objects as user roots
         if is_weak or not child_obj.IsNativeContext():
@@ -1410,7 +1767,7 @@ class HeapSnapshot(GraphHolder):
         if ptr not in self.user_roots_:
             self.user_roots_[ptr] = 1
             child_entry = self.GetEntryOrLazy(js_global)
-            self.root().SetNamedAutoIndexReference(self, HeapGraphEdge.kShortcut, "", child_entry)
+            self.SetNamedAutoIndexReference(self.root(), HeapGraphEdge.kShortcut, "", child_entry)
 
     def IterateRoots(self):
 
@@ -1508,92 +1865,53 @@ class HeapSnapshot(GraphHolder):
         # write back to snapshot
         #self.Merge(parser)
 
-    def ParsePage(self, page):
-        parser = ObjectParser()
-        cnt = 0
-        failed = []
-        
-        for obj in page.walk():
-            cnt = cnt + 1
-
-            # skip free space
-            if v8.InstanceType.isFreeSpace(obj.instance_type) and \
-                cfg.cfgHeapSnapshotShowFreeSapce == 0:
-                continue
-
-            try:
-                parser.ExtractObject(obj)
-            except Exception as e:
-                log.error("Parse <0x%x> failed: %s" % (obj, e))
-                failed.append(obj)
-
-        self.Merge(parser)
-        return (cnt, failed,)
-
     def Merge(self, parser):
-
-        #print("entries: %d, keys(%d), edges: %d, location: %d" % (len(parser.entries_), len(parser.entries_map_.keys()), len(parser.edges_), len(parser.locations_))) 
-
         """
-        Linkup, Link all entries of parser and snapshot by memory address,
-        cases,
-        | in parser | in snapshot | action |
-        | HeapEntry |        None | move HeapEntry link to snapshot |
-        | HeapEntry |   LazyEntry | link snapshot's LazyEntry link to parser's |
-        | LazyEntry |        None | move LazyEntry link to snapshot |
-        | LazyEntry |   LazyEntry | link snapshot's lazyEntry to parser's |
+        Linkup, move the parser's columns to snapshot,
+          the address map keeps the first HeapEntry.
         """
-        for p,n in parser.entries_map_.items():
-
-            # parser has HeapEntry
-            parser_last_entry = n.GetLastEntry()
-
-            # address in snapshot
-            snap_entry = self.FindMapEntry(p)
-            
-            # 1. not found, add HeapEntry
-            if snap_entry is None:
-                self.entries_map_[p] = parser_last_entry
-                continue 
-
-            snap_last_entry = snap_entry.GetLastEntry()
+        e = parser.entries_
+        g = parser.edges_
+        base = self.MergeColumns(parser.names_,
+                (e.type_, e.name_, e.self_size_, e.edge_count_, e.mem_addr_),
+                (g.type_, g.name_, g.from_, g.to_),
+                [(l._entry, l._id, l._line, l._col) for l in parser.locations_])
+
+        for p, i in parser.entries_map_.items():
+            if p not in self.entries_map_:
+                self.entries_map_[p] = i + base
+
+    def MergeShard(self, shard):
+        """ move the columns of ShardFile to snapshot,
+            the shard is kept for MergeAddressTables(), return base.
+        """
+        base = self.MergeColumns(shard.Names(), shard.Entries(), shard.Edges(), shard.Locations())
+        self._shards.append((base, shard))
+        return base
 
-            # 2. parser has HeapEntry 
-            if isinstance(parser_last_entry, HeapEntry):
-                assert snap_last_entry.real_entry_ is None, print("0x%x"%p, snap_last_entry)
-                snap_last_entry.real_entry_ = parser_last_entry
-            
-            # 3. Snapshot has HeapEntry
-            elif isinstance(snap_last_entry, HeapEntry):
-                assert parser_last_entry.real_entry_ is None, print("0x%x"%p, parser_last_entry)
-                parser_last_entry.real_entry_ = snap_last_entry
-            
-            # 4. link parser LazyEntry to snapshot's
-            else:
-                assert parser_last_entry.real_entry_ is None
-                assert isinstance(snap_entry, LazyEntry)
-                parser_last_entry.real_entry_ = snap_entry
-
-        # Move entries,
-        # entries_ holds all the HeapEntry 
-        for n in parser.entries_:
-            # update id
-            n.index_ = len(self.entries_) 
-            n.id_ = self.id
-            self.entries_.append(n)
+    def MergeAddressTables(self):
+        """ k-way merge the sorted addresses of the merged shards to the
+            address table, the shards are closed.
+        """
+        shards = self._shards
+        if len(shards) == 0:
+            return
+        table = array('q')
+        entries = array('I')
+        last = -1
+        for addr, index in heapq.merge(*[s.Addresses(base) for base, s in shards]):
+            # the first HeapEntry of the address is kept
+            if addr == last:
+                continue
+            table.append(addr)
+            entries.append(index)
+            last = addr
+        self.addr_table_ = table
+        self.addr_entries_ = entries
 
-        # Move edges,
-        # entries_map[addr]
-        #   \ LazyEntry -> None
-        #   \ LazyEntry -> HeapEntry 
-        for n in parser.edges_:
-            #print(n.to_entry_, n.from_entry_)
-            
-            assert isinstance(n.from_entry_, HeapEntry)
-            if isinstance(n.to_entry_, LazyEntry):
-                last_entry = n.to_entry_.GetLastEntry()
-                n.to_entry_ = last_entry
-            self.edges_.append(n)
+        for base, s in shards:
+            s.Close()
+        del shards[:]
 
     def IterateROHeapObjects(self):
         cnt = 0
@@ -1611,38 +1929,147 @@ class HeapSnapshot(GraphHolder):
             m = i.map
             print("0x%x : Map(0x%x), Type(%s)" % (i.tag, m.address, v8.InstanceType.Name(m.instance_type)))
 
-    def IterateHeapObjects(self):
-        from time import time
+    """ two-pass builder,
+
+        1. IndexHeapObjects() adds the HeapEntry of all HeapObjects and
+           builds the sorted address table (address to entry index).
+        2. ExtractHeapObjects() extracts the references of all HeapObjects,
+           the edges are kept with the child address.
+        ResolveEdges() searches all the child addresses in the table at once.
+    """
+
+    def WalkHeapObjects(self):
+        """ yield all HeapObjects, the ReadOnly Heap first, then the old spaces.
+            the FreeSpace objects are skipped.
+        """
+        show_free_space = int(cfg.cfgHeapSnapshotShowFreeSapce)
+        ro_heap = self._isolate.ReadOnlyHeap()
+        for obj in v8.ReadOnlyHeapObjectIterator(ro_heap):
+            yield obj
+
         heap = self.heap()
-        spaces = v8.AllocationSpace.OnlyOldSpaces()
-        total = 0
-        failed = []
-        
-        t1 = time()
-        for name in spaces:
+        for name in v8.AllocationSpace.OnlyOldSpaces():
             space = heap.getSpace(name)
             chunks = space.getChunks()
-            len_chunks = len(chunks)
             print("%s : %d pages" % (space.name, len(chunks)))
-            for i in range(len_chunks):
-                c = chunks[i]
-                cnt, fail = self.ParsePage(c)
+            for c in chunks:
+                for obj in c.walk():
+                    if v8.InstanceType.isFreeSpace(obj.instance_type) and \
+                        show_free_space == 0:
+                        continue
+                    yield obj
 
-                total = total + cnt
-                if len(fail) > 0:
-                    failed.extend(fail)
+    def AddMapHeapEntry(self, addr, entry):
+        """ the entries added in IndexHeapObjects() are kept in address table.
+        """
+        if self._indexing:
+            return entry
+        return super(HeapSnapshot, self).AddMapHeapEntry(addr, entry)
 
-                t2 = time()
-                print("%d/%d 0x%012x: Entry(%d), Edge(%d), Time(%.3fs), Obj(%d)" % 
-                        (i, len_chunks, c.address, len(self.entries_), len(self.edges_), t2-t1, cnt))
-                t1 = t2 
+    def FindMapHeapEntry(self, addr):
+        """ find by address, in the address table first.
+        """
+        addrs = self.addr_table_
+        i = bisect_left(addrs, addr)
+        if i < len(addrs) and addrs[i] == addr:
+            return self.addr_entries_[i]
+        return super(HeapSnapshot, self).FindMapHeapEntry(addr)
+
+    @profiler
+    def IndexHeapObjects(self):
+        """ pass 1, add HeapEntry for all HeapObjects """
+        first = len(self.entries_)
+        cnt = 0
+        failed = 0
 
-        print("Iterated %d Objects" % (total))
+        progress = ProgressCounter(self)
+        self._indexing = True
+        try:
+            for obj in self.WalkHeapObjects():
+                try:
+                    self.AddEntryObject(obj)
+                except Exception as e:
+                    log.error("Parse <0x%x> failed: %s" % (obj, e))
+                    self.AddDummyEntry(obj)
+                    failed += 1
+                cnt += 1
+                progress.Tick(self.entries_.self_size_[-1])
+        finally:
+            self._indexing = False
+
+        self.BuildAddressTable(first, len(self.entries_))
+        print("Indexed %d Objects, failed %d." % (cnt, failed))
+
+    def BuildAddressTable(self, first, last):
+        """ sort the entries[first:last] by address """
+        addrs = self.entries_.mem_addr_
+        if numpy is not None:
+            a = numpy.frombuffer(addrs, dtype=numpy.uint64)[first:last]
+            order = numpy.argsort(a, kind='stable')
+            self.addr_table_ = array('q')
+            self.addr_table_.frombytes(a[order].astype(numpy.int64).tobytes())
+            self.addr_entries_ = array('I')
+            self.addr_entries_.frombytes((order + first).astype(numpy.uint32).tobytes())
+        else:
+            order = sorted(range(first, last), key=addrs.__getitem__)
+            self.addr_table_ = array('q', [addrs[i] for i in order])
+            self.addr_entries_ = array('I', order)
+
+    @profiler
+    def ExtractHeapObjects(self):
+        """ pass 2, extract the references of all HeapObjects """
+        cnt = 0
+        failed = []
+        progress = ProgressCounter(self)
+        sizes = self.entries_.self_size_
+        for obj in self.WalkHeapObjects():
+            try:
+                self.ExtractObject(obj)
+            except Exception as e:
+                log.error("Parse <0x%x> failed: %s" % (obj, e))
+                failed.append(obj)
+            cnt += 1
+            entry = self.FindMapHeapEntry(obj.address)
+            progress.Tick(sizes[entry] if entry is not None else 0)
+
+        print("Iterated %d Objects" % (cnt))
         print("failed HeapObject: %d" % (len(failed)))
         for i in failed:
             m = i.map
             print("0x%x : Map(0x%x), Type(%s)" % (i.tag, m.address, v8.InstanceType.Name(m.instance_type)))
 
+    def SearchAddressTable(self, to):
+        """ return a copy of the edge children (to), the addresses found in
+            the address table are replaced by ~index.
+        """
+        addrs = self.addr_table_
+        entries = self.addr_entries_
+        n = len(addrs)
+        if n == 0:
+            return array('q', to)
+
+        if numpy is not None:
+            v = numpy.frombuffer(to, dtype=numpy.int64)
+            table = numpy.frombuffer(addrs, dtype=numpy.int64)
+            pos = numpy.searchsorted(table, v)
+            pos[pos >= n] = n - 1
+            hit = (v >= 0) & (table[pos] == v)
+            out = v.copy()
+            out[hit] = ~numpy.frombuffer(entries, dtype=numpy.uint32)[pos[hit]].astype(numpy.int64)
+            a = array('q')
+            a.frombytes(out.tobytes())
+            return a
+
+        out = array('q', to)
+        for i in range(len(out)):
+            p = out[i]
+            if p < 0:
+                continue
+            j = bisect_left(addrs, p)
+            if j < n and addrs[j] == p:
+                out[i] = ~entries[j]
+        return out
+
     def IterateHeapObjects2(self):
         cnt = 0
         failed = []
@@ -1669,179 +2096,94 @@ class HeapSnapshot(GraphHolder):
         cnt=0
         failed=0
         print("Resolve all edges ...")
-        for p,v in self.entries_map_.items():
-            last = v.GetLastEntry()
-            if isinstance(last, LazyEntry):
-                #print("0x%x" % p)
-                ho = v8.HeapObject.FromAddress(p)
-                try:
-                    entry = self.GetHeapEntry(ho)
-                    cnt = cnt + 1
-                except Exception as e:
-                    print("Parsing failed %x" % p, e)
-                    entry = self.AddDummyEntry(ho)
-                    failed = failed + 1
+        to = self.SearchAddressTable(self.edges_.to_)
+
+        # objects not walked, add the HeapEntry
+        lazy = set()
+        for p in to:
+            if p >= 0 and p not in self.entries_map_:
+                lazy.add(p)
+        for p in sorted(lazy):
+            #print("0x%x" % p)
+            ho = v8.HeapObject.FromAddress(p)
+            try:
+                entry = self.GetHeapEntry(ho)
+                cnt = cnt + 1
+            except Exception as e:
+                print("Parsing failed %x" % p, e)
+                entry = self.AddDummyEntry(ho)
+                failed = failed + 1
         print("Done, resolved %d, failed %d." % (cnt, failed))
 
-        def ResolveEntry(entry):
-            if isinstance(entry, HeapEntry):
-                return entry
-
-            last = entry.GetLastEntry()
-            assert last is not None
-            assert isinstance(last, HeapEntry), print(last)
-            return last
-
-        for e in self.edges_:
-            e.from_entry_ = ResolveEntry(e.from_entry_)
-            #assert isinstance(e.from_entry_, HeapEntry), print(e) 
-            e.to_entry_ = ResolveEntry(e.to_entry_)
-            #assert isinstance(e.to_entry_, HeapEntry), print(e)
+        entries_map = self.entries_map_
+        for i in range(len(to)):
+            p = to[i]
+            if p >= 0:
+                to[i] = ~entries_map[p]
+        self.edges_.to_ = to
 
         print("Total Entry(%d), Edge(%d)" % (len(self.entries_), len(self.edges_)))
 
     def FillChild(self):
-
+        """ order the edges by parent entry (counting sort),
+            children_[first[i]:first[i] + edge_count[i]] are the edges of entry i.
+        """
+        edge_count = self.entries_.edge_count_
+        first = array('Q', [0]) * len(edge_count)
         acuminate_index = 0
-        for node in self.entries_:
-            acuminate_index = node.set_children_index(acuminate_index) 
-
-        # enlarge the children size to edges 
-        self.children_ = []
-        for i in range(len(self.edges_)):
-            self.children_.append(None)
+        for i in range(len(edge_count)):
+            first[i] = acuminate_index
+            acuminate_index += edge_count[i]
 
-        # add_child
-        for edge in self.edges_:
-            entry = edge.from_entry
-            self.children_[entry.children_end_count_] = edge 
-            entry.children_end_count_ += 1
-
-        log.debug("child_cnt: %d, edges_cnt: %d" % (len(self.children_), len(self.edges_)))
-        if len(self.children_) != len(self.edges_):
+        log.debug("child_cnt: %d, edges_cnt: %d" % (acuminate_index, len(self.edges_)))
+        if acuminate_index != len(self.edges_):
             raise Exception
 
-        # check all the chilren was filled.
-        bad_list = []
-        for i in range(len(self.children_)):
-            if self.children_[i] is None:
-                bad_list.append(i)
-        assert len(bad_list) == 0, bad_list
-
-    def NameIndex(self, name_string):
-        name = name_string
-        
-        # cut string
-        if cfg.cfgHeapSnapshotMaxStringLength > 0 and \
-            len(name) > cfg.cfgHeapSnapshotMaxStringLength:
-            name = name[:cfg.cfgHeapSnapshotMaxStringLength] + '...'
-
-        # heap snapshot string uses arrays start from 1.
-        next_index = len(self.names_) + 1
-        if name in self.names_:
-            # if exists
-            return self.names_[name] 
-        self.names_[name] = next_index
-        return next_index 
+        # add_child
+        children = array('I', [0]) * acuminate_index
+        i = 0
+        for entry in self.edges_.from_:
+            children[first[entry]] = i
+            first[entry] += 1
+            i += 1
+        self.children_ = children
 
     def CleanAll(self):
         self.root_entry_ = None
         self.gc_roots_entry_ = None
         del self.gc_subroot_entries_[:]
-        self.names_.clear()
-        del self.children_[:]
+        self.children_ = array('I')
+        self.addr_table_ = array('q')
+        self.addr_entries_ = array('I')
         self.strong_gc_subroot_names_.clear()
 
-        #del self.entries_[:]
-        #del self.edges_[:]
-        #del self.locations_[:]
-        #self.entries_map_.clear()
- 
         # super clean
         super(HeapSnapshot, self).CleanAll()
 
     def SerializeNodes(self):
-        ay = []
-        for n in self.entries_:
-            #n.DebugPrint()
-            ay += [ n.type_, 
-                    self.NameIndex(n.name_),
-                    n.id_,
-                    n.self_size_,
-                    n.children_count_,
-                    n.mem_addr_,
-                    ]
-        return ay 
+        """ yield the text of each node """
+        e = self.entries_
+        for n in zip(e.type_, e.name_, e.id_, e.self_size_, e.edge_count_, e.mem_addr_):
+            yield "%d,%d,%d,%d,%d,0,%d\n" % n
 
     def SerializeEdges(self):
-        ay = []
-        for n in self.children_:
-            #n.DebugPrint() 
-            if isinstance(n.index_or_name_, int):
-                index = int(n.index_or_name_)
-                assert n.type_ == HeapGraphEdge.kElement or n.type_ == HeapGraphEdge.kHidden
-            else:
-                index = self.NameIndex(n.index_or_name_)
-
+        """ yield the text of each edge """
+        e = self.edges_
+        for i in self.children_:
             # edge needs multiple to sizeof(node_fields)
-            ay += [ n.type_,
-                    int(index),
-                    int(n.to_entry.index_) * 7
-                  ]
-        return ay
+            yield "%d,%d,%d\n" % (e.type_[i], e.name_[i], ~e.to_[i] * 7)
 
     def SerializeLocations(self):
-        ay = []
+        """ yield the text of each location """
         for n in self.locations_:
-            ay += [ n._entry.index_,
-                    int(n._id),
-                    int(n._line),
-                    int(n._col)]
-        return ay
+            yield "%d,%d,%d,%d\n" % (n._entry, int(n._id), int(n._line), int(n._col))
 
     def SerializeNames(self):
-        def noNewLine(s):
-            return s.replace('\r', '').replace('\n', '')
-        ay = ["<dummy>"]
-        for s in sorted(self.names_.items(), key = lambda k: k[1]):
-            ay.append(noNewLine(s[0]))
-        return ay
+        """ yield the text of each string, one string one line """
+        for s in self.names_:
+            yield "\n" + json.dumps(s.replace('\r', '').replace('\n', ''))
 
     def serializer(self, filename):
-        an = self.SerializeNodes()
-        ae = self.SerializeEdges()
-        ay = self.SerializeNames()
-        al = self.SerializeLocations()
-
-        #nodes = json.dumps(an)
-        nodes = '['
-        for i in range(0, len(an), 6):
-            if i == 0:
-                nodes += "%d,%d,%d,%d,%d,0,%d\n" % (an[i], an[i+1], an[i+2], an[i+3], an[i+4], an[i+5])
-            else:
-                nodes += ",%d,%d,%d,%d,%d,0,%d\n" % (an[i], an[i+1], an[i+2], an[i+3], an[i+4], an[i+5])
-        nodes += ']'
-
-        #edges = json.dumps(ae)
-        edges = '['
-        for i in range(0, len(ae), 3):
-            if i == 0:
-                edges += "%d,%d,%d\n" % (ae[i], ae[i+1], ae[i+2])
-            else:
-                edges += ",%d,%d,%d\n" % (ae[i], ae[i+1], ae[i+2])
-        edges += ']'
-
-        # locations
-        locations = '['
-        for i in range(0, len(al), 4):
-            if i == 0:
-                locations += "%d,%d,%d,%d\n" % (al[i], al[i+1], al[i+2], al[i+3])
-            else:
-                locations += ",%d,%d,%d,%d\n" % (al[i], al[i+1], al[i+2], al[i+3])
-        locations += ']'
-
-        # one string one line
-        names = json.dumps(ay, indent=0, separators=(',', ':'))
 
         meta = '''{"node_fields":["type","name","id","self_size","edge_count","trace_node_id","mem_addr"],
 "node_types":[["hidden","array","string","object","code","closure","regexp","number","native","synthetic","concatenated string","sliced string","symbol","bigint"],"string","number","number","number","number","number"],
@@ -1852,7 +2194,7 @@ class HeapSnapshot(GraphHolder):
 "sample_fields":["timestamp_us","last_assigned_id"],
 "location_fields":["object_index","script_id","line","column"]}'''
 
-        j = '''{"snapshot":{
+        head = '''{"snapshot":{
 "title":"andb",
 "uid":1,
 "meta":%s,
@@ -1860,30 +2202,39 @@ class HeapSnapshot(GraphHolder):
 "edge_count":%d,
 "trace_function_count":0
 },
-"nodes":%s,
-"edges":%s,
-"trace_function_infos":[],
-"trace_tree":[],
-"samples":[],
-"locations":%s,
-"strings":%s
-}''' % (
+"nodes":[''' % (
             meta,
             len(self.entries_),
             len(self.children_),
-            nodes,
-            edges,
-            locations,
-            names
         )
  
-        # write 
-        with open(filename, 'w') as f:
-            f.write(j)
+        # write section by section
+        with SnapshotWriter(filename) as f:
+            f.Write(head)
+            f.WriteArray(self.SerializeNodes())
+            f.Write('],\n"edges":[')
+            f.WriteArray(self.SerializeEdges())
+            f.Write('],\n"trace_function_infos":[],\n"trace_tree":[],\n"samples":[],\n"locations":[')
+            f.WriteArray(self.SerializeLocations())
+            f.Write('],\n"strings":[')
+            f.WriteArray(self.SerializeNames())
+            f.Write('\n]\n}')
         print("heap snapshot written to '%s'"%filename)
 
     @profiler
     def Generate(self, filename="core.heapsnapshot"):
+        # make the graph
+        self.GenerateGraph()
+
+        # output json
+        self.serializer(filename)
+
+        # clean 
+        self.CleanAll()
+
+    def GenerateGraph(self):
+        """ make the snapshot graph in memory, the edges are ordered by parent (children_).
+        """
         # init helpers
         self.initRootNames()
 
@@ -1893,11 +2244,11 @@ class HeapSnapshot(GraphHolder):
         # iterate roots 
         self.IterateRoots()
 
-        # iterate Readonly Heap Objects
-        self.IterateROHeapObjects()
+        # pass 1, index all Heap Objects (Readonly Heap first)
+        self.IndexHeapObjects()
 
-        # iterate all Heap Objets
-        self.IterateHeapObjects()
+        # pass 2, extract references of all Heap Objects
+        self.ExtractHeapObjects()
 
         # resolve all edges
         self.ResolveEdges()
@@ -1905,27 +2256,72 @@ class HeapSnapshot(GraphHolder):
         # Fill the child
         self.FillChild()
 
-        # output json
-        self.serializer(filename)
+    @profiler
+    def ResumableGenerate(self, filename="core.heapsnapshot", resume=True):
+        """ Generate with checkpoints, the pages are parsed and saved to
+            SnapshotJournal every kCheckpointBytes, the pages in the journal
+            are skipped if resumed.
+        """
+        identity = SnapshotJournal.Identity(self._isolate)
+        if identity is None:
+            print("not a corefile, checkpoint is disabled.")
+            return self.Generate(filename)
 
-        # clean 
-        self.CleanAll()
+        journal = SnapshotJournal(filename, identity)
+        journal.Open(resume)
 
-    def MapWriteIndex(self, eachsize=100):
+        # parse the pages not in journal
+        heap = self.heap()
+        parser = ObjectParser()
+        pages = []
+        size = 0
+        for name in v8.AllocationSpace.OnlyOldSpaces():
+            space = heap.getSpace(name)
+            chunks = space.getChunks()
+            print("%s : %d pages" % (space.name, len(chunks)))
+            for c in chunks:
+                if journal.IsDone(c.address):
+                    continue
+                self.ParseChunk(parser, c)
+                pages.append(c.address)
+                size += c.size
+                if size >= journal.kCheckpointBytes:
+                    journal.Commit(parser, pages)
+                    parser = ObjectParser()
+                    pages = []
+                    size = 0
+        if len(pages) > 0:
+            journal.Commit(parser, pages)
+        parser.CleanAll()
+
+        self.ReduceFiles(filename, journal.Parts())
+        journal.Remove()
+
+    def MapWriteIndex(self, shard_bytes=64*1024*1024):
+        """ split the pages into shards by committed bytes,
+            writes snapshot_N.map (pages) and snapshot.idx ('<N> <bytes> <pages>').
+        """
         heap = self.heap()
         spaces = v8.AllocationSpace.OnlyOldSpaces()
-        assert eachsize > 10
+        assert shard_bytes > 0
 
         if not os.path.exists("snapshot.d"):
             os.mkdir("snapshot.d") 
 
+        # remove shards of last run
+        for f in os.listdir("snapshot.d"):
+            if f.endswith((".map", ".rec", ".tmp", ".idx")):
+                os.unlink("snapshot.d/%s" % f)
+
+        index = []
         pages = []
+        size = 0
         cnt = 0
-        page_cnt = 0
 
         def WriteIndexFile(idx):
             with open("snapshot.d/snapshot_%d.map" % (idx), 'wb') as f:
                 pickle.dump(pages, f, pickle.HIGHEST_PROTOCOL)
+            index.append("%d %d %d\n" % (idx, size, len(pages)))
 
         for name in spaces:
             space = heap.getSpace(name)
@@ -1933,20 +2329,37 @@ class HeapSnapshot(GraphHolder):
             chunks = space.getChunks()
             for i in chunks:
                 pages.append(i.address)
+                size += i.size
+                cnt = cnt + 1
 
-                if len(pages) >= eachsize:
+                if size >= shard_bytes:
                     # write to index 
-                    WriteIndexFile(page_cnt)
-                    page_cnt = page_cnt + 1
+                    WriteIndexFile(len(index))
                     pages = []
-
-                cnt = cnt + 1
+                    size = 0
         
-        WriteIndexFile(page_cnt)
-        page_cnt = page_cnt + 1
-        pages = []
+        if len(pages) > 0:
+            WriteIndexFile(len(index))
+
+        with open("snapshot.d/snapshot.idx.tmp", 'w') as f:
+            f.writelines(index)
+        os.rename("snapshot.d/snapshot.idx.tmp", "snapshot.d/snapshot.idx")
+
+        print("Total %d pages in %d maps." % (cnt, len(index)))
+
+    def ParseChunk(self, parser, page):
+        """ extract all HeapObjects in the page to parser """
+        show_free_space = int(cfg.cfgHeapSnapshotShowFreeSapce)
+        for obj in page.walk():
+            # skip free space
+            if v8.InstanceType.isFreeSpace(obj.instance_type) and \
+                show_free_space == 0:
+                continue
 
-        print("Total %d pages in %d maps." % (cnt, page_cnt))
+            try:
+                parser.ExtractObject(obj)
+            except Exception as e:
+                log.error("Parse <0x%x> failed: %s" % (obj, e))
 
     @profiler
     def MapSnapshot(self, index):
@@ -1960,24 +2373,75 @@ class HeapSnapshot(GraphHolder):
             page = v8.MemoryChunk(p)
             cnt = cnt + 1
             print("map_%d (%d/%d) page(0x%x)" % (index, cnt, len(pages), int(page)))
-            for obj in page.walk():
-                # skip free space
-                if v8.InstanceType.isFreeSpace(obj.instance_type) and \
-                    cfg.cfgHeapSnapshotShowFreeSapce == 0:
-                    continue
-
-                try:
-                    parser.ExtractObject(obj)
-                except Exception as e:
-                    log.error("Parse <0x%x> failed: %s" % (obj, e))
+            self.ParseChunk(parser, page)
 
         print("entries: %d, keys(%d), edges: %d, location: %d" % (len(parser.entries_), len(parser.entries_map_.keys()), len(parser.edges_), len(parser.locations_))) 
 
         parser.SaveFile("snapshot.d/snapshot_%d.rec.tmp" % index)
         os.rename("snapshot.d/snapshot_%d.rec.tmp" % index, "snapshot.d/snapshot_%d.rec" % index) 
 
+    def MapWorker(self, wid, in_fifo, out_fifo):
+        """ persistent worker, parses the shards requested from in_fifo,
+            and reports 'ok <N> <wid>' or 'fail <N> <wid>' to out_fifo.
+        """
+        fout = os.open(out_fifo, os.O_WRONLY)
+        with open(in_fifo, 'r') as fin:
+            while True:
+                line = fin.readline()
+                if len(line) == 0:
+                    # leader exited
+                    break
+                a = line.split()
+                if len(a) == 0:
+                    continue
+                if a[0] == 'quit':
+                    break
+                if a[0] != 'map':
+                    continue
+
+                index = int(a[1])
+                status = 'ok'
+                try:
+                    self.MapSnapshot(index)
+                except Exception as e:
+                    log.error("map_%d failed: %s" % (index, e))
+                    status = 'fail'
+                os.write(fout, ("%s %d %d\n" % (status, index, wid)).encode())
+        os.close(fout)
+
     @profiler
-    def ReduceGenerate(self, filename="core.heapsnapshot"):
+    def ReduceGenerate(self, filename="core.heapsnapshot", fifo=None):
+        """ merge the parsed shards to snapshot.
+            the completed shards are read from fifo ('done <N>' until 'end'),
+            or all the parsed shards in snapshot.d if fifo is None.
+        """
+        def ShardFiles():
+            if fifo is None:
+                for f in sorted(f for f in os.listdir("snapshot.d") if f.endswith(".rec")):
+                    yield "snapshot.d/%s" % f
+                return
+
+            cnt = 0
+            with open(fifo, 'r') as fin:
+                while True:
+                    line = fin.readline()
+                    if len(line) == 0:
+                        raise Exception("leader exited")
+                    a = line.split()
+                    if len(a) == 0:
+                        continue
+                    if a[0] == 'end':
+                        break
+                    if a[0] == 'done':
+                        cnt += 1
+                        print("reduce (%d)" % cnt)
+                        yield "snapshot.d/snapshot_%d.rec" % int(a[1])
+
+        self.ReduceFiles(filename, ShardFiles())
+
+    def ReduceFiles(self, filename, files):
+        """ generate the snapshot from roots, Readonly Heap and the shard files.
+        """
         # init helpers
         self.initRootNames()
 
@@ -1991,36 +2455,12 @@ class HeapSnapshot(GraphHolder):
         self.IterateROHeapObjects()
 
         # reduce
-        rec_files = [] 
-        for f in os.listdir("snapshot.d"):
-            if f.endswith(".map"):
-                rec = f[:-4] + ".rec"
-                rec_files.append("snapshot.d/%s" % rec)
-        print("Polling %d files ..." % (len(rec_files)))
-
-        len_files = len(rec_files)
-        while len(rec_files) > 0:
-            print("reduce (%d/%d)" % (len_files - len(rec_files), len_files))
+        for f in files:
+            print("Merging %s" % f)
+            self.MergeShard(ShardFile.Open(f))
 
-            is_idle = 1
-            for f in rec_files:
-                if os.path.exists(f):
-                    print("Merging %s" % f)
-
-                    # merge
-                    parser = ObjectParser()
-                    parser.LoadFile(f)
-                    self.Merge(parser)
-                    parser.CleanAll()
-                    
-                    rec_files.remove(f)
-                    is_idle = 0
-
-            # delay
-            if is_idle:
-                time.sleep(5)
-
-        print("Polling done.")
+        # the shards are sorted by address, merge to one table
+        self.MergeAddressTables()
 
         # resolve all edges
         self.ResolveEdges()
@@ -2033,5 +2473,8 @@ class HeapSnapshot(GraphHolder):
 
         # clean 
         self.CleanAll()
-        
 
+
+# the dispatch tables follow the loaded InstanceType
+v8.InstanceType.OnLoad(GraphHolder.BuildDispatch)
+v8.InstanceType.OnLoad(ObjectParser.BuildExtractDispatch)
@@ -0,0 +1,158 @@
+from __future__ import print_function, division
+
+""" andb.shadow.heap_stats : mergeable statistics of the heap objects.
+
+    the objects are counted by instance type, by map and by constructor
+    name, each key has [count, bytes, histogram] where histogram[b] is the
+    number of objects of size in [2^(b-1), 2^b).
+
+    the statistics of chunks are partial results, partials are merged in
+    any order, saved and loaded as json, so the chunks can be walked by
+    parallel workers and merged after.
+"""
+
+import json
+
+
+class HeapStats(object):
+
+    kVersion = 1
+
+    # size histogram buckets, the last one holds all larger objects
+    kBuckets = 32
+
+    def __init__(self):
+        self.types_ = {}
+        self.maps_ = {}
+        self.constructors_ = {}
+
+        # map tag to (type name, constructor name)
+        self.labels_ = {}
+
+        self.chunks_ = 0
+
+    @classmethod
+    def Bucket(cls, size):
+        return min(int(size).bit_length(), cls.kBuckets - 1)
+
+    @classmethod
+    def Account(cls, tbl, key, size):
+        a = tbl.get(key)
+        if a is None:
+            a = tbl[key] = [0, 0, [0] * cls.kBuckets]
+        a[0] += 1
+        a[1] += size
+        a[2][cls.Bucket(size)] += 1
+
+    @classmethod
+    def MergeTable(cls, tbl, other):
+        for key, (count, size, histogram) in other.items():
+            a = tbl.get(key)
+            if a is None:
+                tbl[key] = [count, size, list(histogram)]
+                continue
+            a[0] += count
+            a[1] += size
+            h = a[2]
+            for i, n in enumerate(histogram):
+                h[i] += n
+
+    def Add(self, tag, labels, size):
+        """ count one object of the map tag, labels is (type name, constructor name) """
+        if tag not in self.labels_:
+            self.labels_[tag] = labels
+        self.Account(self.types_, labels[0], size)
+        self.Account(self.maps_, tag, size)
+        self.Account(self.constructors_, labels[1], size)
+
+    def Merge(self, other):
+        self.MergeTable(self.types_, other.types_)
+        self.MergeTable(self.maps_, other.maps_)
+        self.MergeTable(self.constructors_, other.constructors_)
+        for tag, labels in other.labels_.items():
+            self.labels_.setdefault(tag, labels)
+        self.chunks_ += other.chunks_
+
+    def Total(self):
+        """ return (count, bytes) """
+        return (sum(a[0] for a in self.types_.values()),
+                sum(a[1] for a in self.types_.values()))
+
+    def ToJson(self):
+        return {
+            "version": self.kVersion,
+            "chunks": self.chunks_,
+            "types": self.types_,
+            "maps": dict(("0x%x" % k, v) for k, v in self.maps_.items()),
+            "constructors": self.constructors_,
+            "labels": dict(("0x%x" % k, v) for k, v in self.labels_.items()),
+        }
+
+    @classmethod
+    def FromJson(cls, d):
+        if d.get("version") != cls.kVersion:
+            raise Exception("heap stats version %s, expected %d." % (d.get("version"), cls.kVersion))
+        s = cls()
+        s.chunks_ = d["chunks"]
+        s.types_ = d["types"]
+        s.maps_ = dict((int(k, 16), v) for k, v in d["maps"].items())
+        s.constructors_ = d["constructors"]
+        s.labels_ = dict((int(k, 16), tuple(v)) for k, v in d["labels"].items())
+        return s
+
+    def Save(self, filename):
+        with open(filename, 'w') as f:
+            json.dump(self.ToJson(), f)
+
+    @classmethod
+    def Load(cls, filename):
+        with open(filename) as f:
+            return cls.FromJson(json.load(f))
+
+    @classmethod
+    def HistogramText(cls, histogram):
+        """ '<16:3 <32:10 ...' of the nonzero buckets """
+        out = []
+        for b, n in enumerate(histogram):
+            if n == 0:
+                continue
+            if b == cls.kBuckets - 1:
+                out.append(">=%d:%d" % (1 << (b - 1), n))
+            else:
+                out.append("<%d:%d" % (1 << b, n))
+        return " ".join(out)
+
+    def Report(self, top=20):
+        """ return the report as dict, tables sorted by bytes. """
+        def Rows(tbl, name):
+            rows = sorted(tbl.items(), key=lambda v: (v[1][1], v[1][0]), reverse=True)[:top]
+            return [{name: k, "count": a[0], "size": a[1], "histogram": a[2]} for k, a in rows]
+
+        maps = Rows(self.maps_, "map")
+        for m in maps:
+            m["type"], m["constructor"] = self.labels_.get(m["map"], ("", ""))
+        count, size = self.Total()
+        return {
+            "chunks": self.chunks_,
+            "count": count,
+            "size": size,
+            "types": Rows(self.types_, "type"),
+            "maps": maps,
+            "constructors": Rows(self.constructors_, "constructor"),
+        }
+
+    @classmethod
+    def PrintReport(cls, report):
+        print("%d chunks, Total Cnt(%d), Size(%d)" % (report["chunks"], report["count"], report["size"]))
+        print("")
+        print("%14s %10s  %-40s %s" % ("SIZE", "COUNT", "TYPE", "HISTOGRAM"))
+        for r in report["types"]:
+            print("%14d %10d  %-40s %s" % (r["size"], r["count"], r["type"], cls.HistogramText(r["histogram"])))
+        print("")
+        print("%14s %10s  %-18s %s" % ("SIZE", "COUNT", "MAP", "TYPE / CONSTRUCTOR"))
+        for r in report["maps"]:
+            print("%14d %10d  0x%-16x %s / %s" % (r["size"], r["count"], r["map"], r["type"], r["constructor"]))
+        print("")
+        print("%14s %10s  %s" % ("SIZE", "COUNT", "CONSTRUCTOR"))
+        for r in report["constructors"]:
+            print("%14d %10d  %s" % (r["size"], r["count"], r["constructor"]))
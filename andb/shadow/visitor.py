@@ -1,16 +1,25 @@
 from __future__ import print_function, division
 
+import re
 import sys
+import json
+import math
+import time
+import random
 
 import andb.dbg as dbg
 import andb.v8 as v8
 import andb.node as node
 import andb.aworker as aworker
+from andb.config import Config as cfg
 
 from andb.utility import (
     profiler,
+    TextLimit,
     Logging as log,
 )
+from .heap_index import HeapIndex, RetainerIndex, StringIndex
+from .heap_stats import HeapStats
 
 print=log.print
 
@@ -332,6 +341,8 @@ class HeapVisitor:
     def ShowMapSummary(self, argv):
         if argv[0] == "type":
             return self.ShowInstanceSummary(argv)
+        if argv[0] == "--sample":
+            return self.ShowSampleSummary(argv[1:])
 
         self._map_tbl = {}
         hp = self._heap
@@ -339,6 +350,13 @@ class HeapVisitor:
         if space is None:
             return
 
+        index = HeapIndex.Current()
+        if index is not None:
+            tbl = index.MapSummary(space.id)
+            for i in (sorted(tbl.items(), key = lambda v:(v[1], v[0]), reverse = False)):
+                print("0x%012x: %8d %12d %s" % (i[0], i[1][0], i[1][1], v8.InstanceType.Name(i[1][2])))
+            return
+
         tbl = self._map_tbl
         if space.isNewSpace():
             iterator = v8.NewSpaceObjectIterator(space)
@@ -358,6 +376,285 @@ class HeapVisitor:
             mp = v8.Map(i[0])
             print("0x%012x: %8d %12d %s" % (i[0], i[1][0], i[1][1], v8.InstanceType.Name(mp.instance_type)))
 
+    """ Sampling Summary
+
+        the pages of each space are a stratum, a random subset of the pages
+        is walked. the total of a key (count or size) in a stratum of N pages
+        is estimated by the n sampled pages,
+          total = N * mean(y), var = N^2 * (1 - n/N) * s^2 / n
+        where y is the value of each sampled page (0 if the key is absent).
+    """
+
+    # z of the two-sided 95% confidence interval
+    kSampleZ = 1.96
+
+    def WalkChunkMaps(self, chunk):
+        """ return {map tag: [count, size, first object]} of the chunk """
+        tbl = {}
+        for obj in chunk.walk():
+            tag = obj.map.tag
+            size = obj.Size()
+            if tag in tbl:
+                a = tbl[tag]
+                a[0] += 1
+                a[1] += size
+            else:
+                tbl[tag] = [1, size, obj]
+        return tbl
+
+    def SampleLabels(self, tag, obj, labels):
+        """ return (type name, constructor name) of the map, cached in labels """
+        if tag in labels:
+            return labels[tag]
+        typ = v8.Map(tag).instance_type
+        name = v8.InstanceType.Name(typ)
+        constructor = "(%s)" % name
+        if v8.InstanceType.isJSObject(typ):
+            try:
+                constructor = v8.JSObject(obj).GetConstructorName()
+            except Exception as e:
+                log.warn("constructor of 0x%x: %s" % (obj.tag, e))
+        labels[tag] = (name, constructor)
+        return labels[tag]
+
+    def SampleSpace(self, space_id, rate, rnd, labels):
+        """ walk sampled pages of the space,
+            return (N, n, totals, types, constructors), the sums of the pages
+            are [count sum, count sum^2, size sum, size sum^2], by the type
+            labels and the constructor labels.
+        """
+        space = self._heap.getSpace(space_id)
+        chunks = space.getChunks()
+        N = len(chunks)
+        if space_id in (v8.AllocationSpace.LO_SPACE, v8.AllocationSpace.CODE_LO_SPACE):
+            # one object per page
+            n = N
+        else:
+            n = min(N, max(2, int(math.ceil(N * rate))))
+
+        totals = [0, 0, 0, 0]
+        types = {}
+        constructors = {}
+        for chunk in rnd.sample(chunks, n):
+            page_types = {}
+            page_constructors = {}
+            for tag, (count, size, obj) in self.WalkChunkMaps(chunk).items():
+                name, constructor = self.SampleLabels(tag, obj, labels)
+                for tbl, key in ((page_types, name), (page_constructors, constructor)):
+                    if key in tbl:
+                        tbl[key][0] += count
+                        tbl[key][1] += size
+                    else:
+                        tbl[key] = [count, size]
+
+            count = sum(a[0] for a in page_types.values())
+            size = sum(a[1] for a in page_types.values())
+            totals[0] += count
+            totals[1] += count * count
+            totals[2] += size
+            totals[3] += size * size
+
+            for tbl, page in ((types, page_types), (constructors, page_constructors)):
+                for key, (count, size) in page.items():
+                    if key not in tbl:
+                        tbl[key] = [0, 0, 0, 0]
+                    a = tbl[key]
+                    a[0] += count
+                    a[1] += count * count
+                    a[2] += size
+                    a[3] += size * size
+        return N, n, totals, types, constructors
+
+    @classmethod
+    def SampleEstimate(cls, N, n, total, square):
+        """ return (estimated total, variance) of a stratum """
+        if n == 0:
+            return 0, 0
+        est = N * total / n
+        if n < 2 or n == N:
+            return est, 0
+        s2 = max(0, (square - total * total / n) / (n - 1))
+        return est, N * N * (1 - n / N) * s2 / n
+
+    @classmethod
+    def SampleAdd(cls, a, N, n, sums):
+        """ add the estimates of a stratum to a, [count, count var, size, size var] """
+        c, c2, s, s2 = sums
+        est, var = cls.SampleEstimate(N, n, c, c2)
+        a[0] += est
+        a[1] += var
+        est, var = cls.SampleEstimate(N, n, s, s2)
+        a[2] += est
+        a[3] += var
+
+    def ShowSampleSummary(self, argv):
+        """ heap summary --sample [<rate>] [<space> ...] """
+        rate = float(cfg.cfgHeapSampleRate)
+        if len(argv) > 0:
+            try:
+                rate = float(argv[0])
+                argv = argv[1:]
+            except ValueError:
+                pass
+        if not 0 < rate <= 1:
+            print("sampling rate should be in (0, 1].")
+            return
+
+        if len(argv) > 0:
+            space_ids = [v8.AllocationSpace.SpaceId(i) for i in argv]
+            if None in space_ids:
+                print("unknown space: %s" % argv[space_ids.index(None)])
+                return
+        else:
+            space_ids = v8.AllocationSpace.OnlyOldSpaces()
+
+        t0 = time.time()
+        rnd = random.Random()
+        labels = {}
+
+        # label to [count, count var, size, size var]
+        total = [0, 0, 0, 0]
+        types = {}
+        constructors = {}
+        pages = 0
+        sampled = 0
+        for space_id in space_ids:
+            N, n, sums, space_types, space_constructors = self.SampleSpace(space_id, rate, rnd, labels)
+            pages += N
+            sampled += n
+            self.SampleAdd(total, N, n, sums)
+            for tbl, sample in ((types, space_types), (constructors, space_constructors)):
+                for key, sums in sample.items():
+                    if key not in tbl:
+                        tbl[key] = [0, 0, 0, 0]
+                    self.SampleAdd(tbl[key], N, n, sums)
+
+        z = self.kSampleZ
+        def Row(key, a):
+            print("%14d +-%-12d %10d +-%-10d %s" % (
+                a[2], z * math.sqrt(a[3]), a[0], z * math.sqrt(a[1]), key))
+
+        print("sampled %d/%d pages of %d spaces in %.1fs, estimated with 95%% confidence." % (
+            sampled, pages, len(space_ids), time.time() - t0))
+        print("Total Cnt(%d +-%d), Size(%d +-%d)" % (
+            total[0], z * math.sqrt(total[1]), total[2], z * math.sqrt(total[3])))
+        print("")
+        print("%14s %14s %10s %12s %s" % ("SIZE", "", "COUNT", "", "TYPE"))
+        for key, a in sorted(types.items(), key=lambda v: v[1][2], reverse=True)[:20]:
+            Row(key, a)
+        print("")
+        print("%14s %14s %10s %12s %s" % ("SIZE", "", "COUNT", "", "CONSTRUCTOR"))
+        for key, a in sorted(constructors.items(), key=lambda v: v[1][0], reverse=True)[:20]:
+            Row(key, a)
+
+    def StatsChunks(self, space_ids):
+        """ return [(space id, chunk)] of the spaces, in address order by space """
+        chunks = []
+        for space_id in space_ids:
+            space = self._heap.getSpace(space_id)
+            for chunk in sorted(space.getChunks(), key=lambda c: c.address):
+                chunks.append((space_id, chunk))
+        return chunks
+
+    @classmethod
+    def StatsPartition(cls, chunks, part, parts):
+        """ return the chunks of the part k in [0, parts),
+            the biggest chunks go first to the least loaded part, so every
+            worker computes the same partition from the same chunks.
+        """
+        loads = [0] * parts
+        owned = [[] for i in range(parts)]
+        order = sorted(range(len(chunks)), key=lambda i: (-chunks[i][1].size, i))
+        for i in order:
+            k = loads.index(min(loads))
+            loads[k] += chunks[i][1].size
+            owned[k].append(i)
+        return [chunks[i] for i in sorted(owned[part])]
+
+    def StatsChunk(self, chunk, labels):
+        """ return the HeapStats of the chunk, a mergeable partial result """
+        stats = HeapStats()
+        for address, tag, size in v8.ChunkWalker(chunk).Objects():
+            obj = None if tag in labels else v8.HeapObject.FromAddress(address)
+            stats.Add(tag, self.SampleLabels(tag, obj, labels), size)
+        stats.chunks_ = 1
+        return stats
+
+    def ShowHeapStats(self, argv):
+        """ heap stats [--all | <space> ...] [--top <n>] [--json <file>]
+                       [--part <k>/<n> --save <file>] [--merge <file> ...]
+        """
+        top = 20
+        part = None
+        save = None
+        json_file = None
+        merge = None
+        names = []
+        i = 0
+        while i < len(argv):
+            a = argv[i]
+            if a == '--all':
+                pass
+            elif a == '--top' and i + 1 < len(argv):
+                i += 1
+                top = int(argv[i])
+            elif a == '--json' and i + 1 < len(argv):
+                i += 1
+                json_file = argv[i]
+            elif a == '--save' and i + 1 < len(argv):
+                i += 1
+                save = argv[i]
+            elif a == '--part' and i + 1 < len(argv):
+                i += 1
+                k, n = argv[i].split('/')
+                part = (int(k), int(n))
+                if not 0 <= part[0] < part[1]:
+                    print("part should be <k>/<n>, 0 <= k < n.")
+                    return
+            elif a == '--merge':
+                merge = argv[i + 1:]
+                break
+            else:
+                names.append(a)
+            i += 1
+
+        t0 = time.time()
+        if merge is not None:
+            stats = HeapStats()
+            for f in merge:
+                stats.Merge(HeapStats.Load(f))
+        else:
+            space_ids = [v8.AllocationSpace.SpaceId(n) for n in names]
+            if None in space_ids:
+                print("unknown space: %s" % names[space_ids.index(None)])
+                return
+            if len(space_ids) == 0:
+                space_ids = v8.AllocationSpace.NonROSpaces()
+
+            chunks = self.StatsChunks(space_ids)
+            if part is not None:
+                chunks = self.StatsPartition(chunks, part[0], part[1])
+
+            labels = {}
+            stats = HeapStats()
+            for space_id, chunk in chunks:
+                stats.Merge(self.StatsChunk(chunk, labels))
+
+        if save is not None:
+            stats.Save(save)
+            print("%d chunks saved to '%s' in %.1fs." % (stats.chunks_, save, time.time() - t0))
+            return
+
+        report = stats.Report(top)
+        if json_file is not None:
+            with open(json_file, 'w') as f:
+                json.dump(report, f, indent=1)
+            print("report saved to '%s'." % json_file)
+            return
+        HeapStats.PrintReport(report)
+        print("")
+        print("in %.1fs." % (time.time() - t0))
+
     def roheapwalk(self):
         hp = self._heap
         iso = hp.getIsolate()
@@ -395,6 +692,14 @@ class HeapVisitor:
             for_type = v8.InstanceType.Find(argv[2])
             print(for_type)
 
+        index = HeapIndex.Current()
+        if index is not None:
+            addrs = index['addr']
+            for i in index.Select(space=space.id, typ=for_type):
+                self.PrintObject(v8.HeapObject.FromAddress(addrs[i]))
+            print("Total Cnt(%d), Size(%d)" % index.Total(index.Rows(space=space.id)))
+            return
+
         cnt = 0
         size = 0
         if space.isNewSpace():
@@ -457,18 +762,25 @@ class HeapVisitor:
         if space is None:
             return
 
+        index = HeapIndex.Current()
         cnt = 0
-        tag_to_find = int(argv[1], 16)
+        tags_to_find = set([int(i, 16) for i in argv[1:]])
         for page in v8.ChunkIterator(space):
-            s = dbg.Target.MemoryFind(page.area_start, page.area_end, tag_to_find)
-            if s is not None:
-                cnt += len(s)
-                for obj in v8.ChunkObjectIterator(page):
+            s = dbg.Target.MemoryFindAll(page.area_start, page.area_end, tags_to_find)
+            if len(s) > 0:
+                for i in s.values():
+                    cnt += len(i)
+                if index is not None:
+                    # only the objects hold the found slots
+                    rows = set(index.Find(a) for i in s.values() for a in i)
+                    rows.discard(None)
+                    objs = [v8.HeapObject.FromAddress(index['addr'][r]) for r in sorted(rows)]
+                else:
+                    objs = v8.ChunkObjectIterator(page)
+                for obj in objs:
                     if not obj: continue
-                    address = obj.address
-                    for p in v8.ObjectSlots(address, address+obj.Size()):
-                        if p == tag_to_find:
-                            print(obj.Brief())
+                    if not tags_to_find.isdisjoint(obj.TaggedSlots().words):
+                        print(obj.Brief())
         print("find %d" % cnt);
 
     def ShowGlobal(self, args):
@@ -487,6 +799,17 @@ class HeapVisitor:
             return
 
         tag_to_find = int(argv[1], 16)
+        index = HeapIndex.Current()
+        if index is not None:
+            for i in index.Select(space=space.id, map=tag_to_find):
+                obj = v8.HeapObject.FromAddress(index['addr'][i])
+                size = index['size'][i]
+                try:
+                    print ("0x%x : size(%d) %s" % (obj.tag, size, obj.Brief()))
+                except Exception as e:
+                    print ("0x%x : size(%d) [ %s %s ]" % (obj.tag, size, "brief failed", e))
+            return
+
         tbl = self._map_tbl
         if space.isNewSpace():
             iterator = v8.NewSpaceObjectIterator(space)
@@ -501,6 +824,195 @@ class HeapVisitor:
                 except Exception as e:
                     print ("0x%x : size(%d) [ %s %s ]" % (obj.tag, size, "brief failed", e))
 
+    def ManageIndex(self, argv):
+        """ heap index [build [--retainers]|info|remove]
+        """
+        iso = v8.Isolate.GetCurrent()
+        filename, identity = HeapIndex.Path(iso)
+        if filename is None:
+            print("heap index needs a corefile.")
+            return
+
+        cmd = argv[0] if len(argv) > 0 else 'info'
+        if cmd == 'build':
+            index = HeapIndex.Build(self._heap, iso)
+            if index is not None and '--retainers' in argv:
+                RetainerIndex.Build(index, self._heap)
+        elif cmd == 'remove':
+            for f in (RetainerIndex.Path(filename), StringIndex.Path(filename), filename):
+                if HeapIndex.Remove(f):
+                    print("'%s' removed." % f)
+        else:
+            index = HeapIndex.Open(filename, identity)
+            if index is None:
+                print("no heap index, build by 'heap index build'.")
+                return
+            index.ShowInfo()
+
+    def GetRetainers(self):
+        """ return (index, retainers), the retainers are scanned if not saved """
+        index = HeapIndex.Current()
+        if index is None:
+            print("no heap index, build by 'heap index build'.")
+            return None, None
+        retainers = RetainerIndex.Current(index)
+        if retainers is None:
+            print("scanning the references of %d objects ..." % len(index))
+            retainers = RetainerIndex.Build(index, self._heap)
+        return index, retainers
+
+    def DescribeRow(self, index, retainers, row):
+        obj = v8.HeapObject.FromAddress(index['addr'][row])
+        try:
+            brief = obj.Brief()
+        except Exception:
+            brief = None
+        if brief is None:
+            brief = "<%s>" % v8.InstanceType.Name(index['type'][row])
+        root = retainers.Roots().get(row)
+        if root is not None:
+            brief += " [root: %s]" % v8.Root.CamelName(root)
+        return "0x%x: %s" % (obj.tag, brief)
+
+    def ShowRetainers(self, argv):
+        """ heap retainers <address> [depth]
+        """
+        index, retainers = self.GetRetainers()
+        if retainers is None:
+            return
+        row = index.Find(int(argv[0], 16))
+        if row is None:
+            print("0x%x is not an indexed object." % int(argv[0], 16))
+            return
+        depth = int(argv[1]) if len(argv) > 1 else 1
+
+        visited = set([row])
+        limit = RetainerIndex.kMaxRetainers
+
+        def Show(r, level):
+            sources = retainers.Retainers(r)
+            for s in sources[:limit]:
+                print("%s%s" % ("  " * level, self.DescribeRow(index, retainers, s)))
+                if level < depth and s not in visited:
+                    visited.add(s)
+                    Show(s, level + 1)
+            if len(sources) > limit:
+                print("%s... %d more" % ("  " * level, len(sources) - limit))
+
+        print(self.DescribeRow(index, retainers, row))
+        Show(row, 1)
+
+    def ShowPathToRoot(self, argv):
+        """ heap path-to-root <address>
+        """
+        index, retainers = self.GetRetainers()
+        if retainers is None:
+            return
+        row = index.Find(int(argv[0], 16))
+        if row is None:
+            print("0x%x is not an indexed object." % int(argv[0], 16))
+            return
+
+        path = retainers.PathToRoot(row)
+        if path is None:
+            print("not reachable from the roots.")
+            return
+        for i, r in enumerate(path):
+            print("%s%s" % ("  " * i, self.DescribeRow(index, retainers, r)))
+
+    def GetStrings(self):
+        """ return (index, strings), the strings are decoded if not saved """
+        index = HeapIndex.Current()
+        if index is None:
+            print("no heap index, build by 'heap index build'.")
+            return None, None
+        strings = StringIndex.Current(index)
+        if strings is None:
+            print("decoding the strings of %d objects ..." % len(index))
+            strings = StringIndex.Build(index)
+        return index, strings
+
+    @classmethod
+    def StringText(cls, text, limit=80):
+        if text is None:
+            return "<not decodable>"
+        return TextLimit(text.replace('\n', ' '), limit)
+
+    def BuildStrings(self, argv):
+        """ heap strings build [--trigrams]
+        """
+        index = HeapIndex.Current()
+        if index is None:
+            print("no heap index, build by 'heap index build'.")
+            return
+        StringIndex.Build(index, trigrams='--trigrams' in argv)
+
+    def GrepStrings(self, argv):
+        """ heap strings grep [-i] [--limit <n>] <regex>
+        """
+        flags = 0
+        limit = 100
+        pattern = None
+        i = 0
+        while i < len(argv):
+            if argv[i] == '-i':
+                flags |= re.IGNORECASE
+            elif argv[i] == '--limit' and i + 1 < len(argv):
+                i += 1
+                limit = int(argv[i])
+            else:
+                pattern = ' '.join(argv[i:])
+                break
+            i += 1
+        if pattern is None:
+            print("usage: heap strings grep [-i] [--limit <n>] <regex>")
+            return
+
+        index, strings = self.GetStrings()
+        if strings is None:
+            return
+        t0 = time.time()
+        cnt = 0
+        size = 0
+        for s, addr, text, m in strings.Grep(index, pattern, flags):
+            cnt += 1
+            size += index['size'][strings['rows'][s]]
+            if cnt <= limit:
+                start = max(0, m.start() - 20)
+                print("0x%x: [%d] %s" % (addr | v8.Internal.kHeapObjectTag,
+                    strings['length'][s], self.StringText(text[start:], 80)))
+        if cnt > limit:
+            print("... %d more." % (cnt - limit))
+        print("Total Cnt(%d), Size(%d), %.3fs" % (cnt, size, time.time() - t0))
+
+    def ShowDuplicateStrings(self, argv):
+        """ heap strings dup [<top>]
+        """
+        top = int(argv[0]) if len(argv) > 0 else 20
+        index, strings = self.GetStrings()
+        if strings is None:
+            return
+        dups = strings.Duplicates(index)
+        print("%d duplicated contents, %d bytes wasted." % (len(dups), sum(d[0] for d in dups)))
+        print("%12s %8s %-18s %s" % ("WASTED", "COUNT", "FIRST", "STRING"))
+        for wasted, count, group in dups[:top]:
+            row = strings['rows'][group[0]]
+            print("%12d %8d 0x%-16x %s" % (wasted, count, index['addr'][row] | v8.Internal.kHeapObjectTag,
+                self.StringText(strings.Text(index, group[0]))))
+
+    def ShowTopStrings(self, argv):
+        """ heap strings top [<top>]
+        """
+        top = int(argv[0]) if len(argv) > 0 else 20
+        index, strings = self.GetStrings()
+        if strings is None:
+            return
+        print("%12s %10s %-18s %s" % ("SIZE", "LENGTH", "STRING", ""))
+        for s in strings.Top(index, top):
+            row = strings['rows'][s]
+            print("%12d %10d 0x%-16x %s" % (index['size'][row], strings['length'][s],
+                index['addr'][row] | v8.Internal.kHeapObjectTag, self.StringText(strings.Text(index, s))))
+
     def FollowTag(self, argv):
         all = {}
         save = {}
@@ -521,6 +1033,7 @@ class HeapVisitor:
         total_size = 0
         deep = 0
         save[ho.address] = 1
+        index = HeapIndex.Current()
 
         while len(save) > 0:
             all = save
@@ -529,18 +1042,22 @@ class HeapVisitor:
                 ho = v8.HeapObject(tag)
                 done[ho.address] = 1
 
-                for tag in ho.Slots():
+                smis, strongs, weaks = ho.TaggedSlots().Split()
+                for tag in strongs:
                     o = v8.HeapObject(tag)
                     if o.address in done:
                         continue
-                    if not o.IsHeapObject():
-                        continue
 
-                    try:
-                        t = o.instance_type
-                        total_size += o.Size()
-                    except:
-                        t = None
+                    row = index.Lookup(o.address) if index is not None else None
+                    if row is not None:
+                        t = index['type'][row]
+                        total_size += index['size'][row]
+                    else:
+                        try:
+                            t = o.instance_type
+                            total_size += o.Size()
+                        except:
+                            t = None
 
                     if t is None or v8.InstanceType.Name(t) is None:
                         continue
@@ -559,9 +1076,14 @@ class HeapVisitor:
         tbl = {}
         tbl.clear()
         for tag in done:
-            obj = v8.HeapObject(tag)
-            size = obj.Size()
-            typ = obj.instance_type
+            row = index.Lookup(tag) if index is not None else None
+            if row is not None:
+                size = index['size'][row]
+                typ = index['type'][row]
+            else:
+                obj = v8.HeapObject(tag)
+                size = obj.Size()
+                typ = obj.instance_type
             if typ in tbl:
                 a = tbl[typ]
                 a[0] += 1
@@ -2,7 +2,6 @@ from __future__ import print_function, division
 
 from andb.config import Config
 import functools
-from andb.dbg import type as dbg_type
 import andb.py23 as py23
 
 def profiler(func):
@@ -93,6 +92,8 @@ class Logging:
             return
 
         # workaround for gdb print('\0').
+        # andb.dbg is read here, it imports andb.fmt (and us) while loading.
+        from andb.dbg import type as dbg_type
         if dbg_type == 'gdb':
             sz = sz.replace('\000', '')
 
@@ -171,6 +171,85 @@ class InstanceType(Enum):
     # boundary for JSReceiver that needs special property lookup handling.
     LAST_SPECIAL_RECEIVER_TYPE = 0 
 
+    # predicate name to the function evaluated by name (isType/inRange)
+    _T_predicates = None
+
+    # predicate name to bytearray indexed by instance type
+    _T_tables = {}
+
+    # length of the tables, 0 before LoadDwf
+    _T_size = 0
+
+    # called after the tables are built
+    _T_callbacks = []
+
+    @classmethod
+    def LoadDwf(cls):
+        super(InstanceType, cls).LoadDwf()
+        cls.BuildTables()
+
+    @classmethod
+    def BuildTables(cls):
+        """ precompute all isXXX(num) predicates to tables indexed by instance type,
+            the predicates become one index, the types out of table are evaluated.
+        """
+        if cls._T_predicates is None:
+            cls._T_predicates = {}
+            for name, v in list(cls.__dict__.items()):
+                if isinstance(v, classmethod) and name[:2] in ('is', 'Is') and \
+                        v.__func__.__code__.co_argcount == 2:
+                    cls._T_predicates[name] = v.__func__
+
+        if len(cls._E_nameMap) == 0:
+            return
+        size = max(cls._E_nameMap.keys()) + 1
+        for name, func in cls._T_predicates.items():
+            table = bytearray(size)
+            try:
+                for num in range(size):
+                    if func(cls, num):
+                        table[num] = 1
+            except TypeError:
+                # boundary not in this version, keep evaluated.
+                continue
+            cls._T_tables[name] = table
+            setattr(cls, name, classmethod(cls.MakePredicate(table, func)))
+        cls._T_size = size
+
+        for callback in cls._T_callbacks:
+            callback()
+
+    @staticmethod
+    def MakePredicate(table, func):
+        size = len(table)
+        def predicate(cls, num):
+            if 0 <= num < size:
+                return table[num] == 1
+            return func(cls, num)
+        predicate.__name__ = func.__name__
+        predicate.__doc__ = func.__doc__
+        return predicate
+
+    @classmethod
+    def OnLoad(cls, callback):
+        """ call back after the tables are built, now if already built. """
+        cls._T_callbacks.append(callback)
+        if cls._T_size > 0:
+            callback()
+
+    @classmethod
+    def MakeDispatch(cls, cases, default=None):
+        """ return a list indexed by instance type,
+            the value of the first case (predicate name, value) matches, or default.
+        """
+        out = [default] * cls._T_size
+        for num in range(cls._T_size):
+            for name, value in cases:
+                if getattr(cls, name)(num):
+                    out[num] = value
+                    break
+        return out
+
     """ Fixed Array
     """
     @classmethod
@@ -6,12 +6,19 @@ from __future__ import print_function, division
 import re
 import types
 import struct
+import bisect
 import collections
+from array import array
 
 import andb.dbg as dbg
 import andb.py23 as py23
 from andb.config import Config as cfg
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 from andb.utility import (
     Logging as log, 
     CachedProperty
@@ -40,6 +47,66 @@ class ObjectSlots(dbg.Slots):
     pass
 
 
+class TaggedWords(object):
+    """ decodes all tagged words in [start, end) at once.
+
+        words are read by one MemoryRead (or given as bytes), 
+        Split() classifies them to smi, strong and weak references,
+        numpy is used if available.
+    """
+
+    def __init__(self, start, end, data=None):
+        if data is None:
+            self._words = dbg.ReadWords(start, end)
+        else:
+            self._words = dbg.WordsFromBytes(data)
+        if self._words is None:
+            # not readable in bulk, read slot by slot.
+            self._words = array('Q', ObjectSlots(start, end))
+
+    @property
+    def words(self):
+        """ array('Q') of all tagged words """
+        return self._words
+
+    def __len__(self):
+        return len(self._words)
+
+    def __getitem__(self, index):
+        return self._words[index]
+
+    def Split(self):
+        """ return (smis, strongs, weaks) of the tagged values,
+            cleared weak references are dropped.
+        """
+        if numpy is not None:
+            return self._SplitNumpy()
+
+        smis = []
+        strongs = []
+        weaks = []
+        mask = Internal.kHeapObjectTagMask
+        for w in self._words:
+            t = w & mask
+            if t == Internal.kHeapObjectTag:
+                strongs.append(w)
+            elif t == Internal.kWeakHeapObjectTag:
+                if (w & 0xFFFFFFFF) != Internal.kClearedWeakHeapObjectLower32:
+                    weaks.append(w)
+            elif (w & Internal.kSmiTagMask) == Internal.kSmiTag:
+                smis.append(w)
+        return (smis, strongs, weaks)
+
+    def _SplitNumpy(self):
+        a = numpy.frombuffer(self._words, dtype=numpy.uint64)
+        tags = a & numpy.uint64(Internal.kHeapObjectTagMask)
+        smis = a[(a & numpy.uint64(Internal.kSmiTagMask)) == numpy.uint64(Internal.kSmiTag)]
+        strongs = a[tags == numpy.uint64(Internal.kHeapObjectTag)]
+        weaks = a[(tags == numpy.uint64(Internal.kWeakHeapObjectTag)) &
+            ((a & numpy.uint64(0xFFFFFFFF)) != numpy.uint64(Internal.kClearedWeakHeapObjectLower32))]
+        return (smis.tolist(), strongs.tolist(), weaks.tolist())
+
+
 class BuildConfig:
     """ the consts in the class are all defined outside of 'v8'.
     """
@@ -1478,46 +1545,93 @@ class Enum(int, dbg.Enum):
         return self.to_string()
 
 class ChunkBlock(object):
+    """ ChunkBlock serves object reads from cached chunk bytes.
+
+        chunks are registered by (address, size) only, the bytes are loaded
+        on the first access to the chunk and kept in a LRU cache bounded by
+        cfg.cfgChunkCacheSize bytes.
+    """
 
     #_address = None 
     #_reader = None
     
     kAlignmentMask = 0x3ffff
-    
-    _cls_chunks = {}
+
+    # cache switch, 'andb option chunk_cache on|off'
+    _cls_enabled = True
+
+    # registered chunks, {address: size}, None if not registered yet.
+    _cls_known = None
+
+    # sorted index of registered chunks for interior addresses of 
+    # large chunks, ([address], [size]), None if outdated.
+    _cls_index = None
+
+    # loaded chunks in LRU order, {address: ChunkInfo}
+    _cls_chunks = collections.OrderedDict()
+
+    # bytes of loaded chunks
+    _cls_bytes = 0
+
+    # the most recent chunk, skip the LRU reordering for it.
+    _cls_last = None
+
+    # counters
+    _cls_hits = 0
+    _cls_misses = 0
+    _cls_evictions = 0
 
     class ChunkInfo(object):
         
-        def __init__(self, chunk):
-            self._address = chunk.address
-            self._size = chunk.size
-            self._bytes = dbg.Target.MemoryRead(self._address, self._size)
+        def __init__(self, address, size):
+            self._address = address
+            self._size = size
+            self._bytes = None
+
+        def Load(self):
+            data = dbg.Target.MemoryRead(self._address, self._size)
+            if data is None or len(data) != self._size:
+                return False
+            self._bytes = memoryview(data)
+            return True
 
     class ChunkBlockReader(dbg.Block):
         
         _chunk = None
+
+        _u64 = struct.Struct('Q')
+        _u32 = struct.Struct('I')
+        _u16 = struct.Struct('H')
+        _u8 = struct.Struct('B')
         
         def GetInChunkOffset(self, off):
             return self._address + off - self._chunk._address
 
         def LoadPtr(self, off):
-            return struct.unpack_from('Q', self._chunk._bytes, self.GetInChunkOffset(off))[0]
+            return self._u64.unpack_from(self._chunk._bytes, self.GetInChunkOffset(off))[0]
 
         def LoadU64(self, off):
-            return struct.unpack_from('Q', self._chunk._bytes, self.GetInChunkOffset(off))[0]
+            return self._u64.unpack_from(self._chunk._bytes, self.GetInChunkOffset(off))[0]
 
         def LoadU32(self, off):
-            return struct.unpack_from('I', self._chunk._bytes, self.GetInChunkOffset(off))[0]
+            return self._u32.unpack_from(self._chunk._bytes, self.GetInChunkOffset(off))[0]
 
         def LoadU16(self, off):
-            return struct.unpack_from('H', self._chunk._bytes, self.GetInChunkOffset(off))[0]
+            return self._u16.unpack_from(self._chunk._bytes, self.GetInChunkOffset(off))[0]
         
         def LoadU8(self, off):
-            return struct.unpack_from('B', self._chunk._bytes, self.GetInChunkOffset(off))[0]
+            return self._u8.unpack_from(self._chunk._bytes, self.GetInChunkOffset(off))[0]
 
         def LoadDouble(self, off):
             return struct.unpack_from('Q', self._chunk._bytes, self.GetInChunkOffset(off))[0]
 
+        def LoadBytes(self, off, size):
+            """ return memoryview of [address + off, address + off + size) """
+            start = self.GetInChunkOffset(off)
+            if start + size > self._chunk._size:
+                return None
+            return self._chunk._bytes[start:start + size]
+
     def InitReader(self, addr):
         #self._address = addr
         reader = self.GetChunkBlock(addr)
@@ -1529,27 +1643,154 @@ class ChunkBlock(object):
 
     @classmethod
     def AddChunk(cls, chunk):
-        if chunk.address in cls._cls_chunks:
+        """ register the chunk, the bytes are loaded on demand.
+        """
+        if cls._cls_known is None:
+            cls._cls_known = {}
+        cls._cls_known[chunk.address] = chunk.size
+        cls._cls_index = None
+
+    @classmethod
+    def LoadChunks(cls):
+        """ register chunks of the current isolate.
+        """
+        from .structure import Isolate
+        iso = Isolate.GetCurrent()
+        if iso is None:
             return
-        c = ChunkBlock.ChunkInfo(chunk)
-        ChunkBlock._cls_chunks[chunk.address] = c 
+        # avoid re-entry when reading the chunk list.
+        cls._cls_known = {}
+        iso.MakeChunkCache()
+
+    @classmethod
+    def Enable(cls, on):
+        cls._cls_enabled = on
+        if not on:
+            cls.Clear()
+
+    @classmethod
+    def Clear(cls):
+        cls._cls_known = None
+        cls._cls_index = None
+        cls._cls_chunks = collections.OrderedDict()
+        cls._cls_bytes = 0
+        cls._cls_last = None
 
     @classmethod
     def CacheSize(cls):
         return len(cls._cls_chunks)
 
+    @classmethod
+    def Stats(cls):
+        return {
+            'chunks': 0 if cls._cls_known is None else len(cls._cls_known),
+            'cached': len(cls._cls_chunks),
+            'bytes': cls._cls_bytes,
+            'budget': int(cfg.cfgChunkCacheSize),
+            'hits': cls._cls_hits,
+            'misses': cls._cls_misses,
+            'evictions': cls._cls_evictions,
+        }
+
     @classmethod
     def GetChunkBaseAddress(cls, ptr):
         return ptr & (~cls.kAlignmentMask)
 
+    @classmethod
+    def FindChunkAddress(cls, ptr):
+        """ return start address of the registered chunk contains ptr, or None.
+            regular pages are found by alignment, large chunks by bisect.
+        """
+        known = cls._cls_known
+        chunk_addr = ptr & (~cls.kAlignmentMask)
+        if chunk_addr in known and ptr < chunk_addr + known[chunk_addr]:
+            return chunk_addr
+
+        if cls._cls_index is None:
+            starts = sorted(known)
+            cls._cls_index = (starts, [known[i] for i in starts])
+        starts, sizes = cls._cls_index
+        i = bisect.bisect_right(starts, ptr) - 1
+        if i >= 0 and ptr < starts[i] + sizes[i]:
+            return starts[i]
+        return None
+
+    @classmethod
+    def LoadChunk(cls, chunk_addr):
+        """ load the chunk bytes into cache, evict the least recent chunks
+            to keep the cache in budget.
+        """
+        size = cls._cls_known[chunk_addr]
+        budget = int(cfg.cfgChunkCacheSize)
+        if size > budget:
+            return None
+
+        c = ChunkBlock.ChunkInfo(chunk_addr, size)
+        try:
+            ok = c.Load()
+        except Exception:
+            ok = False
+        if not ok:
+            # unreadable chunk, leave it to the debugger.
+            del cls._cls_known[chunk_addr]
+            cls._cls_index = None
+            return None
+
+        while cls._cls_chunks and cls._cls_bytes + size > budget:
+            k, v = cls._cls_chunks.popitem(last=False)
+            cls._cls_bytes -= v._size
+            cls._cls_evictions += 1
+            if v is cls._cls_last:
+                cls._cls_last = None
+
+        cls._cls_chunks[chunk_addr] = c
+        cls._cls_bytes += size
+        return c
+
+    @classmethod
+    def GetChunk(cls, ptr):
+        """ return the cached ChunkInfo contains ptr, or None.
+        """
+        if not cls._cls_enabled:
+            return None
+
+        last = cls._cls_last
+        if last is not None and last._address <= ptr < last._address + last._size:
+            cls._cls_hits += 1
+            return last
+
+        if cls._cls_known is None:
+            cls.LoadChunks()
+            if cls._cls_known is None:
+                return None
+
+        chunk_addr = cls.FindChunkAddress(ptr)
+        if chunk_addr is None:
+            return None
+
+        chunks = cls._cls_chunks
+        if chunk_addr in chunks:
+            # move to the most recent.
+            c = chunks.pop(chunk_addr)
+            chunks[chunk_addr] = c
+            cls._cls_hits += 1
+            cls._cls_last = c
+            return c
+
+        cls._cls_misses += 1
+        c = cls.LoadChunk(chunk_addr)
+        if c is not None:
+            cls._cls_last = c
+        return c
+
     def GetChunkBlock(self, ptr):
-        chunk_addr = self.GetChunkBaseAddress(ptr)
-        if chunk_addr in self._cls_chunks:
-            reader = ChunkBlock.ChunkBlockReader()
-            reader._address = ptr 
-            reader._chunk = self._cls_chunks[chunk_addr]
-            return reader
-        return None 
+        c = self.GetChunk(ptr)
+        if c is None:
+            return None
+        reader = ChunkBlock.ChunkBlockReader()
+        reader._address = ptr 
+        reader._chunk = c
+        return reader
 
     @property
     def address(self):
@@ -1582,6 +1823,13 @@ class ChunkBlock(object):
     def LoadUString(self, off, length=-1):
         return self._reader.LoadUString(off, length)
 
+    def LoadBytes(self, off, size):
+        """ return memoryview of the bytes, or None if the chunk is not cached.
+        """
+        if isinstance(self._reader, ChunkBlock.ChunkBlockReader):
+            return self._reader.LoadBytes(off, size)
+        return None
+
 class Value(AutoLayout, ChunkBlock):
     """
         represents an abstract object for any v8 Object
@@ -6,9 +6,16 @@ from __future__ import print_function, division
 
 from abc import ABCMeta, abstractmethod
 import re
+from array import array
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import andb.dbg as dbg
 from andb.stl import Vector
-from .internal import ObjectSlot, ObjectSlots
+from .internal import Internal, ObjectSlot, ObjectSlots
 from andb.config import Config
 
 """ internal implimentations
@@ -60,9 +67,9 @@ class ChunkIterator:
 
     def __next__(self):
         if self._current is None:
-            ptr = self._space['memory_chunk_list_']['front_']
+            ptr = self._space.LoadPath('memory_chunk_list_.front_')
         else:
-            ptr = self._current['list_node_']['next_']
+            ptr = MemoryChunk.ReadPath(self._current, 'list_node_.next_')
         self._current = ptr
         if self._current == 0:
             raise StopIteration
@@ -135,6 +142,158 @@ class ChunkObjectIterator:
     def hasNext(self):
         return self._next_ptr < self._chunk.area_end
 
+class ChunkWalker:
+    """ walks the objects of a chunk from the raw bytes,
+        no HeapObject is created for the objects.
+
+        [area_start, area_end) is read by one read, the size of each object
+        is from the size table of its map, the fixed instance_size, or the
+        rule of the variable sized instance type,
+          size = align(header + length * scale),
+        where the length is the upper half of the second word, the Smi
+        length of FixedArrayBase (the Smi size of FreeSpace) and the int32
+        length of String. other objects are sized by HeapObject.Size().
+    """
+
+    # (predicate, (header, scale)) of the variable sized types,
+    # the first matching predicate wins.
+    _rule_cases = [
+        ('isFreeSpace', (0, 1)),
+        ('isFixedArray', (16, 8)),
+        ('isWeakFixedArray', (16, 8)),
+        ('isFixedDoubleArray', (16, 8)),
+        ('isByteArray', (16, 1)),
+        ('isContext', (16, 8)),
+    ]
+
+    # rules by instance type, built once InstanceType is loaded
+    _rule_table = None
+
+    # map tag to (instance type, fixed size or 0, rule or None)
+    _Map_Sizes = {}
+
+    def __init__(self, chunk):
+        self._chunk = chunk
+
+    @classmethod
+    def BuildRules(cls):
+        ChunkWalker._rule_table = InstanceType.MakeDispatch(cls._rule_cases, None)
+
+    @classmethod
+    def ClearSizeCache(cls):
+        ChunkWalker._Map_Sizes.clear()
+
+    @classmethod
+    def StringRule(cls, typ):
+        """ rule of the SeqString, None for other strings """
+        if typ & Internal.kStringRepresentationMask != Internal.kSeqStringTag:
+            return None
+        if typ & Internal.kStringEncodingMask == Internal.kOneByteStringTag:
+            return (16, 1)
+        return (16, 2)
+
+    @classmethod
+    def MapSize(cls, tag):
+        """ return (instance type, fixed size or 0, rule or None) of the map """
+        v = ChunkWalker._Map_Sizes.get(tag)
+        if v is not None:
+            return v
+        m = Map(tag)
+        typ = int(m.instance_type)
+        size = int(m.instance_size)
+        rule = None
+        if size == Internal.kVariableSizeSentinel:
+            size = 0
+            if InstanceType.isString(typ):
+                rule = cls.StringRule(typ)
+            elif cls._rule_table is not None and typ < len(cls._rule_table):
+                rule = cls._rule_table[typ]
+        v = ChunkWalker._Map_Sizes[tag] = (typ, size, rule)
+        return v
+
+    @classmethod
+    def MapType(cls, tag):
+        return cls.MapSize(tag)[0]
+
+    def Walk(self):
+        """ return (offsets, maps, sizes) of the objects from area_start,
+            numpy arrays if numpy is installed, None if not readable.
+        """
+        chunk = self._chunk
+        start = chunk.area_start
+        end = chunk.area_end
+        words = dbg.ReadWords(start, end)
+        if words is None:
+            return None
+
+        # current allocation top and limit
+        top = limit = None
+        space = chunk.getSpace()
+        if space is not None:
+            top = space.top
+            limit = space.limit
+
+        tag_mask = Internal.kHeapObjectTagMask
+        tag = Internal.kHeapObjectTag
+        align = Internal.kObjectAlignmentMask
+        sizes_of = ChunkWalker._Map_Sizes
+        offsets = array('I')
+        maps = array('Q')
+        sizes = array('I')
+        n = len(words)
+        i = 0
+        while i < n:
+            ptr = start + i * 8
+            if ptr == top and ptr != limit:
+                i = (limit - start) // 8
+                continue
+
+            m = words[i]
+            if m & tag_mask != tag:
+                break
+            v = sizes_of.get(m)
+            if v is None:
+                v = self.MapSize(m)
+            size = v[1]
+            if size == 0:
+                rule = v[2]
+                if rule is not None and i + 1 < n:
+                    length = words[i + 1] >> 32
+                    size = (rule[0] + length * rule[1] + align) & ~align
+                else:
+                    size = int(HeapObject.FromAddress(ptr).Size())
+            if size <= 0 or ptr + size > end:
+                print("Object(0x%x) size(%d) out of chunk, walk stopped." % (ptr, size))
+                break
+
+            offsets.append(i * 8)
+            maps.append(m)
+            sizes.append(size)
+            i += size // 8
+
+        if numpy is not None:
+            return (numpy.array(offsets, dtype=numpy.uint32),
+                    numpy.array(maps, dtype=numpy.uint64),
+                    numpy.array(sizes, dtype=numpy.uint32))
+        return offsets, maps, sizes
+
+    def Objects(self):
+        """ yield (address, map tag, size) of the objects,
+            by HeapObjects if the chunk is not readable in bulk.
+        """
+        walked = self.Walk()
+        if walked is None:
+            for obj in ChunkObjectIterator(self._chunk):
+                if obj is None:
+                    break
+                yield obj.address, obj.map.tag, int(obj.Size())
+            return
+
+        start = self._chunk.area_start
+        offsets, maps, sizes = walked
+        for off, m, size in zip(offsets.tolist(), maps.tolist(), sizes.tolist()):
+            yield start + off, m, size
+
 class SpaceObjectIterator:
     pass
 
@@ -545,12 +704,11 @@ class LookupIterator:
 
     def LookupInRegularHolder(self, map, holder):
         if not map.is_dictionary_map:
-            descriptors = map.instance_descriptors
-            index = descriptors.Search(self._name) 
+            index = map.SearchDescriptor(self._name)
             #print("find", self._name, "=", index)
             if index is None:
                 return LookupIterator.State.NOT_FOUND
-            self._property_detail = descriptors.GetDetails(index)
+            self._property_detail = map.DescriptorLayout()[index][1]
             self._number = index
         else:
             maybe_dict = holder.property_dictionary
@@ -636,7 +794,7 @@ class LookupIterator:
         elif self._property_detail.location == PropertyLocation.kField:
             assert holder.IsObject()
             jsobj = JSObject(holder)
-            result = jsobj.FastPropertyAt(self._number)
+            result = jsobj.FastPropertyAt(self._number, self._property_detail)
         else:
             # get strong value
             raise Exception('TBD')
@@ -746,3 +904,4 @@ from .structure import (
     RootsTable,
 )
 
+InstanceType.OnLoad(ChunkWalker.BuildRules)
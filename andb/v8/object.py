@@ -3,6 +3,7 @@ from __future__ import print_function, division
 
 import re
 #import struct
+from collections import OrderedDict
 
 from functools import wraps
 from andb.utility import Logging as log, oneshot, CachedProperty
@@ -17,6 +18,7 @@ from .internal import (
     AutoLayout,
     ObjectSlot,
     ObjectSlots,
+    TaggedWords,
     ALStruct,
     BitField,
     Version
@@ -727,7 +729,13 @@ class HeapObject(Object, Value):
 
     def Slots(self):
         """iterator for HeapObject"""
-        return ObjectSlots(self.address, self.address+self.Size())
+        size = self.Size()
+        return ObjectSlots(self.address, self.address+size, self.LoadBytes(0, size))
+
+    def TaggedSlots(self):
+        """ return TaggedWords of all slots, read in bulk """
+        size = self.Size()
+        return TaggedWords(self.address, self.address+size, self.LoadBytes(0, size))
 
 
 class Map(HeapObject):
@@ -738,6 +746,12 @@ class Map(HeapObject):
     # cache all Map Object 
     _map_cache = {} 
 
+    """ descriptor layout cache, decoded own descriptors by map address,
+        least recently used layouts are evicted over the budget (maps).
+    """
+    _Layout_Cache = OrderedDict()
+    kLayoutCacheBudget = 64 * 1024
+
     """
     // All heap objects have a Map that describes their structure.
     //  A Map contains information about:
@@ -987,6 +1001,54 @@ class Map(HeapObject):
     def number_of_own_descriptors(self):
         return self.bit_field3.number_of_own_descriptors
 
+    def DescriptorLayout(self):
+        """ decoded own descriptors of a fast map, one tuple for each descriptor,
+              (key, details, location, in_object, index, is_double, value)
+            index is the in-object field index or the PropertyArray index for
+            kField, value is the descriptor value for kDescriptor.
+            millions of objects share a few maps, the layout is decoded once.
+        """
+        cache = Map._Layout_Cache
+        address = self.address
+        layout = cache.pop(address, None)
+        if layout is not None:
+            cache[address] = layout
+            return layout
+
+        descs = DescriptorArray(self.instance_descriptors)
+        nof_own_descriptors = min(self.number_of_own_descriptors, descs.number_of_descriptors)
+        nof_inobjects = self.number_of_inobjects
+        layout = []
+        for i in range(nof_own_descriptors):
+            key = Name(descs.GetKey(i)).ToString()
+            details = descs.GetDetails(i)
+            location = details.location
+            if location == PropertyLocation.kField:
+                field_index = details.field_index
+                if field_index < nof_inobjects:
+                    item = (key, details, location, True, field_index, details.IsDouble(), None)
+                else:
+                    item = (key, details, location, False, field_index - nof_inobjects, details.IsDouble(), None)
+            else:
+                item = (key, details, location, False, i, False, descs.GetValue(i))
+            layout.append(item)
+
+        cache[address] = layout
+        while len(cache) > self.kLayoutCacheBudget:
+            cache.popitem(last=False)
+        return layout
+
+    @classmethod
+    def ClearLayoutCache(cls):
+        Map._Layout_Cache.clear()
+
+    def SearchDescriptor(self, name):
+        """ return the own descriptor index of the name, or None """
+        for i, item in enumerate(self.DescriptorLayout()):
+            if item[0] == name:
+                return i
+        return None
+
     def IsSpecialReceiverMap(self):
         result = InstanceType.isSpecialReceiverInstanceType(self.instance_type)
         return result
@@ -1103,12 +1165,28 @@ class FixedArrayBase(HeapObject):
             {"name": "length", "type": SmiTagged(int)},
         ]}
 
+    # tagged elements read in bulk, see Elements()
+    _elements = None
+
     # TBD: should support non-8-bytes type, eg. ByteArray.
     def Get(self, index):
         """ getter for elements
         """
+        if self._elements is not None:
+            return Object(self._elements[index])
         return Object(self.LoadPtr(self.kHeaderSize + (index * Internal.kTaggedSize)))
 
+    def Elements(self):
+        """ return TaggedWords of all elements, read in one MemoryRead.
+            Get() is served from it afterwards.
+        """
+        if self._elements is None:
+            size = int(self.length) * Internal.kTaggedSize
+            start = self.address + self.kHeaderSize
+            self._elements = TaggedWords(start, start + size, 
+                self.LoadBytes(self.kHeaderSize, size))
+        return self._elements
+
     def GetDouble(self, index):
         return (self.LoadPtr(self.kHeaderSize + (index * Internal.kTaggedSize)))
 
@@ -1142,14 +1220,13 @@ class FixedArray(FixedArrayBase):
         return self.kHeaderSize + (length * Internal.kTaggedSize)
 
     def PrintElements(self):
-        for i in range(self.length):
-            v = self.Get(i)
+        for (i, v) in self.WalkElements():
             print("   [%d] %s" % (i, Object.SBrief(v)))
 
     def WalkElements(self):
-        for i in range(self.length):
-            v = self.Get(i)
-            yield (i, v)
+        elements = self.Elements()
+        for i in range(len(elements)):
+            yield (i, Object(elements[i]))
 
 
 class ByteArray(FixedArrayBase):
@@ -1636,9 +1713,39 @@ class String(Name):
 
     kHeaderSize = 16
 
-    """ ConsString cache.
+    """ ConsString cache, flattened strings by cons address,
+        least recently used strings are evicted over the budget (chars).
     """
-    _ConsString_Cache = {}
+    _ConsString_Cache = OrderedDict()
+    _ConsString_CacheSize = 0
+    kConsStringCacheBudget = 64 * 1024 * 1024
+
+    @classmethod
+    def GetConsCache(cls, address):
+        cache = String._ConsString_Cache
+        s = cache.pop(address, None)
+        if s is not None:
+            cache[address] = s
+        return s
+
+    @classmethod
+    def PutConsCache(cls, address, s):
+        if len(s) > cls.kConsStringCacheBudget:
+            return
+        cache = String._ConsString_Cache
+        old = cache.pop(address, None)
+        if old is not None:
+            String._ConsString_CacheSize -= len(old)
+        cache[address] = s
+        String._ConsString_CacheSize += len(s)
+        while String._ConsString_CacheSize > cls.kConsStringCacheBudget:
+            _, v = cache.popitem(last=False)
+            String._ConsString_CacheSize -= len(v)
+
+    @classmethod
+    def ClearConsCache(cls):
+        String._ConsString_Cache.clear()
+        String._ConsString_CacheSize = 0
 
     @classmethod
     def __autoLayout(cls):
@@ -1721,7 +1828,10 @@ class String(Name):
         return "[%d] %s" % (length, self.to_string(recurse_limit=100))
 
     def ToString(self, length=-1):
-        return TextLimit(self.to_string(), limit=length)
+        if length < 0:
+            length = int(Config.cfgStringLength)
+        # one more char for TextLimit to tell the cut.
+        return TextLimit(self.to_string(limit=length + 1), limit=length)
 
     def __str__(self):
         return self.to_string()
@@ -1758,13 +1868,13 @@ class SeqString(String):
             v = self.Cast(SeqTwoByteString)
         return v.SizeFor(v.length)
 
-    def to_string(self, **kwargs):
+    def to_string(self, limit=-1, **kwargs):
         if self.IsOneByte():
             v = self.Cast(SeqOneByteString)
-            return v.to_string()
+            return v.to_string(limit)
         else:
             v = self.Cast(SeqTwoByteString)
-            return v.to_string()
+            return v.to_string(limit)
 
     def DebugPrint2(self):
         len = self.length
@@ -1794,8 +1904,10 @@ class SeqOneByteString(SeqString):
         size = Internal.ObjectPointerAlign(size)
         return size
 
-    def to_string(self):
+    def to_string(self, limit=-1):
         len = self.length
+        if limit >= 0 and limit < len:
+            len = limit
         s = self.LoadCString(self.kHeaderSize, len)
         return s
 
@@ -1817,8 +1929,10 @@ class SeqTwoByteString(SeqString):
         size = Internal.ObjectPointerAlign(size)
         return size
 
-    def to_string(self):
+    def to_string(self, limit=-1):
         len = self.length
+        if limit >= 0 and limit < len:
+            len = limit
         try:
             s = self.LoadUString(self.kHeaderSize, len)
         except Exception as e:
@@ -1843,12 +1957,54 @@ class ConsString(String):
     #def Size(self):
     #    return self.size
 
-    def to_string(self, **kwargs):
+    def to_string(self, limit=-1, **kwargs):
         """ cons string may be too long to reach end.
         """
-        a = self.first
-        b = self.second
-        return a.to_string(**kwargs) + b.to_string(**kwargs)
+        return self.Flatten(limit)
+
+    def Flatten(self, limit=-1):
+        """ flatten the cons tree without recursion,
+            leaves are collected left to right and joined once,
+            stops after 'limit' chars if limit >= 0.
+
+            only the complete strings are cached.
+        """
+        s = String.GetConsCache(self.address)
+        if s is not None:
+            return s if limit < 0 else s[:limit]
+
+        pieces = []
+        size = 0
+        truncated = False
+        stack = [self.second, self.first]
+        while len(stack) > 0:
+            if limit >= 0 and size >= limit:
+                truncated = True
+                break
+            o = stack.pop()
+            if isinstance(o, ConsString):
+                s = String.GetConsCache(o.address)
+                if s is None:
+                    stack.append(o.second)
+                    stack.append(o.first)
+                    continue
+                if limit >= 0 and len(s) > limit - size:
+                    s = s[:limit - size]
+                    truncated = True
+            else:
+                s = o.to_string(limit=limit - size if limit >= 0 else -1)
+                # the leaf may be cut at the limit
+                if limit >= 0 and len(s) >= limit - size:
+                    truncated = True
+            pieces.append(s)
+            size += len(s)
+
+        s = ''.join(pieces)
+        if not truncated:
+            String.PutConsCache(self.address, s)
+        if limit >= 0:
+            return s[:limit]
+        return s
 
 
 class ExternalString(String):
@@ -1866,8 +2022,10 @@ class ExternalString(String):
             { "name":"resource_data", "type": int },
         ]}
 
-    def to_string(self, **kwargs):
+    def to_string(self, limit=-1, **kwargs):
         v = dbg.Target.ReadCStr(self.resource_data)
+        if limit >= 0:
+            return v[:limit]
         return v
 
 
@@ -1885,10 +2043,12 @@ class SlicedString(String):
             { "name":"offset", "type":SmiTagged(int)},
         ]}
 
-    def to_string(self, **kwargs):
+    def to_string(self, limit=-1, **kwargs):
         a = self.parent
         b = self.offset
-        return a.to_string(**kwargs)[b:]
+        if limit >= 0:
+            return a.to_string(limit=b + limit)[b:]
+        return a.to_string()[b:]
 
 
 class ThinString(String):
@@ -2890,6 +3050,20 @@ class JSObject(JSReceiver):
             return value
         return Object(value)
 
+    def LayoutPropertyAt(self, in_object, index, is_double):
+        """ get property by the index in Map.DescriptorLayout()
+        """
+        if in_object:
+            offset = self.kHeaderSize + (index * Internal.kTaggedSize)
+            value = self.LoadDouble(offset) if is_double else self.LoadPtr(offset)
+        else:
+            array = self.properties_array
+            value = array.GetDouble(index) if is_double else array.Get(index)
+        assert value is not None, 'index=%d, <0x%x>' % (index, self)
+        if is_double:
+            return value
+        return Object(value)
+
     def DictPropertyAt(self, index):
         if self.IsSwissNameDictionary():
             raise Exception('TBD')
@@ -2901,17 +3075,10 @@ class JSObject(JSReceiver):
     """
     def WalkAllProperties(self):
         if self.has_fast_properties:
-            # not a dictionary map
-            descs = self.descriptors_array
-            #nof_inobject_prop = self.map.number_of_inobjects
-            nof_own_descriptors = min(self.number_of_own_descriptors, descs.number_of_descriptors)
-            for i in range(nof_own_descriptors):
-                key = Name(descs.GetKey(i)).ToString()
-                details = descs.GetDetails(i)
-                if details.location == PropertyLocation.kField:
-                    value = self.FastPropertyAt(i, details)
-                elif details.location == PropertyLocation.kDescriptor:
-                    value = descs.GetValue(i)
+            # not a dictionary map, only the field words are read.
+            for (key, details, location, in_object, index, is_double, value) in self.map.DescriptorLayout():
+                if location == PropertyLocation.kField:
+                    value = self.LayoutPropertyAt(in_object, index, is_double)
                 yield (key, details, value)
 
         elif InstanceType.isJSGlobalObject(self.instance_type):
@@ -4154,3 +4321,7 @@ from andb.utility import (
     TextLimit,
     TextShort,
 )
+
+from andb.config import (
+    Config,
+)
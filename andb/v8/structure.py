@@ -136,15 +136,23 @@ class Isolate(Struct):
     @classmethod
     def SetCurrent(cls, pyo):
         cls._current_isolate = pyo
+        # chunks are registered from the current isolate
+        ChunkBlock.Clear()
+        # map layouts are keyed by map addresses of the previous isolate
+        Map.ClearLayoutCache()
+        # flattened cons strings are keyed by string addresses
+        String.ClearConsCache()
+        # object sizes are keyed by map addresses
+        ChunkWalker.ClearSizeCache()
 
     @classmethod
     def GetCurrent(cls):
         return cls._current_isolate
    
     def MakeChunkCache(self):
+        """ register all chunks for ChunkBlock, chunks are cached on demand. """
         heap = self.Heap()
         spaces = AllocationSpace.AllSpaces() 
-        print("Make ChunkCache ...")
         for name in spaces:
             space = heap.getSpace(name)
             chunks = space.getChunks()
@@ -153,7 +161,7 @@ class Isolate(Struct):
                     ChunkBlock.AddChunk(i)
                 except Exception as e:
                     print('AddChunk %x failed, %s' % (i, e))
-        print("Done ChunkCache, %d chunks cached." % ChunkBlock.CacheSize())
+        log.verbose("ChunkCache, %d chunks registered." % ChunkBlock.Stats()['chunks'])
 
     def Heap(self):
         return Heap(self['heap_'].AddressOf(), self)
@@ -270,51 +278,75 @@ class GlobalHandles(Struct):
 
         @property
         def NodeState(self):
-            x = self['flags_']
+            x = self.LoadPath('flags_')
             return self.BitSize(x, 0, 3)
 
         @property
         def IsInYoungList(self):
-            x = self['flags_']
+            x = self.LoadPath('flags_')
             return self.Bit(x, 3)
  
         @property
         def NodeWeaknessType(self):
-            x = self['flags_']
+            x = self.LoadPath('flags_')
             return self.BitSize(x, 4, 2)
 
         def isRetainer(self):
-            state = self.NodeState
-            return (state != self.FREE) and \
-                not (state == self.NEAR_DEATH and
-                     self.NodeWeaknessType != self.FINALIZER_WEAK)
+            return self.cIsRetainer(self.address)
 
         @property
         def label(self):
-            if self.NodeState != self.NORMAL:
+            return self.cLabel(self.address)
+
+        @property
+        def location(self):
+            return self.cLocation(self.address)
+
+        """ node functions by address, no debugger Value is created.
+        """
+        @classmethod
+        def cIsRetainer(cls, address):
+            x = cls.ReadPath(address, 'flags_')
+            state = cls.BitSize(x, 0, 3)
+            return (state != cls.FREE) and \
+                not (state == cls.NEAR_DEATH and
+                     cls.BitSize(x, 4, 2) != cls.FINALIZER_WEAK)
+
+        @classmethod
+        def cLabel(cls, address):
+            x = cls.ReadPath(address, 'flags_')
+            if cls.BitSize(x, 0, 3) != cls.NORMAL:
                 return None
-            x = self['data_']['parameter']
+            x = cls.ReadPath(address, 'data_.parameter')
             if x == 0:
                 return None
             return x
 
-        @property
-        def location(self):
-            return self['object_'].AddressOf()
+        @classmethod
+        def cLocation(cls, address):
+            off = cls.OffsetOf('object_')
+            if off is None:
+                return int(cls(address)['object_'].AddressOf())
+            return address + off
 
     class NodeSpace(Struct):
         """ Global Handles uses NodeSpace for node management. """
         _typeName = 'v8::internal::GlobalHandles::NodeSpace<v8::internal::GlobalHandles::Node>'
 
         def Iterate(self, v):
+            Node = GlobalHandles.Node
             ptr = self['first_used_block_']
             cnt = 0
+            stride = None
             while ptr != 0:
+                nodes = ptr['nodes_']
+                base = int(nodes[0].AddressOf())
+                if stride is None:
+                    stride = int(nodes[1].AddressOf()) - base
                 for i in range(Internal.kBlockSize):
-                    x = ptr['nodes_'][i].AddressOf()
-                    node = GlobalHandles.Node(x)
-                    if node.isRetainer():
-                        v.VisitRootPointer(Root.kGlobalHandles, node.label, ObjectSlot(node.location))
+                    x = base + i * stride
+                    if Node.cIsRetainer(x):
+                        v.VisitRootPointer(Root.kGlobalHandles, Node.cLabel(x), ObjectSlot(Node.cLocation(x)))
                         cnt += 1
                         if cnt % 10000 == 0:
                             print("handles: %d" % cnt)
@@ -671,7 +703,7 @@ class MemoryChunk(Struct):
         pass
 
     def getSpace(self):
-        v = self['owner_']['_M_b']['_M_p']
+        v = self.LoadPath('owner_._M_b._M_p')
         if v == 0:
             return None 
         return PagedSpace(v)
@@ -681,14 +713,14 @@ class MemoryChunk(Struct):
         """ get chunk size
             return: int
         """
-        return int(self['size_'])
+        return self.LoadPath('size_')
 
     @property
     def area_start(self):
         """ get area start ptr
             return: int
         """
-        return int(self['area_start_'])
+        return self.LoadPath('area_start_')
 
     @property
     def area_end(self):
@@ -697,7 +729,7 @@ class MemoryChunk(Struct):
         """
         if self._CacheAreaEnd is not None:
             return self._CacheAreaEnd
-        self._CacheAreaEnd = int(self['area_end_'])
+        self._CacheAreaEnd = self.LoadPath('area_end_')
         return self._CacheAreaEnd
 
     @property
@@ -877,11 +909,11 @@ class Space(Struct):
         
     def walkPages(self):
         """ walk for chunks """
-        ptr = self['memory_chunk_list_']['front_']
+        ptr = self.LoadPath('memory_chunk_list_.front_')
         while ptr != 0:
             chunk = MemoryChunk(ptr)
             yield chunk
-            ptr = ptr['list_node_']['next_']
+            ptr = MemoryChunk.ReadPath(ptr, 'list_node_.next_')
 
     def getChunks(self):
         chunks = []
@@ -1147,8 +1179,11 @@ from .object import (
     JSGlobalObject,
     FixedArray,
     StringTable,
+    Map,
+    String,
 )
 
 from .iterator import (
     SpaceIterator,
+    ChunkWalker,
 )
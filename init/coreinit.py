@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+
+import os
+import sys
+import traceback
+from os import path
+
+directory, file = path.split(__file__)
+directory       = path.expanduser(directory)
+directory       = path.abspath(directory + "/../")
+
+if not directory in sys.path:
+    sys.path.insert(0, directory)
+
+if not "." in sys.path:
+    sys.path.append(".")
+
+# select the headless core engine
+os.environ['ANDB_ENGINE'] = 'core'
+
+# load alinode debugger
+import andb
+andb.Load()
+
+from andb.dbg import Command
+
+try:
+    input = raw_input
+except NameError:
+    pass
+
+def Execute(line):
+    try:
+        Command.Execute(line)
+    except KeyboardInterrupt:
+        print("Interrupted.")
+    except Exception as e:
+        print("Python Exception %s: %s" % (type(e), e))
+        traceback.print_exc()
+
+# commands from arguments, same order as gdb (-x file, -ex command)
+is_batch = False
+argv = sys.argv[1:]
+i = 0
+while i < len(argv):
+    opt = argv[i]
+    if opt == '--batch':
+        is_batch = True
+    elif opt == '-x' and i + 1 < len(argv):
+        i += 1
+        with open(argv[i]) as f:
+            for line in f:
+                Execute(line)
+    elif opt == '-ex' and i + 1 < len(argv):
+        i += 1
+        Execute(argv[i])
+    i += 1
+
+if is_batch:
+    sys.exit(0)
+
+# interactive
+while True:
+    try:
+        line = input('(andb) ')
+    except (EOFError, KeyboardInterrupt):
+        print('')
+        break
+    if line.strip() in ('q', 'quit', 'exit'):
+        break
+    Execute(line)